@@ -0,0 +1,50 @@
+# backfill.py
+import argparse
+import logging
+from datetime import datetime, timedelta
+from db.db import DB
+from services.backfill_service import BackfillService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пересчёт предсказаний за исторический период")
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat, help="Начало периода (ISO 8601)")
+    parser.add_argument("--end", required=True, type=datetime.fromisoformat, help="Конец периода, не включая (ISO 8601)")
+    parser.add_argument("--version", required=True, help="Версия результатов в prediction_backfill")
+    parser.add_argument("--chunk-hours", type=float, default=6.0, help="Длина чанка в часах")
+    parser.add_argument("--workers", type=int, default=2, help="Число параллельно обрабатываемых чанков")
+    parser.add_argument("--param1", type=float, help="Переопределить param1 для всех сенсоров")
+    parser.add_argument("--param2", type=float, help="Переопределить param2 для всех сенсоров")
+    args = parser.parse_args(argv)
+    if (args.param1 is None) != (args.param2 is None):
+        parser.error("--param1 and --param2 must be given together")
+    if args.start >= args.end:
+        parser.error("--start must be before --end")
+    return args
+
+
+def backfill(argv=None):
+    """Точка входа пересчёта истории."""
+    args = parse_args(argv)
+    params = (args.param1, args.param2) if args.param1 is not None else None
+    db = None
+    try:
+        db = DB()
+        service = BackfillService(db, workers=args.workers)
+        summary = service.run(
+            args.start, args.end, args.version,
+            chunk_size=timedelta(hours=args.chunk_hours),
+            params=params
+        )
+        logger.info(f"Backfill {args.version} finished: {summary}")
+        return summary
+    finally:
+        if db:
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    backfill()
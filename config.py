@@ -1,9 +1,9 @@
 # config.py
 import os
+import socket
 from datetime import timedelta
 from dataclasses import dataclass
 from typing import Tuple, Type
-import oracledb
 
 @dataclass
 class DatabaseConfig:
@@ -15,17 +15,46 @@ class DatabaseConfig:
     pool_max: int = int(os.getenv("DB_POOL_MAX", "5"))
     pool_increment: int = int(os.getenv("DB_POOL_INCREMENT", "1"))
 
+@dataclass
+class PoolTuningConfig:
+    """Телеметрия и адаптивная настройка пула соединений."""
+    adaptive: bool = os.getenv("DB_POOL_ADAPTIVE", "false").lower() == "true"
+    adaptive_max: int = int(os.getenv("DB_POOL_ADAPTIVE_MAX", "20"))  # верхняя граница роста пула
+    min_workers: int = int(os.getenv("PROCESSING_MIN_WORKERS", "1"))
+    max_workers: int = int(os.getenv("PROCESSING_MAX_WORKERS", "8"))
+    wait_ratio: float = float(os.getenv("DB_POOL_WAIT_RATIO", "0.2"))  # допустимое ожидание acquire относительно латентности запроса
+    warmup: bool = os.getenv("DB_POOL_WARMUP", "true").lower() == "true"
+    stmt_cache_size: int = int(os.getenv("DB_STMT_CACHE_SIZE", "20"))  # как stmtcachesize в oracledb
+
 @dataclass 
 class RetryConfig:
     """Конфигурация повторных попыток."""
     attempts: int = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
     delay: float = float(os.getenv("DB_RETRY_DELAY", "1.0"))
     backoff: float = float(os.getenv("DB_RETRY_BACKOFF", "2.0"))
-    exceptions: Tuple[Type[Exception], ...] = (
-        oracledb.DatabaseError,
-        oracledb.OperationalError,
-        TimeoutError,
-    )
+
+    @property
+    def exceptions(self) -> Tuple[Type[Exception], ...]:
+        """Исключения для повтора; oracledb загружается при первом обращении, а не при импорте config."""
+        import oracledb
+        return (
+            oracledb.DatabaseError,
+            oracledb.OperationalError,
+            TimeoutError,
+        )
+
+@dataclass
+class RetryBudgetConfig:
+    """Общий бюджет повторных попыток для вложенных вызовов."""
+    deadline: float = float(os.getenv("DB_RETRY_DEADLINE", "60.0"))  # секунд на всё дерево вызовов
+    max_retries: int = int(os.getenv("DB_RETRY_BUDGET", "5"))  # повторов суммарно по всем уровням
+    jitter: float = float(os.getenv("DB_RETRY_JITTER", "0.5"))  # доля случайного разброса задержки [0..1]
+
+@dataclass
+class CircuitBreakerConfig:
+    """Конфигурация предохранителя (circuit breaker) для БД."""
+    failure_threshold: int = int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", "5"))
+    reset_timeout: float = float(os.getenv("DB_BREAKER_RESET_TIMEOUT", "30.0"))
 
 @dataclass
 class ProcessingConfig:
@@ -33,21 +62,107 @@ class ProcessingConfig:
     prediction_timeout: int = int(os.getenv("PREDICTION_TIMEOUT", "3"))
     late_data_tolerance: timedelta = timedelta(hours=int(os.getenv("LATE_DATA_TOLERANCE_HOURS", "24")))
     min_calibration_devices: int = int(os.getenv("MIN_CALIBRATION_DEVICES", "2"))
+    sensor_lanes: bool = os.getenv("SENSOR_LANES", "false").lower() == "true"  # контекст и калибровка по сенсорам, сенсоры параллельно
+    lane_workers: int = int(os.getenv("LANE_WORKERS", "4"))  # сенсоров, обрабатываемых одновременно
+    speculative_calibration: bool = os.getenv("SPECULATIVE_CALIBRATION", "false").lower() == "true"  # калибровка нового сенсора в фоне с момента выборки
+    workers: int = int(os.getenv("PROCESSING_WORKERS", "1"))
+    write_batch_size: int = int(os.getenv("WRITE_BATCH_SIZE", "50"))  # предсказаний на транзакцию с контрольной точкой
+    pipeline_id: str = os.getenv("PIPELINE_ID", "default")
+    journal_path: str = os.getenv("PREDICTION_JOURNAL_PATH", "")  # пусто — журнал незаписанных предсказаний выключен
+    server_side_grouping: bool = os.getenv("FETCH_SERVER_SIDE_GROUPING", "false").lower() == "true"  # требует JSON_ARRAYAGG (Oracle 12.2+)
+    memory_budget_bytes: int = int(os.getenv("MEMORY_BUDGET_MB", "0")) * 1024 * 1024  # 0 — всё окно выбирается сразу
+    scheduling: str = os.getenv("SCHEDULING_POLICY", "fifo")  # fifo | freshest_first
+    fresh_window: timedelta = timedelta(minutes=int(os.getenv("FRESH_WINDOW_MINUTES", "60")))  # от самого нового измерения
+    backlog_share: float = float(os.getenv("BACKLOG_SHARE", "0.2"))  # доля пропускной способности для запоздавших данных
     
+@dataclass
+class CacheConfig:
+    """Конфигурация локальных кэшей измерений и результатов препроцессинга."""
+    measurement_cache_dir: str = os.getenv("MEASUREMENT_CACHE_DIR", "")  # пусто — кэш выключен
+    measurement_cache_max_bytes: int = int(os.getenv("MEASUREMENT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    preprocess_memo_max_bytes: int = int(os.getenv("PREPROCESS_MEMO_MAX_MB", "256")) * 1024 * 1024  # 0 — мемоизация выключена
+    preprocess_memo_dir: str = os.getenv("PREPROCESS_MEMO_DIR", "")  # пусто — без дискового уровня
+    dedup_index_path: str = os.getenv("DEDUP_INDEX_PATH", "")  # пусто — повторно вставленные измерения не ищутся
+    dedup_retention_hours: int = int(os.getenv("DEDUP_RETENTION_HOURS", "48"))  # не меньше окна выборки (24 ч)
+
+@dataclass
+class ExportConfig:
+    """Конфигурация выгрузки предсказаний и рядов в колоночные файлы (Parquet) для аналитики."""
+    export_dir: str = os.getenv("EXPORT_DIR", "")  # пусто — выгрузка выключена; требует pyarrow
+    include_series: bool = os.getenv("EXPORT_SERIES", "false").lower() == "true"  # декодированные ряды измерений
+    batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))  # предсказаний за запрос
+    commit_lag: timedelta = timedelta(seconds=int(os.getenv("EXPORT_COMMIT_LAG_SECONDS", "60")))  # не выгружать самые свежие строки
+
+@dataclass
+class MultiSiteConfig:
+    """Конфигурация обработки нескольких площадок (баз данных) одним процессом."""
+    sites_path: str = os.getenv("SITES_CONFIG_PATH", "")  # JSON со списком площадок; пусто — одна площадка из DB_*
+    workers: int = int(os.getenv("SITE_WORKERS", "4"))  # общий пул воркеров всех площадок
+
+@dataclass
+class TracingConfig:
+    """Конфигурация трассировки: спаны запуска, стадий, запросов и измерений в локальный файл."""
+    level: str = os.getenv("TRACE_LEVEL", "off")  # off | run | stage | query | measurement
+    export_path: str = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")  # JSON Lines, поля как в OTLP
+    flush_every: int = int(os.getenv("TRACE_FLUSH_EVERY", "1000"))  # спанов в буфере до записи в файл
+
+@dataclass
+class ShardingConfig:
+    """Конфигурация распределения работы между воркерами через аренду шардов."""
+    shard_count: int = int(os.getenv("SHARD_COUNT", "8"))  # шард устройства = device_id mod shard_count
+    shards_per_worker: int = int(os.getenv("SHARDS_PER_WORKER", "2"))
+    worker_id: str = os.getenv("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+    lease_ttl: int = int(os.getenv("LEASE_TTL_SECONDS", "60"))
+    heartbeat_interval: float = float(os.getenv("LEASE_HEARTBEAT_SECONDS", "20"))
+    poll_interval: float = float(os.getenv("WORKER_POLL_SECONDS", "30"))
+
+@dataclass
+class KeypointConfig:
+    """Конфигурация поиска ключевых точек (пиков) рядов перед предсказанием."""
+    series_field: str = os.getenv("KEYPOINT_SERIES_FIELD", "feat1")  # ряд, в котором ищутся пики
+    min_prominence: float = float(os.getenv("KEYPOINT_MIN_PROMINENCE", "0.1"))
+    min_width: int = int(os.getenv("KEYPOINT_MIN_WIDTH", "1"))  # точек выше половины выраженности
+    window: int = int(os.getenv("KEYPOINT_WINDOW", "50"))  # точек в каждую сторону для оценки выраженности
+    max_keypoints: int = int(os.getenv("KEYPOINT_MAX_PER_SERIES", "32"))  # самые выраженные пики на ряд
+
+@dataclass
+class QualityGateConfig:
+    """Конфигурация проверки качества рядов перед вызовом модели."""
+    enabled: bool = os.getenv("QUALITY_GATE_ENABLED", "false").lower() == "true"
+    max_nan_ratio: float = float(os.getenv("QUALITY_MAX_NAN_RATIO", "0.1"))  # доля NaN/inf в признаке
+    min_std: float = float(os.getenv("QUALITY_MIN_STD", "1e-6"))  # ниже — ряд считается «плоским»
+    max_saturation_ratio: float = float(os.getenv("QUALITY_MAX_SATURATION_RATIO", "0.2"))  # доля точек на минимуме или максимуме
+    fields: tuple = tuple(os.getenv("QUALITY_FIELDS", "feat1,feat2").split(","))
+
 @dataclass
 class DegradationConfig:
     "Конфигурация модели деградации"
-    degradation_type:str = os.getenv("DEGRADATION_TYPE", "linear") # avaible values [linear,quadratic]
+    degradation_type:str = os.getenv("DEGRADATION_TYPE", "linear") # avaible values [linear,quadratic,table]
     linear_slope_e:float=float(os.getenv("LINEAR_DEGRADATION_SLOPE_E", "0.5"))
     linear_intercept_e:float=float(os.getenv("LINEAR_DEGRADATION_INTERCEPT_E", "0.5"))
     linear_slope_i:float=float(os.getenv("LINEAR_DEGRADATION_SLOPE_I", "0.5"))
     linear_intercept_i:float=float(os.getenv("LINEAR_DEGRADATION_INTERCEPT_I", "0.5"))
+    quadratic_e:float=float(os.getenv("QUADRATIC_DEGRADATION_E", "0.0")) # коэффициенты при usage**2, к ним добавляется линейная часть
+    quadratic_i:float=float(os.getenv("QUADRATIC_DEGRADATION_I", "0.0"))
+    table_path:str = os.getenv("DEGRADATION_TABLE_PATH", "") # CSV usage,e_coef,i_coef для типа table
+    precomputed_size:int=int(os.getenv("DEGRADATION_PRECOMPUTED_SIZE", "100000")) # коэффициенты для usage < size берутся из таблицы
+    usage_cache_ttl:float=float(os.getenv("SENSOR_USAGE_CACHE_TTL_SECONDS", "60")) # счётчики других воркеров видны не позже чем через ttl
 
 # Глобальные экземпляры конфигураций
 DB_CONFIG = DatabaseConfig()
+POOL_TUNING_CONFIG = PoolTuningConfig()
 RETRY_CONFIG = RetryConfig()
+RETRY_BUDGET_CONFIG = RetryBudgetConfig()
+CIRCUIT_BREAKER_CONFIG = CircuitBreakerConfig()
 PROCESSING_CONFIG = ProcessingConfig()
 DEGRADATION_CONFIG = DegradationConfig()
+CACHE_CONFIG = CacheConfig()
+EXPORT_CONFIG = ExportConfig()
+MULTI_SITE_CONFIG = MultiSiteConfig()
+TRACING_CONFIG = TracingConfig()
+SHARDING_CONFIG = ShardingConfig()
+KEYPOINT_CONFIG = KeypointConfig()
+QUALITY_GATE_CONFIG = QualityGateConfig()
 
 # Обратная совместимость
 DB_USER = DB_CONFIG.user
@@ -60,5 +175,11 @@ PREDICTION_TIMEOUT = PROCESSING_CONFIG.prediction_timeout
 DB_RETRY_ATTEMPTS = RETRY_CONFIG.attempts
 DB_RETRY_DELAY = RETRY_CONFIG.delay
 DB_RETRY_BACKOFF = RETRY_CONFIG.backoff
-DB_RETRY_EXCEPTIONS = RETRY_CONFIG.exceptions
-LATE_DATA_TOLERANCE = PROCESSING_CONFIG.late_data_tolerance
\ No newline at end of file
+LATE_DATA_TOLERANCE = PROCESSING_CONFIG.late_data_tolerance
+
+
+def __getattr__(name):
+    # DB_RETRY_EXCEPTIONS вычисляется при обращении, чтобы импорт config не загружал oracledb
+    if name == "DB_RETRY_EXCEPTIONS":
+        return RETRY_CONFIG.exceptions
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
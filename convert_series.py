@@ -0,0 +1,102 @@
+# convert_series.py
+import time
+import argparse
+import logging
+import numpy as np
+from db.db import DB
+from utils.series_codec import decode_series, encode_series
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Перевод рядов table2.data из JSON в бинарный формат")
+    parser.add_argument("--batch-size", type=int, default=500, help="Строк на транзакцию")
+    parser.add_argument("--float32", action="store_true",
+                        help="Хранить признаки в float32: вдвое меньше, но с потерей точности после 7-го знака")
+    parser.add_argument("--dry-run", action="store_true", help="Только отчёт о размере и скорости, без записи")
+    parser.add_argument("--limit", type=int, help="Обработать не больше указанного числа строк")
+    return parser.parse_args(argv)
+
+
+class ConversionReport:
+    """Суммарный размер и время декодирования рядов в JSON и бинарном формате."""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.json_bytes = 0
+        self.binary_bytes = 0
+        self.json_decode_s = 0.0
+        self.binary_decode_s = 0.0
+
+    def add(self, json_payload: str, binary_payload: str) -> None:
+        started = time.perf_counter()
+        decode_series(json_payload)
+        self.json_decode_s += time.perf_counter() - started
+        started = time.perf_counter()
+        decode_series(binary_payload)
+        self.binary_decode_s += time.perf_counter() - started
+        self.rows += 1
+        self.json_bytes += len(json_payload)
+        self.binary_bytes += len(binary_payload)
+
+    def summary(self) -> dict:
+        return {
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "json_mb": round(self.json_bytes / 2 ** 20, 2),
+            "binary_mb": round(self.binary_bytes / 2 ** 20, 2),
+            "size_ratio": round(self.binary_bytes / self.json_bytes, 3) if self.json_bytes else None,
+            "decode_speedup": round(self.json_decode_s / self.binary_decode_s, 1) if self.binary_decode_s else None,
+        }
+
+
+def convert(db, batch_size: int, feature_dtype=np.float64, dry_run: bool = False, limit: int = None) -> dict:
+    """
+    Переписывает JSON-ряды пачками; строки, которые нельзя закодировать, остаются в JSON.
+    Перезапись необратима, поэтому по умолчанию признаки хранятся без потерь (float64).
+    """
+    report = ConversionReport()
+    after_row_id = None
+    while limit is None or report.rows + report.skipped < limit:
+        rows = db.fetch_json_series_batch(after_row_id, batch_size)
+        if not rows:
+            break
+        after_row_id = rows[-1]["row_id"]
+        converted = []
+        for row in rows:
+            try:
+                binary = encode_series(decode_series(row["data"]), feature_dtype=feature_dtype)
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Row {row['row_id']} left as JSON: {str(e)}")
+                report.skipped += 1
+                continue
+            report.add(row["data"], binary)
+            converted.append({"row_id": row["row_id"], "data": binary})
+        if converted and not dry_run:
+            db.update_series_data(converted)
+        logger.info(f"Conversion progress: {report.summary()}")
+    return report.summary()
+
+
+def convert_series(argv=None):
+    """Точка входа конвертера."""
+    args = parse_args(argv)
+    db = None
+    try:
+        db = DB()
+        summary = convert(
+            db, args.batch_size, np.float32 if args.float32 else np.float64,
+            dry_run=args.dry_run, limit=args.limit
+        )
+        logger.info(f"Series conversion finished: {summary}")
+        return summary
+    finally:
+        if db:
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    convert_series()
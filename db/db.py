@@ -1,40 +1,158 @@
 # db/db.py
-import oracledb
-from config import DB_CONFIG, PROCESSING_CONFIG
-from utils.retry import retry_db_operation
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_CONFIG, PROCESSING_CONFIG, POOL_TUNING_CONFIG
+from db.pool_metrics import PoolMetrics, PoolTuner
+from utils.retry import CircuitBreaker, retry_db_operation
+from utils.tracing import QUERY, span
 import logging
 
 logger = logging.getLogger(__name__)
 
+oracledb = None  # the driver is imported when the first pool is created
+
+# quality_code of a re-sent measurement (services.dedup_index): the row only takes it out of
+# the unprocessed set, it is not a sensor use and never counts towards sensor_usage
+DUPLICATE_MEASUREMENT = "duplicate_measurement"
+_COUNTS_AS_USAGE = f"(quality_code IS NULL OR quality_code <> '{DUPLICATE_MEASUREMENT}')"
+
+
+def _load_driver():
+    """Import oracledb on first use so that importing this module stays cheap."""
+    global oracledb
+    if oracledb is None:
+        import oracledb as driver
+        oracledb = driver
+    return oracledb
+
+
+def _shard_filter(shard_count=None, shard_ids=None):
+    """SQL condition and binds restricting table2 rows to devices of the given shards."""
+    if not shard_ids:
+        return "", {}
+    binds = {f"shard{i}": shard_id for i, shard_id in enumerate(shard_ids)}
+    placeholders = ", ".join(f":{name}" for name in binds)
+    binds["shard_count"] = shard_count
+    return f"AND MOD(t2.device_id, :shard_count) IN ({placeholders})", binds
+
 
 class DB:
-    def __init__(self):
+    def __init__(self, config=None, late_data_tolerance=None):
+        """
+        `config` (DatabaseConfig) and `late_data_tolerance` override DB_CONFIG and
+        PROCESSING_CONFIG for this instance, e.g. one DB per site in multi-site mode.
+        """
+        self._config = config
+        self._late_data_tolerance = late_data_tolerance
         self.pool = None
+        self.metrics = PoolMetrics(POOL_TUNING_CONFIG.stmt_cache_size)
+        self.pool_tuner = PoolTuner(self.metrics, db_config=config)
+        # Свой предохранитель: в многосайтовом режиме отказ одной БД не отклоняет вызовы к другим
+        self.circuit_breaker = CircuitBreaker(self.config.dsn)
         self._init_pool()
 
+    @property
+    def config(self):
+        return self._config if self._config is not None else DB_CONFIG
+
+    @property
+    def late_data_tolerance(self):
+        return self._late_data_tolerance if self._late_data_tolerance is not None else PROCESSING_CONFIG.late_data_tolerance
+
     @retry_db_operation
     def _init_pool(self):
         """Initialize Oracle connection pool using oracledb."""
+        oracledb = _load_driver()
         self.pool = oracledb.create_pool(
-            user=DB_CONFIG.user,
-            password=DB_CONFIG.password,
-            dsn=DB_CONFIG.dsn,
-            min=DB_CONFIG.pool_min,
-            max=DB_CONFIG.pool_max,
-            increment=DB_CONFIG.pool_increment,
+            user=self.config.user,
+            password=self.config.password,
+            dsn=self.config.dsn,
+            min=self.config.pool_min,
+            max=self.config.pool_max,
+            increment=self.config.pool_increment,
             getmode=oracledb.PoolGetMode.WAIT  # Wait if pool is busy
         )
         logger.info(
             f"Database connection pool initialized: "
-            f"min={DB_CONFIG.pool_min}, max={DB_CONFIG.pool_max}, increment={DB_CONFIG.pool_increment}"
+            f"min={self.config.pool_min}, max={self.config.pool_max}, increment={self.config.pool_increment}"
         )
+        if POOL_TUNING_CONFIG.warmup:
+            self._warm_up_pool()
+
+    def _warm_up_pool(self):
+        """
+        Open connections for the expected number of workers in parallel,
+        so the first batch does not pay connection setup serially.
+        Best effort: failures are logged and left to the regular retry path.
+        """
+        size = min(max(self.config.pool_min, PROCESSING_CONFIG.workers), self.config.pool_max)
+        connections = []
+        errors = []
+        try:
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                futures = [executor.submit(self.pool.acquire) for _ in range(size)]
+            # Each acquire is collected separately: one failure must not leak the others
+            for future in futures:
+                try:
+                    connections.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+            if errors:
+                logger.warning(
+                    f"Connection pool warm-up failed for {len(errors)} of {size} connections: {str(errors[0])}"
+                )
+            else:
+                logger.info(f"Connection pool warmed up with {size} connections")
+        finally:
+            for conn in connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.warning(f"Failed to release warm-up connection: {str(e)}")
 
     @retry_db_operation
     def get_connection(self):
         """Acquire a connection from the pool."""
         if not self.pool:
             raise RuntimeError("Connection pool is not initialized.")
-        return self.pool.acquire()
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        self.metrics.record_acquire(time.perf_counter() - started)
+        return conn
+
+    def _executemany(self, cursor, sql, rows, **kwargs):
+        """Execute a statement for many bind rows, recording latency and statement cache usage."""
+        self.metrics.query_started()
+        started = time.perf_counter()
+        try:
+            with span("db.executemany", QUERY, rows=len(rows)) as query_span:
+                if query_span.recording:
+                    query_span.set(statement=" ".join(sql.split()))
+                cursor.executemany(sql, rows, **kwargs)
+        finally:
+            self.metrics.record_query(sql, time.perf_counter() - started)
+
+    def _execute(self, cursor, sql, **binds):
+        """Execute a statement, recording its latency and statement cache usage."""
+        self.metrics.query_started()
+        started = time.perf_counter()
+        try:
+            with span("db.execute", QUERY) as query_span:
+                if query_span.recording:
+                    query_span.set(statement=" ".join(sql.split()))
+                cursor.execute(sql, **binds)
+        finally:
+            self.metrics.record_query(sql, time.perf_counter() - started)
+
+    def get_pool_metrics(self) -> dict:
+        """Pool telemetry: acquire wait, query latency, busy/open counts, stmt cache hit rate."""
+        return self.metrics.snapshot(self.pool)
+
+    def tune_pool(self) -> int:
+        """Adaptively resize the pool; returns the recommended number of workers."""
+        return self.pool_tuner.tune(self.pool)
 
     @retry_db_operation
     def close_pool(self):
@@ -44,17 +162,24 @@ class DB:
             logger.info("Database connection pool closed.")
 
     @retry_db_operation
-    def fetch_last_prediction(self):
+    def fetch_last_prediction(self, by_measurement_time: bool = False):
+        """
+        Return the most recently written prediction, or with by_measurement_time
+        the prediction of the newest measurement (write order differs from
+        measurement order when the freshest data is processed first). Legacy rows
+        without measurement_time sort last.
+        """
+        order = "measurement_time DESC NULLS LAST, prediction_time DESC" if by_measurement_time else "prediction_time DESC"
         conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute("""
+            self._execute(cursor, f"""
                 SELECT 
                     prediction_time, sensor_id, device_id, param1, param2, result
                 FROM table1
-                ORDER BY prediction_time DESC
+                ORDER BY {order}
                 FETCH FIRST 1 ROW ONLY
             """)
             row = cursor.fetchone()
@@ -75,26 +200,75 @@ class DB:
                 conn.close()  # Return to pool
 
     @retry_db_operation
-    def fetch_unprocessed_measurements_last24h(self):
-        """Возвращает все необработанные временные ряды с указанием количества рядов в измерении"""
+    def fetch_latest_state(self, group_by="device_id"):
+        """
+        Per-group generalization of fetch_last_prediction: the latest table1 row
+        for every value of `group_by` ("device_id" or "sensor_id"), as
+        {group value: dict shaped like fetch_last_prediction}.
+        """
+        if group_by not in ("device_id", "sensor_id"):
+            raise ValueError(f"Unsupported state grouping {group_by!r}")
         conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-    
-            # Получаем временной диапазон для выборки
-            cursor.execute("SELECT MAX(prediction_time) FROM table1")
-            max_pred_time_row = cursor.fetchone()
-            if not max_pred_time_row or not max_pred_time_row[0]:
-                logger.info("No predictions found in table1")
-                return []
-    
-            max_pred_time = max_pred_time_row[0]
-            min_time = max_pred_time - PROCESSING_CONFIG.late_data_tolerance
+            self._execute(cursor, f"""
+                SELECT prediction_time, sensor_id, device_id, param1, param2, result
+                FROM (
+                    SELECT t1.prediction_time, t1.sensor_id, t1.device_id, t1.param1, t1.param2, t1.result,
+                           ROW_NUMBER() OVER (PARTITION BY t1.{group_by} ORDER BY t1.prediction_time DESC) AS rn
+                    FROM table1 t1
+                )
+                WHERE rn = 1
+            """)
+            state = {}
+            for row in cursor:
+                latest = {
+                    "prediction_time": row[0],
+                    "sensor_id": row[1],
+                    "device_id": row[2],
+                    "param1": row[3],
+                    "param2": row[4],
+                    "result": row[5]
+                }
+                state[latest[group_by]] = latest
+            return state
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_unprocessed_measurements_last24h(self, shard_count=None, shard_ids=None, start=None, end=None):
+        """
+        Возвращает все необработанные временные ряды с указанием количества рядов в измерении.
+        start, end — границы measurement_time (включительно) для выборки частями; по умолчанию
+        окно late_data_tolerance до последнего предсказания.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            if start is not None and end is not None:
+                min_time, max_pred_time = start, end
+            else:
+                # Получаем временной диапазон для выборки
+                self._execute(cursor, "SELECT MAX(prediction_time) FROM table1")
+                max_pred_time_row = cursor.fetchone()
+                if not max_pred_time_row or not max_pred_time_row[0]:
+                    logger.info("No predictions found in table1")
+                    return []
+
+                max_pred_time = max_pred_time_row[0]
+                min_time = max_pred_time - self.late_data_tolerance
+            shard_clause, shard_binds = _shard_filter(shard_count, shard_ids)
     
             # Запрос всех временных рядов с флагом обработки
-            cursor.execute("""
+            self._execute(cursor, f"""
                 SELECT 
                     t2.sensor_id,
                     t2.device_id,
@@ -106,10 +280,15 @@ class DB:
                     SELECT 1 FROM table1 t1
                     WHERE t1.sensor_id = t2.sensor_id
                     AND t1.device_id = t2.device_id
-                    AND ABS(EXTRACT(EPOCH FROM (t1.prediction_time - t2.measurement_time))) < 1
+                    AND (
+                        t1.measurement_time = t2.measurement_time
+                        OR (t1.measurement_time IS NULL  -- записи до появления ключа измерения
+                            AND ABS(EXTRACT(EPOCH FROM (t1.prediction_time - t2.measurement_time))) < 1)
+                    )
                 )
+                {shard_clause}
                 ORDER BY t2.measurement_time, t2.sensor_id, t2.device_id
-            """, min_time=min_time, max_time=max_pred_time)
+            """, min_time=min_time, max_time=max_pred_time, **shard_binds)
     
             return [
                 {
@@ -127,6 +306,306 @@ class DB:
             if conn:
                 conn.close()
 
+    @retry_db_operation
+    def fetch_unprocessed_measurement_groups_last24h(
+        self, min_series: int, max_series: int, shard_count=None, shard_ids=None
+    ):
+        """
+        Вариант fetch_unprocessed_measurements_last24h с группировкой на стороне БД:
+        одна строка на (measurement_time, sensor_id, device_id) с количеством рядов,
+        JSON-массивом их данных и массивом SHA-1 их CLOB (hex, как в
+        fetch_unprocessed_series_index_last24h). Повторно вставленные ряды
+        (тот же хэш) отбрасываются до подсчёта, группы вне диапазона
+        [min_series, max_series] — до передачи CLOB-ов.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            # Получаем временной диапазон для выборки
+            self._execute(cursor, "SELECT MAX(prediction_time) FROM table1")
+            max_pred_time_row = cursor.fetchone()
+            if not max_pred_time_row or not max_pred_time_row[0]:
+                logger.info("No predictions found in table1")
+                return []
+
+            max_pred_time = max_pred_time_row[0]
+            min_time = max_pred_time - self.late_data_tolerance
+            shard_clause, shard_binds = _shard_filter(shard_count, shard_ids)
+
+            self._execute(cursor, f"""
+                SELECT 
+                    s.measurement_time,
+                    s.sensor_id,
+                    s.device_id,
+                    COUNT(*) AS series_count,
+                    JSON_ARRAYAGG(
+                        -- бинарные ряды (base64 с префиксом) встраиваются JSON-строкой
+                        CASE WHEN DBMS_LOB.SUBSTR(s.data, 5, 1) = 'TSB1:' THEN '"' || s.data || '"' ELSE s.data END
+                        FORMAT JSON ORDER BY s.content_hash RETURNING CLOB
+                    ) AS payload,
+                    JSON_ARRAYAGG(RAWTOHEX(s.content_hash) ORDER BY s.content_hash RETURNING CLOB) AS series_hashes
+                FROM (
+                    SELECT
+                        t2.measurement_time, t2.sensor_id, t2.device_id, t2.data,
+                        DBMS_CRYPTO.HASH(t2.data, 3 /* HASH_SH1 */) AS content_hash,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY t2.measurement_time, t2.sensor_id, t2.device_id,
+                                         DBMS_CRYPTO.HASH(t2.data, 3 /* HASH_SH1 */)
+                            ORDER BY t2.ROWID
+                        ) AS copy_number
+                    FROM table2 t2
+                    WHERE t2.measurement_time BETWEEN :min_time AND :max_time
+                    AND NOT EXISTS (
+                        SELECT 1 FROM table1 t1
+                        WHERE t1.sensor_id = t2.sensor_id
+                        AND t1.device_id = t2.device_id
+                        AND (
+                            t1.measurement_time = t2.measurement_time
+                            OR (t1.measurement_time IS NULL  -- записи до появления ключа измерения
+                                AND ABS(EXTRACT(EPOCH FROM (t1.prediction_time - t2.measurement_time))) < 1)
+                        )
+                    )
+                    {shard_clause}
+                ) s
+                WHERE s.copy_number = 1  -- повторно вставленный ряд считается один раз
+                GROUP BY s.measurement_time, s.sensor_id, s.device_id
+                HAVING COUNT(*) BETWEEN :min_series AND :max_series
+                ORDER BY s.measurement_time, s.sensor_id, s.device_id
+            """, min_time=min_time, max_time=max_pred_time, min_series=min_series, max_series=max_series, **shard_binds)
+
+            return [
+                {
+                    "measurement_time": row[0],
+                    "sensor_id": row[1],
+                    "device_id": row[2],
+                    "series_count": row[3],
+                    "payload": row[4].read() if hasattr(row[4], 'read') else row[4],  # Чтение CLOB
+                    "series_hashes": json.loads(row[5].read() if hasattr(row[5], 'read') else row[5])
+                }
+                for row in cursor
+            ]
+
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @retry_db_operation
+    def fetch_unprocessed_measurement_sizes_last24h(self, shard_count=None, shard_ids=None):
+        """
+        Размеры необработанных измерений без передачи данных: одна строка на
+        (measurement_time, sensor_id, device_id) с числом рядов и суммарной
+        длиной их CLOB. Используется для планирования выборки частями.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            # Получаем временной диапазон для выборки
+            self._execute(cursor, "SELECT MAX(prediction_time) FROM table1")
+            max_pred_time_row = cursor.fetchone()
+            if not max_pred_time_row or not max_pred_time_row[0]:
+                logger.info("No predictions found in table1")
+                return []
+
+            max_pred_time = max_pred_time_row[0]
+            min_time = max_pred_time - self.late_data_tolerance
+            shard_clause, shard_binds = _shard_filter(shard_count, shard_ids)
+
+            self._execute(cursor, f"""
+                SELECT
+                    t2.measurement_time,
+                    t2.sensor_id,
+                    t2.device_id,
+                    COUNT(*) AS series_count,
+                    SUM(DBMS_LOB.GETLENGTH(t2.data)) AS data_length
+                FROM table2 t2
+                WHERE t2.measurement_time BETWEEN :min_time AND :max_time
+                AND NOT EXISTS (
+                    SELECT 1 FROM table1 t1
+                    WHERE t1.sensor_id = t2.sensor_id
+                    AND t1.device_id = t2.device_id
+                    AND (
+                        t1.measurement_time = t2.measurement_time
+                        OR (t1.measurement_time IS NULL  -- записи до появления ключа измерения
+                            AND ABS(EXTRACT(EPOCH FROM (t1.prediction_time - t2.measurement_time))) < 1)
+                    )
+                )
+                {shard_clause}
+                GROUP BY t2.measurement_time, t2.sensor_id, t2.device_id
+                ORDER BY t2.measurement_time, t2.sensor_id, t2.device_id
+            """, min_time=min_time, max_time=max_pred_time, **shard_binds)
+
+            return [
+                {
+                    "measurement_time": row[0],
+                    "sensor_id": row[1],
+                    "device_id": row[2],
+                    "series_count": row[3],
+                    "data_length": row[4] or 0
+                }
+                for row in cursor
+            ]
+
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @retry_db_operation
+    def fetch_unprocessed_series_index_last24h(self, shard_count=None, shard_ids=None):
+        """
+        Возвращает ключи необработанных временных рядов без самих данных:
+        ROWID строки и хэш содержимого CLOB, вычисленный на стороне БД.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            # Получаем временной диапазон для выборки
+            self._execute(cursor, "SELECT MAX(prediction_time) FROM table1")
+            max_pred_time_row = cursor.fetchone()
+            if not max_pred_time_row or not max_pred_time_row[0]:
+                logger.info("No predictions found in table1")
+                return []
+
+            max_pred_time = max_pred_time_row[0]
+            min_time = max_pred_time - self.late_data_tolerance
+            shard_clause, shard_binds = _shard_filter(shard_count, shard_ids)
+
+            self._execute(cursor, f"""
+                SELECT 
+                    ROWIDTOCHAR(t2.ROWID),
+                    t2.sensor_id,
+                    t2.device_id,
+                    t2.measurement_time,
+                    DBMS_CRYPTO.HASH(t2.data, 3 /* HASH_SH1 */)
+                FROM table2 t2
+                WHERE t2.measurement_time BETWEEN :min_time AND :max_time
+                AND NOT EXISTS (
+                    SELECT 1 FROM table1 t1
+                    WHERE t1.sensor_id = t2.sensor_id
+                    AND t1.device_id = t2.device_id
+                    AND (
+                        t1.measurement_time = t2.measurement_time
+                        OR (t1.measurement_time IS NULL  -- записи до появления ключа измерения
+                            AND ABS(EXTRACT(EPOCH FROM (t1.prediction_time - t2.measurement_time))) < 1)
+                    )
+                )
+                {shard_clause}
+                ORDER BY t2.measurement_time, t2.sensor_id, t2.device_id
+            """, min_time=min_time, max_time=max_pred_time, **shard_binds)
+
+            return [
+                {
+                    "row_id": row[0],
+                    "sensor_id": row[1],
+                    "device_id": row[2],
+                    "measurement_time": row[3],
+                    "content_hash": row[4].hex() if isinstance(row[4], bytes) else str(row[4])
+                }
+                for row in cursor
+            ]
+
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @retry_db_operation
+    def fetch_series_data_by_row_ids(self, row_ids, chunk_size: int = 1000):
+        """Возвращает {row_id: data} для указанных строк table2 (IN-список не длиннее chunk_size)."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            result = {}
+            for start in range(0, len(row_ids), chunk_size):
+                chunk = row_ids[start:start + chunk_size]
+                binds = {f"r{i}": row_id for i, row_id in enumerate(chunk)}
+                placeholders = ", ".join(f"CHARTOROWID(:{name})" for name in binds)
+                self._execute(cursor, f"""
+                    SELECT ROWIDTOCHAR(t2.ROWID), t2.data
+                    FROM table2 t2
+                    WHERE t2.ROWID IN ({placeholders})
+                """, **binds)
+                for row in cursor:
+                    result[row[0]] = row[1].read() if hasattr(row[1], 'read') else row[1]  # Чтение CLOB
+            return result
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @retry_db_operation
+    def fetch_json_series_batch(self, after_row_id=None, limit: int = 500):
+        """
+        Return up to `limit` table2 rows still stored as JSON, in ROWID order after
+        `after_row_id`: dicts with row_id and data. Used by the binary format converter.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            after_clause = "AND t2.ROWID > CHARTOROWID(:after_row_id)" if after_row_id else ""
+            binds = {"after_row_id": after_row_id} if after_row_id else {}
+            self._execute(cursor, f"""
+                SELECT ROWIDTOCHAR(t2.ROWID), t2.data
+                FROM table2 t2
+                WHERE DBMS_LOB.SUBSTR(t2.data, 5, 1) <> 'TSB1:'
+                {after_clause}
+                ORDER BY t2.ROWID
+                FETCH FIRST :limit ROWS ONLY
+            """, limit=limit, **binds)
+            return [
+                {"row_id": row[0], "data": row[1].read() if hasattr(row[1], 'read') else row[1]}  # Чтение CLOB
+                for row in cursor
+            ]
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @retry_db_operation
+    def update_series_data(self, rows):
+        """Rewrite table2.data for the given rows ({"row_id", "data"}) in one transaction."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.setinputsizes(data=_load_driver().DB_TYPE_CLOB)
+            self._executemany(cursor, """
+                UPDATE table2
+                SET data = :data
+                WHERE ROWID = CHARTOROWID(:row_id)
+            """, rows)
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to rewrite series data: {str(e)}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     @retry_db_operation
     def fetch_new_measurements(self, last_prediction_time):
         conn = None
@@ -134,7 +613,7 @@ class DB:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute("""
+            self._execute(cursor, """
                 SELECT 
                     sensor_id, device_id, measurement_time, data
                 FROM table2
@@ -157,6 +636,216 @@ class DB:
             if conn:
                 conn.close()  # Return to pool
 
+    @retry_db_operation
+    def fetch_sensor_segments(self, start_time, end_time):
+        """
+        Returns the points in [start_time, end_time) where the measuring sensor changes,
+        as a time-ordered list of {"start_time", "sensor_id"} (the first row opens the range).
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT measurement_time, sensor_id
+                FROM (
+                    SELECT 
+                        measurement_time,
+                        sensor_id,
+                        LAG(sensor_id) OVER (ORDER BY measurement_time, sensor_id) AS prev_sensor_id
+                    FROM table2
+                    WHERE measurement_time >= :start_time AND measurement_time < :end_time
+                )
+                WHERE prev_sensor_id IS NULL OR prev_sensor_id != sensor_id
+                ORDER BY measurement_time
+            """, start_time=start_time, end_time=end_time)
+            return [{"start_time": row[0], "sensor_id": row[1]} for row in cursor]
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_measurements_between(self, start_time, end_time, sensor_id):
+        """Returns all series of a sensor with measurement_time in [start_time, end_time)."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT sensor_id, device_id, measurement_time, data
+                FROM table2
+                WHERE sensor_id = :sensor_id
+                  AND measurement_time >= :start_time
+                  AND measurement_time < :end_time
+                ORDER BY measurement_time, device_id
+            """, sensor_id=sensor_id, start_time=start_time, end_time=end_time)
+            return [
+                {
+                    "sensor_id": row[0],
+                    "device_id": row[1],
+                    "measurement_time": row[2],
+                    "data": row[3].read() if hasattr(row[3], 'read') else row[3]  # Чтение CLOB
+                }
+                for row in cursor
+            ]
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_predictions_after(self, after=None, lag_seconds: int = 60, limit: int = 10000):
+        """
+        Return up to `limit` table1 rows in (prediction_time, ROWID) order after the
+        `after` watermark ({"prediction_time", "row_id"}). Rows younger than
+        `lag_seconds` are left for the next call, so transactions still committing
+        with an earlier SYSTIMESTAMP are not skipped. Used by the columnar export.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            binds = {"lag_seconds": lag_seconds, "limit": limit}
+            after_clause = ""
+            if after:
+                after_clause = """
+                    AND (t1.prediction_time > :after_time
+                         OR (t1.prediction_time = :after_time AND t1.ROWID > CHARTOROWID(:after_row_id)))
+                """
+                binds.update(after_time=after["prediction_time"], after_row_id=after["row_id"])
+            self._execute(cursor, f"""
+                SELECT ROWIDTOCHAR(t1.ROWID), t1.prediction_time, t1.sensor_id, t1.device_id,
+                       t1.measurement_time, t1.param1, t1.param2, t1.result, t1.quality_code
+                FROM table1 t1
+                WHERE t1.prediction_time < SYSTIMESTAMP - NUMTODSINTERVAL(:lag_seconds, 'SECOND')
+                {after_clause}
+                ORDER BY t1.prediction_time, t1.ROWID
+                FETCH FIRST :limit ROWS ONLY
+            """, **binds)
+            return [
+                {
+                    "row_id": row[0],
+                    "prediction_time": row[1],
+                    "sensor_id": row[2],
+                    "device_id": row[3],
+                    "measurement_time": row[4],
+                    "param1": row[5],
+                    "param2": row[6],
+                    "result": row[7],
+                    "quality_code": row[8]
+                }
+                for row in cursor
+            ]
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_series_for_measurements(self, keys, chunk_size: int = 500):
+        """
+        Return table2 series of the given measurements (sensor_id, device_id,
+        measurement_time) as dicts with those fields and data, ordered by key.
+        """
+        conn = None
+        cursor = None
+        result = []
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            for start in range(0, len(keys), chunk_size):
+                chunk = keys[start:start + chunk_size]
+                binds = {}
+                tuples = []
+                for i, (sensor_id, device_id, measurement_time) in enumerate(chunk):
+                    binds.update({f"s{i}": sensor_id, f"d{i}": device_id, f"m{i}": measurement_time})
+                    tuples.append(f"(:s{i}, :d{i}, :m{i})")
+                self._execute(cursor, f"""
+                    SELECT sensor_id, device_id, measurement_time, data
+                    FROM table2
+                    WHERE (sensor_id, device_id, measurement_time) IN ({", ".join(tuples)})
+                    ORDER BY sensor_id, device_id, measurement_time
+                """, **binds)
+                result.extend(
+                    {
+                        "sensor_id": row[0],
+                        "device_id": row[1],
+                        "measurement_time": row[2],
+                        "data": row[3].read() if hasattr(row[3], 'read') else row[3]  # Чтение CLOB
+                    }
+                    for row in cursor
+                )
+            return result
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_sensor_params(self, sensor_id):
+        """Returns the latest calibration params (param1, param2) used for the sensor, or None."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT param1, param2
+                FROM table1
+                WHERE sensor_id = :sensor_id
+                ORDER BY prediction_time DESC
+                FETCH FIRST 1 ROW ONLY
+            """, sensor_id=sensor_id)
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_sensor_params_at(self, sensor_id, at_time):
+        """
+        Returns the calibration params (param1, param2) the sensor was used with at at_time:
+        those of its latest table1 row at or before at_time, else of its earliest row after it
+        (the sensor was first used later in the window). None if the sensor has no rows.
+        Legacy rows without measurement_time are placed at their prediction_time.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT param1, param2
+                FROM (
+                    SELECT param1, param2, NVL(measurement_time, prediction_time) AS used_at
+                    FROM table1
+                    WHERE sensor_id = :sensor_id
+                )
+                ORDER BY
+                    CASE WHEN used_at <= :at_time THEN 0 ELSE 1 END,
+                    CASE WHEN used_at <= :at_time THEN used_at END DESC,
+                    used_at
+                FETCH FIRST 1 ROW ONLY
+            """, sensor_id=sensor_id, at_time=at_time)
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
     @retry_db_operation
     def fetch_last_measurement_for_sensor_device_before_time(self, sensor_id: int, device_id: int, timestamp):
         conn = None
@@ -164,7 +853,7 @@ class DB:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute("""
+            self._execute(cursor, """
                 SELECT sensor_id, device_id, measurement_time, data
                 FROM table2
                 WHERE sensor_id = :sensor_id
@@ -196,12 +885,13 @@ class DB:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute("""
+            self._execute(cursor, """
                 INSERT INTO table1 (prediction_time, sensor_id, device_id, param1, param2, result)
                 VALUES (SYSTIMESTAMP, :sensor_id, :device_id, :param1, :param2, :result)
             """, sensor_id=sensor_id, device_id=device_id, param1=param1, param2=param2, result=result)
             conn.commit()
-            logger.debug(f"Inserted prediction for sensor {sensor_id}, device {device_id}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Inserted prediction for sensor {sensor_id}, device {device_id}")
         except Exception as e:
             logger.error(f"Failed to insert prediction: {str(e)}")
             if conn:
@@ -211,4 +901,437 @@ class DB:
             if cursor:
                 cursor.close()
             if conn:
-                conn.close()  # Return to pool
\ No newline at end of file
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def insert_predictions_batch(self, predictions, checkpoint, target_version=None):
+        """
+        Idempotently write a batch of predictions and advance the processing
+        checkpoint in the same transaction.
+
+        predictions: dicts with sensor_id, device_id, measurement_time, param1, param2, result
+        and quality_code (reason the model was skipped, result is then None).
+        checkpoint: dict with pipeline_id, last_measurement_time, last_sensor_id,
+        last_device_id and processed (number of predictions in the batch).
+        target_version: when set, rows go to prediction_backfill under that version
+        instead of table1.
+
+        Writes to table1 also advance sensor_usage by the number of rows actually
+        inserted, except DUPLICATE_MEASUREMENT rows. Returns those per-sensor
+        increments (empty for backfill writes).
+        """
+        conn = None
+        cursor = None
+        usage_increments = Counter()
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            if target_version is not None:
+                self._executemany(cursor, """
+                    MERGE INTO prediction_backfill pb
+                    USING (
+                        SELECT :version AS version, :sensor_id AS sensor_id,
+                               :device_id AS device_id, :measurement_time AS measurement_time
+                        FROM dual
+                    ) src
+                    ON (pb.version = src.version
+                        AND pb.sensor_id = src.sensor_id
+                        AND pb.device_id = src.device_id
+                        AND pb.measurement_time = src.measurement_time)
+                    WHEN NOT MATCHED THEN
+                        INSERT (version, sensor_id, device_id, measurement_time, param1, param2, result, quality_code, created_at)
+                        VALUES (src.version, src.sensor_id, src.device_id, src.measurement_time,
+                                :param1, :param2, :result, :quality_code, SYSTIMESTAMP)
+                """, [dict(prediction, version=target_version) for prediction in predictions])
+            else:
+                self._executemany(cursor, """
+                    MERGE INTO table1 t1
+                    USING (
+                        SELECT :sensor_id AS sensor_id, :device_id AS device_id, :measurement_time AS measurement_time
+                        FROM dual
+                    ) src
+                    ON (t1.sensor_id = src.sensor_id
+                        AND t1.device_id = src.device_id
+                        AND t1.measurement_time = src.measurement_time)
+                    WHEN NOT MATCHED THEN
+                        INSERT (prediction_time, sensor_id, device_id, measurement_time, param1, param2, result, quality_code)
+                        VALUES (SYSTIMESTAMP, src.sensor_id, src.device_id, src.measurement_time,
+                                :param1, :param2, :result, :quality_code)
+                """, predictions, arraydmlrowcounts=True)
+                # Счётчик растёт только на действительно вставленные строки: повтор батча его не меняет
+                for prediction, inserted in zip(predictions, cursor.getarraydmlrowcounts()):
+                    if inserted and prediction.get("quality_code") != DUPLICATE_MEASUREMENT:
+                        usage_increments[prediction["sensor_id"]] += inserted
+                if usage_increments:
+                    self._executemany(cursor, """
+                        MERGE INTO sensor_usage su
+                        USING (SELECT :sensor_id AS sensor_id FROM dual) src
+                        ON (su.sensor_id = src.sensor_id)
+                        WHEN MATCHED THEN UPDATE SET
+                            su.usage_count = su.usage_count + :inserted,
+                            su.updated_at = SYSTIMESTAMP
+                        WHEN NOT MATCHED THEN
+                            INSERT (sensor_id, usage_count, updated_at)
+                            VALUES (src.sensor_id, :inserted, SYSTIMESTAMP)
+                    """, [
+                        {"sensor_id": sensor_id, "inserted": inserted}
+                        for sensor_id, inserted in usage_increments.items()
+                    ])
+            self._execute(cursor, """
+                MERGE INTO processing_checkpoint c
+                USING (SELECT :pipeline_id AS pipeline_id FROM dual) src
+                ON (c.pipeline_id = src.pipeline_id)
+                WHEN MATCHED THEN UPDATE SET
+                    c.last_measurement_time = :last_measurement_time,
+                    c.last_sensor_id = :last_sensor_id,
+                    c.last_device_id = :last_device_id,
+                    c.processed_total = c.processed_total + :processed,
+                    c.updated_at = SYSTIMESTAMP
+                WHEN NOT MATCHED THEN
+                    INSERT (pipeline_id, last_measurement_time, last_sensor_id, last_device_id, processed_total, updated_at)
+                    VALUES (src.pipeline_id, :last_measurement_time, :last_sensor_id, :last_device_id, :processed, SYSTIMESTAMP)
+            """, **checkpoint)
+            conn.commit()
+            logger.debug(
+                f"Wrote {len(predictions)} predictions, checkpoint {checkpoint['pipeline_id']} "
+                f"at {checkpoint['last_measurement_time']}"
+            )
+            return dict(usage_increments)
+        except Exception as e:
+            logger.error(f"Failed to write prediction batch: {str(e)}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_checkpoint(self, pipeline_id):
+        """Return the last committed processing checkpoint for the pipeline, or None."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT last_measurement_time, last_sensor_id, last_device_id, processed_total, updated_at
+                FROM processing_checkpoint
+                WHERE pipeline_id = :pipeline_id
+            """, pipeline_id=pipeline_id)
+            row = cursor.fetchone()
+            if row:
+                return {
+                    "pipeline_id": pipeline_id,
+                    "last_measurement_time": row[0],
+                    "last_sensor_id": row[1],
+                    "last_device_id": row[2],
+                    "processed_total": row[3],
+                    "updated_at": row[4]
+                }
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_sensor_usage(self, sensor_ids):
+        """Return {sensor_id: usage_count} from the maintained counters; unknown sensors are omitted."""
+        if not sensor_ids:
+            return {}
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            binds = {f"s{i}": sensor_id for i, sensor_id in enumerate(sensor_ids)}
+            placeholders = ", ".join(f":{name}" for name in binds)
+            self._execute(cursor, f"""
+                SELECT sensor_id, usage_count
+                FROM sensor_usage
+                WHERE sensor_id IN ({placeholders})
+            """, **binds)
+            return {row[0]: row[1] for row in cursor}
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_sensor_usage_history(self, sensor_id, start_time, end_time):
+        """
+        Return the sensor's usage as of start_time and the times of its later uses,
+        for measurements in the past where the maintained counter is already too high:
+        {"before": table1 rows used before start_time, "times": sorted use times in
+        [start_time, end_time)}. DUPLICATE_MEASUREMENT rows are not usage; legacy rows
+        without measurement_time count at their prediction_time.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                SELECT COUNT(*)
+                FROM table1
+                WHERE sensor_id = :sensor_id
+                AND {_COUNTS_AS_USAGE}
+                AND NVL(measurement_time, prediction_time) < :start_time
+            """, sensor_id=sensor_id, start_time=start_time)
+            before = cursor.fetchone()[0]
+            self._execute(cursor, f"""
+                SELECT NVL(measurement_time, prediction_time) AS used_at
+                FROM table1
+                WHERE sensor_id = :sensor_id
+                AND {_COUNTS_AS_USAGE}
+                AND NVL(measurement_time, prediction_time) >= :start_time
+                AND NVL(measurement_time, prediction_time) < :end_time
+                ORDER BY used_at
+            """, sensor_id=sensor_id, start_time=start_time, end_time=end_time)
+            return {"before": before, "times": [row[0] for row in cursor]}
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def rebuild_sensor_usage(self, sensor_id=None):
+        """
+        Recount sensor_usage from table1 (without DUPLICATE_MEASUREMENT rows),
+        for one sensor or for all of them.
+        Each step is a single statement, so it is safe to run while workers write.
+        Returns the number of counter rows written.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            sensor_clause = "AND sensor_id = :sensor_id" if sensor_id is not None else ""
+            binds = {"sensor_id": sensor_id} if sensor_id is not None else {}
+            self._execute(cursor, f"""
+                MERGE INTO sensor_usage su
+                USING (
+                    SELECT sensor_id, COUNT(*) AS usage_count
+                    FROM table1
+                    WHERE {_COUNTS_AS_USAGE}
+                    {sensor_clause}
+                    GROUP BY sensor_id
+                ) src
+                ON (su.sensor_id = src.sensor_id)
+                WHEN MATCHED THEN UPDATE SET
+                    su.usage_count = src.usage_count,
+                    su.updated_at = SYSTIMESTAMP
+                WHEN NOT MATCHED THEN
+                    INSERT (sensor_id, usage_count, updated_at)
+                    VALUES (src.sensor_id, src.usage_count, SYSTIMESTAMP)
+            """, **binds)
+            written = cursor.rowcount
+            # Счётчики сенсоров, у которых в table1 не осталось строк
+            self._execute(cursor, f"""
+                UPDATE sensor_usage su
+                SET usage_count = 0, updated_at = SYSTIMESTAMP
+                WHERE su.usage_count <> 0
+                AND NOT EXISTS (SELECT 1 FROM table1 t1 WHERE t1.sensor_id = su.sensor_id AND {_COUNTS_AS_USAGE})
+                {"AND su.sensor_id = :sensor_id" if sensor_id is not None else ""}
+            """, **binds)
+            written += cursor.rowcount
+            conn.commit()
+            return written
+        except Exception as e:
+            logger.error(f"Failed to rebuild sensor usage counters: {str(e)}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def check_sensor_usage(self):
+        """
+        Compare sensor_usage with COUNT(*) over table1 (without DUPLICATE_MEASUREMENT
+        rows); returns the sensors that disagree.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                SELECT NVL(su.sensor_id, t.sensor_id), su.usage_count, NVL(t.actual, 0)
+                FROM sensor_usage su
+                FULL OUTER JOIN (
+                    SELECT sensor_id, COUNT(*) AS actual FROM table1 WHERE {_COUNTS_AS_USAGE} GROUP BY sensor_id
+                ) t ON t.sensor_id = su.sensor_id
+                WHERE NVL(su.usage_count, -1) <> NVL(t.actual, 0)
+                ORDER BY 1
+            """)
+            return [{"sensor_id": row[0], "stored": row[1], "actual": row[2]} for row in cursor]
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def ensure_shards(self, shard_count):
+        """Create lease rows for shards 0..shard_count-1 if they do not exist yet."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._executemany(cursor, """
+                MERGE INTO work_lease wl
+                USING (SELECT :shard_id AS shard_id FROM dual) src
+                ON (wl.shard_id = src.shard_id)
+                WHEN NOT MATCHED THEN INSERT (shard_id) VALUES (src.shard_id)
+            """, [{"shard_id": shard_id} for shard_id in range(shard_count)])
+            conn.commit()
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def claim_shards(self, worker_id, shard_count, limit, ttl_seconds):
+        """
+        Claim up to `limit` free, expired or already owned shards for the worker.
+        SKIP LOCKED lets concurrent workers claim disjoint shards without blocking.
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT shard_id
+                FROM work_lease
+                WHERE shard_id < :shard_count
+                  AND (owner IS NULL OR owner = :worker_id OR lease_until < SYSTIMESTAMP)
+                ORDER BY CASE WHEN owner = :worker_id THEN 0 ELSE 1 END, shard_id
+                FOR UPDATE SKIP LOCKED
+            """, shard_count=shard_count, worker_id=worker_id)
+            shard_ids = [row[0] for row in cursor.fetchmany(limit)]
+            if shard_ids:
+                self._executemany(cursor, """
+                    UPDATE work_lease
+                    SET owner = :worker_id,
+                        lease_until = SYSTIMESTAMP + NUMTODSINTERVAL(:ttl_seconds, 'SECOND'),
+                        heartbeat_at = SYSTIMESTAMP
+                    WHERE shard_id = :shard_id
+                """, [
+                    {"worker_id": worker_id, "ttl_seconds": ttl_seconds, "shard_id": shard_id}
+                    for shard_id in shard_ids
+                ])
+            conn.commit()  # Снимает блокировки невыбранных строк
+            return shard_ids
+        except Exception:
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def renew_leases(self, worker_id, shard_ids, ttl_seconds):
+        """Extend the worker's leases; returns the shard ids that are still owned."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            renewed = []
+            for shard_id in shard_ids:
+                self._execute(cursor, """
+                    UPDATE work_lease
+                    SET lease_until = SYSTIMESTAMP + NUMTODSINTERVAL(:ttl_seconds, 'SECOND'),
+                        heartbeat_at = SYSTIMESTAMP
+                    WHERE shard_id = :shard_id AND owner = :worker_id
+                """, ttl_seconds=ttl_seconds, shard_id=shard_id, worker_id=worker_id)
+                if cursor.rowcount:
+                    renewed.append(shard_id)
+            conn.commit()
+            return renewed
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def release_leases(self, worker_id):
+        """Release all leases held by the worker."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                UPDATE work_lease
+                SET owner = NULL, lease_until = NULL
+                WHERE owner = :worker_id
+            """, worker_id=worker_id)
+            conn.commit()
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def fetch_sensor_calibration(self, sensor_id):
+        """Return (param1, param2) published for the sensor by the calibrating worker, or None."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT param1, param2
+                FROM sensor_calibration
+                WHERE sensor_id = :sensor_id
+            """, sensor_id=sensor_id)
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
+
+    @retry_db_operation
+    def save_sensor_calibration(self, sensor_id, param1, param2, calibrated_by):
+        """Publish calibration params for the sensor (first writer wins)."""
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                MERGE INTO sensor_calibration sc
+                USING (SELECT :sensor_id AS sensor_id FROM dual) src
+                ON (sc.sensor_id = src.sensor_id)
+                WHEN NOT MATCHED THEN
+                    INSERT (sensor_id, param1, param2, calibrated_by, calibrated_at)
+                    VALUES (src.sensor_id, :param1, :param2, :calibrated_by, SYSTIMESTAMP)
+            """, sensor_id=sensor_id, param1=param1, param2=param2, calibrated_by=calibrated_by)
+            conn.commit()
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return to pool
@@ -0,0 +1,24 @@
+-- 001_idempotent_predictions.sql
+-- Ключ исходного измерения в table1 и таблица контрольных точек обработки.
+
+ALTER TABLE table1 ADD (measurement_time TIMESTAMP);
+
+-- Одна запись предсказания на исходное измерение: повторная запись через MERGE не создаёт дублей.
+-- У старых строк measurement_time пуст; выражения индекса для них целиком NULL, такие строки
+-- в уникальный индекс не попадают (обычный индекс по трём столбцам падал бы с ORA-01452)
+CREATE UNIQUE INDEX table1_source_measurement_uk ON table1 (
+    CASE WHEN measurement_time IS NOT NULL THEN sensor_id END,
+    CASE WHEN measurement_time IS NOT NULL THEN device_id END,
+    measurement_time
+);
+-- Поиск строки по ключу в MERGE и антиджойне выборки идёт по самим столбцам
+CREATE INDEX table1_source_measurement_ix ON table1 (sensor_id, device_id, measurement_time);
+
+CREATE TABLE processing_checkpoint (
+    pipeline_id           VARCHAR2(64) PRIMARY KEY,
+    last_measurement_time TIMESTAMP,
+    last_sensor_id        NUMBER,
+    last_device_id        NUMBER,
+    processed_total       NUMBER DEFAULT 0 NOT NULL,
+    updated_at            TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+);
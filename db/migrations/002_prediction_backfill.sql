@@ -0,0 +1,14 @@
+-- 002_prediction_backfill.sql
+-- Версионированная целевая таблица исторического пересчёта (backfill).
+
+CREATE TABLE prediction_backfill (
+    version          VARCHAR2(64) NOT NULL,
+    sensor_id        NUMBER NOT NULL,
+    device_id        NUMBER NOT NULL,
+    measurement_time TIMESTAMP NOT NULL,
+    param1           NUMBER,
+    param2           NUMBER,
+    result           NUMBER,
+    created_at       TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL,
+    CONSTRAINT prediction_backfill_pk PRIMARY KEY (version, sensor_id, device_id, measurement_time)
+);
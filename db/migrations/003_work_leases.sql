@@ -0,0 +1,17 @@
+-- 003_work_leases.sql
+-- Аренда шардов устройств воркерами и общие параметры калибровки сенсоров.
+
+CREATE TABLE work_lease (
+    shard_id     NUMBER PRIMARY KEY,
+    owner        VARCHAR2(128),
+    lease_until  TIMESTAMP,
+    heartbeat_at TIMESTAMP
+);
+
+CREATE TABLE sensor_calibration (
+    sensor_id     NUMBER PRIMARY KEY,
+    param1        NUMBER NOT NULL,
+    param2        NUMBER NOT NULL,
+    calibrated_by VARCHAR2(128),
+    calibrated_at TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+);
@@ -0,0 +1,13 @@
+-- 004_sensor_usage.sql
+-- Счётчик использований сенсора (число предсказаний в table1), вход модели деградации.
+-- Обновляется в одной транзакции с записью предсказаний; сверка и пересборка — usage_counters.py.
+
+CREATE TABLE sensor_usage (
+    sensor_id   NUMBER PRIMARY KEY,
+    usage_count NUMBER DEFAULT 0 NOT NULL,
+    updated_at  TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+);
+
+INSERT INTO sensor_usage (sensor_id, usage_count)
+SELECT sensor_id, COUNT(*) FROM table1 GROUP BY sensor_id;
+COMMIT;
@@ -0,0 +1,5 @@
+-- 005_quality_code.sql
+-- Код причины, по которой измерение не передавалось модели (result при этом NULL).
+
+ALTER TABLE table1 ADD (quality_code VARCHAR2(32));
+ALTER TABLE prediction_backfill ADD (quality_code VARCHAR2(32));
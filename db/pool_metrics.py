@@ -0,0 +1,132 @@
+# db/pool_metrics.py
+import logging
+import threading
+from collections import OrderedDict
+from config import DB_CONFIG, POOL_TUNING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """
+    Телеметрия пула соединений: ожидание acquire, латентность запросов
+    и оценка попаданий в кэш выражений.
+
+    oracledb не отдаёт статистику statement cache, поэтому попадания
+    оцениваются на стороне клиента: LRU размером stmt_cache_size по тексту SQL.
+    """
+
+    def __init__(self, stmt_cache_size: int = 20):
+        self._lock = threading.Lock()
+        self.stmt_cache_size = stmt_cache_size
+        self._stmt_lru: OrderedDict = OrderedDict()
+        self.acquire_count = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.query_count = 0
+        self.query_time_total = 0.0
+        self.stmt_cache_hits = 0
+        self.stmt_cache_misses = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def query_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def record_acquire(self, wait: float) -> None:
+        with self._lock:
+            self.acquire_count += 1
+            self.acquire_wait_total += wait
+            self.acquire_wait_max = max(self.acquire_wait_max, wait)
+
+    def record_query(self, sql: str, elapsed: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.query_count += 1
+            self.query_time_total += elapsed
+            if sql in self._stmt_lru:
+                self._stmt_lru.move_to_end(sql)
+                self.stmt_cache_hits += 1
+            else:
+                self.stmt_cache_misses += 1
+                self._stmt_lru[sql] = True
+                if len(self._stmt_lru) > self.stmt_cache_size:
+                    self._stmt_lru.popitem(last=False)
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            statements = self.stmt_cache_hits + self.stmt_cache_misses
+            data = {
+                "acquire_count": self.acquire_count,
+                "acquire_wait_avg": self.acquire_wait_total / self.acquire_count if self.acquire_count else 0.0,
+                "acquire_wait_max": self.acquire_wait_max,
+                "query_count": self.query_count,
+                "query_latency_avg": self.query_time_total / self.query_count if self.query_count else 0.0,
+                "stmt_cache_hit_rate": self.stmt_cache_hits / statements if statements else 0.0,
+                "peak_in_flight": self.peak_in_flight,
+            }
+        if pool is not None:
+            data["busy"] = pool.busy
+            data["opened"] = pool.opened
+            data["max"] = pool.max
+        return data
+
+
+class PoolTuner:
+    """
+    Адаптивный подбор размера пула и числа воркеров по окну наблюдений.
+
+    При PoolGetMode.WAIT заметное ожидание acquire означает, что все
+    соединения были заняты: тогда пул растёт (до adaptive_max). Если ожидания
+    нет и пиковое число параллельных запросов меньше половины пула — пул
+    сжимается (до pool_min).
+    Число воркеров следует за размером пула в пределах min/max_workers.
+    """
+
+    def __init__(self, metrics: PoolMetrics, db_config=None):
+        self.metrics = metrics
+        self._db_config = db_config  # DatabaseConfig сайта; None — DB_CONFIG
+        self._last = {"acquire_count": 0, "acquire_wait_total": 0.0, "query_count": 0, "query_time_total": 0.0}
+
+    def _window(self) -> tuple[float, float, int]:
+        """Среднее ожидание acquire, латентность запроса и пик параллелизма с прошлого вызова."""
+        m = self.metrics
+        with m._lock:
+            current = {
+                "acquire_count": m.acquire_count,
+                "acquire_wait_total": m.acquire_wait_total,
+                "query_count": m.query_count,
+                "query_time_total": m.query_time_total,
+            }
+            peak = m.peak_in_flight
+            m.peak_in_flight = m.in_flight
+        acquires = current["acquire_count"] - self._last["acquire_count"]
+        queries = current["query_count"] - self._last["query_count"]
+        wait = (current["acquire_wait_total"] - self._last["acquire_wait_total"]) / acquires if acquires else 0.0
+        latency = (current["query_time_total"] - self._last["query_time_total"]) / queries if queries else 0.0
+        self._last = current
+        return wait, latency, peak
+
+    def tune(self, pool) -> int:
+        """Перенастраивает пул и возвращает рекомендуемое число воркеров."""
+        wait, latency, peak = self._window()
+        db_config = self._db_config if self._db_config is not None else DB_CONFIG
+        current_max = pool.max
+        new_max = current_max
+        starved = latency > 0 and wait > POOL_TUNING_CONFIG.wait_ratio * latency
+
+        if starved:
+            new_max = min(current_max + db_config.pool_increment, POOL_TUNING_CONFIG.adaptive_max)
+        elif peak * 2 < current_max:
+            new_max = max(current_max - db_config.pool_increment, db_config.pool_min)
+
+        if new_max != current_max:
+            pool.reconfigure(max=new_max)
+            logger.info(
+                f"Pool resized: max {current_max} -> {new_max} "
+                f"(acquire wait {wait:.4f}s, query latency {latency:.4f}s, peak in-flight {peak})"
+            )
+
+        return max(POOL_TUNING_CONFIG.min_workers, min(new_max, POOL_TUNING_CONFIG.max_workers))
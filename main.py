@@ -1,7 +1,8 @@
 # main.py
 import logging
+from config import MULTI_SITE_CONFIG
 from services.application_service import ApplicationService
-from utils.retry import retry_db_operation
+from utils.retry import retry_db_operation, get_retry_metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,10 +13,14 @@ def main():
     Главная точка входа приложения.
     Координирует высокоуровневый workflow обработки измерений.
     """
+    if MULTI_SITE_CONFIG.sites_path:
+        run_sites()
+        return
     app_service = None
     try:
         app_service = ApplicationService()
         app_service.process_measurements()
+        app_service.export_results()
         
     except Exception as e:
         logger.error(f"Application failed: {str(e)}")
@@ -23,6 +28,18 @@ def main():
     finally:
         if app_service:
             app_service.cleanup()
+        logger.info(f"Retry metrics: {get_retry_metrics()}")
+
+def run_sites():
+    """Все площадки из SITES_CONFIG_PATH одним процессом на общем пуле воркеров."""
+    from services.multi_site import MultiSiteRunner, load_sites
+    sites = load_sites(MULTI_SITE_CONFIG.sites_path)
+    logger.info(f"Multi-site mode: {len(sites)} sites, {MULTI_SITE_CONFIG.workers} shared workers")
+    metrics = MultiSiteRunner(sites).run()
+    logger.info(f"Retry metrics: {get_retry_metrics()}")
+    failed = [name for name, site_metrics in metrics.items() if site_metrics["status"] != "ok"]
+    if failed:
+        raise RuntimeError(f"Sites failed: {failed}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
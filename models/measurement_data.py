@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Dict, Optional
-import json
+from utils.series_codec import decode_series
 
 class MeasurementData:
     def __init__(
@@ -18,18 +18,20 @@ class MeasurementData:
         self.raw_data = time_series_data if time_series_data else []
         self.param1 = None
         self.param2 = None
+        self.usage_count = None  # использований сенсора до этого измерения (вход модели деградации)
+        self.degradation_coefs = None  # (e, i) модели деградации; считаются на порцию в MeasurementProcessor
 
     def add_time_series(self, json_str: str):
-        """Добавляет временной ряд из JSON-строки CLOB"""
-        try:
-            time_series = json.loads(json_str)
-            if not isinstance(time_series, dict):
-                raise ValueError("JSON data must be a dictionary")
-            if "ts" not in time_series:
-                raise ValueError("Time series must contain 'ts' key")
-            self.raw_data.append(time_series)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in CLOB data: {str(e)}")
+        """Добавляет временной ряд из CLOB (JSON или бинарный формат utils.series_codec)"""
+        self.add_series(decode_series(json_str))
+
+    def add_series(self, time_series: Dict):
+        """Добавляет уже декодированный временной ряд"""
+        if not isinstance(time_series, dict):
+            raise ValueError("JSON data must be a dictionary")
+        if "ts" not in time_series:
+            raise ValueError("Time series must contain 'ts' key")
+        self.raw_data.append(time_series)
 
     def add_params(self, param1: float, param2: float):
         self.param1 = param1
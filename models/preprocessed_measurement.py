@@ -1,10 +1,118 @@
 # models/preprocessed_measurement.py
 import json
+import mmap
+import struct
+from datetime import datetime
+import numpy as np
+
+MAGIC = b"PMB1"
+ALIGNMENT = 64  # начало каждого массива выровнено, чтобы представления над буфером были эффективны
+_PREFIX = struct.Struct("<4sI")  # магия, длина JSON-заголовка
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
 class PreprocessedMeasurement:
     def __init__(self, processed_data):
         self.data = processed_data  # Может быть numpy array, dict, etc.
 
+    def _metadata(self) -> dict:
+        """Скалярные поля измерения в JSON-совместимом виде."""
+        meta = {}
+        for key, value in self.data.items():
+            if key == "time_series":
+                continue
+            if isinstance(value, datetime):
+                value = {"datetime": value.isoformat()}
+            elif isinstance(value, np.generic):
+                value = value.item()
+            meta[key] = value
+        return meta
+
     def to_json(self):
-        
-        return json.dumps({"data": "serialized_processed_data"})
-    
+        """Небольшой JSON-заголовок: поля измерения и длины рядов, без самих массивов."""
+        meta = self._metadata()
+        meta["series_lengths"] = [len(series.get("ts", ())) for series in self.data.get("time_series", [])]
+        return json.dumps(meta)
+
+    def to_bytes(self) -> bytes:
+        """
+        Бинарное представление: MAGIC, длина заголовка, JSON-заголовок с
+        полями и описанием массивов (dtype, shape, offset), затем данные
+        массивов, каждый с выравниванием ALIGNMENT. Массивы пишутся как есть,
+        без сериализации в текст.
+        """
+        series_meta = []
+        arrays = []
+        offset = 0
+        for series in self.data.get("time_series", []):
+            described = {}
+            for field, values in series.items():
+                if isinstance(values, (np.ndarray, list, tuple)):
+                    array = np.ascontiguousarray(values)
+                    offset = _aligned(offset)
+                    described[field] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+                    arrays.append((offset, array))
+                    offset += array.nbytes
+                else:
+                    described[field] = {"value": values}
+            series_meta.append(described)
+
+        header = json.dumps({"meta": self._metadata(), "series": series_meta}).encode()
+        data_start = _aligned(_PREFIX.size + len(header))
+        buffer = bytearray(data_start + offset)
+        _PREFIX.pack_into(buffer, 0, MAGIC, len(header))
+        buffer[_PREFIX.size:_PREFIX.size + len(header)] = header
+        for array_offset, array in arrays:
+            start = data_start + array_offset
+            buffer[start:start + array.nbytes] = array.tobytes()
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, buffer) -> "PreprocessedMeasurement":
+        """
+        Восстанавливает измерение из bytes, memoryview или mmap без копирования
+        массивов: ряды — представления np.frombuffer над буфером (только чтение
+        для неизменяемых буферов). Буфер должен жить, пока используются ряды.
+        """
+        view = memoryview(buffer)
+        magic, header_length = _PREFIX.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a serialized PreprocessedMeasurement")
+        header = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + header_length]))
+        data_start = _aligned(_PREFIX.size + header_length)
+
+        data = {}
+        for key, value in header["meta"].items():
+            if isinstance(value, dict) and "datetime" in value:
+                value = datetime.fromisoformat(value["datetime"])
+            data[key] = value
+
+        time_series = []
+        for described in header["series"]:
+            series = {}
+            for field, spec in described.items():
+                if "value" in spec:
+                    series[field] = spec["value"]
+                    continue
+                dtype = np.dtype(spec["dtype"])
+                count = int(np.prod(spec["shape"]))
+                series[field] = np.frombuffer(
+                    view, dtype=dtype, count=count, offset=data_start + spec["offset"]
+                ).reshape(spec["shape"])
+            time_series.append(series)
+        data["time_series"] = time_series
+        return cls(data)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "PreprocessedMeasurement":
+        """Загружает файл через memory map: массивы читаются с диска по мере обращения."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(mapped)
@@ -0,0 +1,55 @@
+# perf_gate.py
+import argparse
+import logging
+import sys
+from services.perf_gate import (
+    STAGES, Dataset, compare, format_report, load_baseline, run_benchmarks, save_baseline
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = "perf_baseline.json"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки стадий на синтетическом наборе и сравнение с базовой линией")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON базовой линии в репозитории")
+    parser.add_argument("--update", action="store_true", help="Записать прогон как новую базовую линию вместо сравнения")
+    parser.add_argument("--stage", action="append", choices=sorted(STAGES), help="Только эти стадии (можно повторять)")
+    parser.add_argument("--repeats", type=int, default=5, help="Замеряемых прогонов каждой стадии")
+    parser.add_argument("--sessions", type=int, default=3, help="Сессий (процессов) на стадию при сравнении")
+    parser.add_argument("--baseline-sessions", type=int, default=7, help="Сессий (процессов) на стадию при записи базовой линии")
+    parser.add_argument("--confirm", type=int, default=3,
+                        help="Сессий перезамера стадии с регрессией: она засчитывается, только если повторилась")
+    parser.add_argument("--min-tolerance", type=float, default=0.15, help="Минимальный допуск замедления (доля)")
+    parser.add_argument("--noise-factor", type=float, default=3.0, help="Допуск в шумах прогона")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2, help="Допуск роста пикового RSS (доля)")
+    return parser.parse_args(argv)
+
+
+def perf_gate(argv=None) -> int:
+    """Точка входа: 0 — регрессий нет (или базовая линия обновлена), 1 — есть регрессия."""
+    args = parse_args(argv)
+    if args.update:
+        save_baseline(run_benchmarks(Dataset(), stages=args.stage, repeats=args.repeats, sessions=args.baseline_sessions), args.baseline)
+        logger.info(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    thresholds = dict(min_tolerance=args.min_tolerance, noise_factor=args.noise_factor, rss_tolerance=args.rss_tolerance)
+    current = run_benchmarks(Dataset(), stages=args.stage, repeats=args.repeats, sessions=args.sessions)
+    checks = compare(baseline, current, **thresholds)
+    regressed = sorted({check.stage for check in checks if check.regressed})
+    if regressed and args.confirm:
+        # Разовая помеха машины не должна валить проверку: стадии с регрессией перезамеряются
+        logger.info(f"Confirming regressions in {regressed} with {args.confirm} more sessions")
+        rerun = run_benchmarks(Dataset(), stages=regressed, repeats=args.repeats, sessions=args.confirm)
+        current["stages"].update(rerun["stages"])
+        checks = compare(baseline, current, **thresholds)
+    print(format_report(checks, baseline, current))
+    return 1 if any(check.regressed for check in checks) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(perf_gate())
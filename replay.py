@@ -0,0 +1,68 @@
+# replay.py
+import argparse
+import logging
+import time
+from services.application_service import ApplicationService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Запись окна измерений в снимок и воспроизведение без БД")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Записать текущее окно выборки и контекст")
+    record.add_argument("snapshot", help="Файл снимка")
+    run = commands.add_parser("run", help="Прогнать конвейер на снимке, записи — в локальный приёмник")
+    run.add_argument("snapshot", help="Файл снимка")
+    run.add_argument("--sink", help="JSON Lines с предсказаниями (по умолчанию только в памяти)")
+    return parser.parse_args(argv)
+
+
+def _percentile(values, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def replay_report(snapshot_db, started: float, finished: float) -> dict:
+    """Пропускная способность и задержки записи батчей одного прогона."""
+    elapsed = finished - started
+    marks = [started] + snapshot_db.write_times
+    batch_latencies = [b - a for a, b in zip(marks, marks[1:])]
+    return {
+        "predictions": snapshot_db.predictions,
+        "batches": len(batch_latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "predictions_per_second": round(snapshot_db.predictions / elapsed, 2) if elapsed else 0.0,
+        "batch_latency_p50": round(_percentile(batch_latencies, 0.5), 4),
+        "batch_latency_p95": round(_percentile(batch_latencies, 0.95), 4),
+    }
+
+
+def replay(argv=None):
+    """Точка входа записи и воспроизведения снимков."""
+    args = parse_args(argv)
+    app_service = None
+    try:
+        if args.command == "record":
+            app_service = ApplicationService()
+            return app_service.record_snapshot(args.snapshot)
+
+        from services.snapshot import SnapshotDB
+        snapshot_db = SnapshotDB.load(args.snapshot, sink_path=args.sink)
+        # Журнал, индекс дубликатов и кэш рабочего конвейера при воспроизведении не трогаются
+        app_service = ApplicationService(db=snapshot_db, local_state=False)
+        started = time.perf_counter()
+        app_service.process_measurements()
+        report = replay_report(snapshot_db, started, time.perf_counter())
+        logger.info(f"Replay of {args.snapshot} finished: {report}")
+        return report
+    finally:
+        if app_service:
+            app_service.cleanup()
+
+
+if __name__ == "__main__":
+    replay()
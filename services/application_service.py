@@ -1,12 +1,18 @@
 # services/application_service.py
+import os
 import logging
+from datetime import timedelta
 from typing import Optional
+from config import POOL_TUNING_CONFIG, PROCESSING_CONFIG, CACHE_CONFIG, EXPORT_CONFIG
 from db.db import DB
 from services.data_fetcher import DataFetcher
 from services.measurement_processor import MeasurementProcessor
 from services.sensor_calibration_service import SensorCalibrationService
 from services.sensor_change_detector import SensorChangeDetector
+from services.freshness_scheduler import FreshnessScheduler
+from services.dedup_index import DUPLICATE_MEASUREMENT
 from models.measurement_data import MeasurementData
+from utils.tracing import RUN, get_tracer, span
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +21,63 @@ class ApplicationService:
     Основной сервис приложения, координирующий весь workflow обработки измерений.
     """
     
-    def __init__(self):
-        self.db = DB()
-        self.data_fetcher = DataFetcher(self.db)
+    def __init__(self, db=None, site: Optional[str] = None, local_state: bool = True):
+        self.db = db if db is not None else DB()  # SnapshotDB — воспроизведение записанного окна
+        # Имя сайта в многосайтовом режиме: у сайта свои контрольные точки, журнал и кэши
+        self.site = site
+        # False — без журнала, индекса дубликатов и кэша измерений (воспроизведение снимка
+        # не должно читать или менять локальное состояние рабочего конвейера)
+        self.local_state = local_state
+        self.pipeline_id = f"{PROCESSING_CONFIG.pipeline_id}:{site}" if site else PROCESSING_CONFIG.pipeline_id
+        self.data_fetcher = DataFetcher(
+            self.db, cache=self._create_measurement_cache(), dedup_index=self._create_dedup_index()
+        )
         self.sensor_change_detector = SensorChangeDetector(self.data_fetcher)
         self.calibration_service = SensorCalibrationService()
-        self.measurement_processor = MeasurementProcessor(self.db)
-        
+        self.measurement_processor = MeasurementProcessor(
+            self.db, journal=self._create_prediction_journal(), pipeline_id=self.pipeline_id
+        )
+        self.scheduler = FreshnessScheduler()
+        self.speculative_calibrator = self._create_speculative_calibrator()
+        self._lane_processors = {}
+
+    def _local_path(self, path: str) -> str:
+        """Путь локального состояния (журнал, кэш, индекс) с учётом сайта; пусто — состояние выключено."""
+        if not self.local_state:
+            return ""
+        return f"{path}.{self.site}" if self.site and path else path
+
+    def _create_measurement_cache(self):
+        """Создаёт локальный кэш измерений, если задан MEASUREMENT_CACHE_DIR."""
+        path = self._local_path(CACHE_CONFIG.measurement_cache_dir)
+        if not path:
+            return None
+        from services.measurement_cache import MeasurementCache
+        return MeasurementCache(path, CACHE_CONFIG.measurement_cache_max_bytes)
+
+    def _create_dedup_index(self):
+        """Создаёт индекс повторно вставленных измерений, если задан DEDUP_INDEX_PATH."""
+        path = self._local_path(CACHE_CONFIG.dedup_index_path)
+        if not path:
+            return None
+        from services.dedup_index import DedupIndex
+        return DedupIndex(path, timedelta(hours=CACHE_CONFIG.dedup_retention_hours))
+
+    def _create_speculative_calibrator(self):
+        """Создаёт фоновую калибровку новых сенсоров, если включён SPECULATIVE_CALIBRATION."""
+        if not PROCESSING_CONFIG.speculative_calibration:
+            return None
+        from services.speculative_calibration import SpeculativeCalibrator
+        return SpeculativeCalibrator(self.calibration_service)
+
+    def _create_prediction_journal(self):
+        """Создаёт журнал незаписанных предсказаний, если задан PREDICTION_JOURNAL_PATH."""
+        path = self._local_path(PROCESSING_CONFIG.journal_path)
+        if not path:
+            return None
+        from services.prediction_journal import PredictionJournal
+        return PredictionJournal(path)
+
     def process_measurements(self) -> None:
         """
         Основной метод обработки измерений:
@@ -30,53 +86,219 @@ class ApplicationService:
         3. Разделение пакета измерений по точке смены сенсора.
         4. Последовательная обработка каждой части пакета с соответствующими параметрами.
         """
+        with span("run", RUN, pipeline_id=self.pipeline_id, site=self.site):
+            self._process_measurements()
+
+    def _process_measurements(self) -> None:
+        # Дозапись результатов прерванного запуска до выборки, чтобы не пересчитывать их
+        self._recover_interrupted_run()
+        if PROCESSING_CONFIG.sensor_lanes:
+            self._process_by_sensor_lanes()
+            return
+
         # Шаг 1: Получение контекста
         context = self._get_processing_context()
         if not context:
             logger.error("Cannot establish processing context. Exiting.")
             return
             
-        # Шаг 2: Получение новых данных
-        all_new_measurements = self._get_new_measurements()
-        if not all_new_measurements:
+        # Шаг 2: Получение новых данных (целиком или микробатчами под бюджет памяти)
+        current_sensor_id = context["sensor_id"]
+        current_params = None
+        for all_new_measurements in self._iter_new_measurements():
+            self._record_duplicates(
+                lambda sensor_id: None if sensor_id != current_sensor_id
+                else current_params or (context["param1"], context["param2"])
+            )
+            if not all_new_measurements:
+                continue
+            if current_params is None:
+                current_params = (context["param1"], context["param2"])
+            if self.speculative_calibrator:
+                self.speculative_calibrator.observe(
+                    all_new_measurements, current_sensor_id, self._calibration_context(context, current_sensor_id, current_params)
+                )
+            current_sensor_id, current_params = self._process_with_sensor_change(
+                all_new_measurements, current_sensor_id, current_params, context
+            )
+        if current_params is None:
             logger.info("No new measurements to process.")
+
+    def export_results(self) -> None:
+        """Выгружает новые предсказания в колоночные файлы для аналитики, если задан EXPORT_DIR."""
+        if not EXPORT_CONFIG.export_dir:
             return
+        from services.columnar_export import ColumnarExporter
+        try:
+            # У площадки свой каталог выгрузки и своё состояние позиции
+            export_dir = os.path.join(EXPORT_CONFIG.export_dir, self.site) if self.site else None
+            with span("export", pipeline_id=self.pipeline_id) as stage:
+                stage.set(**ColumnarExporter(self.db, export_dir=export_dir).run())
+        except Exception as e:
+            # Выгрузка догонит на следующем цикле: позиция сдвигается только после записи файлов
+            logger.error(f"Columnar export failed: {str(e)}")
 
-        current_sensor_id = context["sensor_id"]
-        current_params = (context["param1"], context["param2"])
+    def record_snapshot(self, path: str) -> dict:
+        """Записывает текущее окно выборки и контекст в снимок для воспроизведения (см. replay.py)."""
+        from services.snapshot import record_snapshot
+        return record_snapshot(self.db, path)
 
+    def _process_by_sensor_lanes(self) -> None:
+        """Обработка с состоянием по сенсорам и устройствам: каждый сенсор в своей полосе."""
+        from services.sensor_lanes import SensorLanes
+        device_state = self.data_fetcher.get_latest_state("device_id")
+        if not device_state:
+            logger.error("Cannot establish processing context. Exiting.")
+            return
+        lanes = SensorLanes(
+            self.calibration_service, self._lane_processor,
+            device_state=device_state, sensor_state=self.data_fetcher.get_latest_state("sensor_id")
+        )
+        processed = None
+        for measurements in self._iter_new_measurements():
+            self._record_duplicates(lanes.params.get, self._lane_processor)
+            if measurements:
+                processed = (processed or 0) + lanes.run(measurements)
+        if processed is None:
+            logger.info("No new measurements to process.")
+        else:
+            logger.info(f"Successfully processed {processed} measurements")
+
+    def _record_duplicates(self, params_for, processor_for=None) -> None:
+        """
+        Записывает повторно присланные измерения (DedupIndex) строками с quality_code
+        duplicate_measurement, чтобы они ушли из выборки необработанных.
+
+        Дубли пишутся до обработки пакета и только для сенсоров, у которых
+        params_for(sensor_id) знает параметры: строка дубля не должна стать
+        контекстом с другим сенсором. Дубли нового сенсора остаются
+        необработанными до следующего запуска. processor_for(sensor_id) —
+        процессор сенсора (по умолчанию основной).
+        """
+        by_sensor = {}
+        for measurement in self.data_fetcher.take_duplicates():
+            by_sensor.setdefault(measurement.sensor_id, []).append(measurement)
+        for sensor_id, duplicates in by_sensor.items():
+            params = params_for(sensor_id)
+            if params is None:
+                logger.info(f"{len(duplicates)} duplicate measurements of sensor {sensor_id} wait for its parameters")
+                continue
+            processor = processor_for(sensor_id) if processor_for else self.measurement_processor
+            written = processor.record_skipped(duplicates, params, DUPLICATE_MEASUREMENT)
+            logger.info(f"Recorded {written} duplicate measurements of sensor {sensor_id}")
+
+    def _lane_processor(self, sensor_id: int) -> MeasurementProcessor:
+        """MeasurementProcessor полосы сенсора: своя контрольная точка и свой журнал."""
+        if sensor_id not in self._lane_processors:
+            journal = None
+            if self._local_path(PROCESSING_CONFIG.journal_path):
+                from services.prediction_journal import PredictionJournal
+                journal = PredictionJournal(f"{self._local_path(PROCESSING_CONFIG.journal_path)}.sensor-{sensor_id}")
+            self._lane_processors[sensor_id] = MeasurementProcessor(
+                self.db,
+                workers=self.measurement_processor.workers,
+                journal=journal,
+                pipeline_id=f"{self.pipeline_id}:sensor:{sensor_id}",
+                usage_counter=self.measurement_processor.usage_counter,
+                quality_gate=self.measurement_processor.quality_gate
+            )
+        return self._lane_processors[sensor_id]
+
+    def _process_with_sensor_change(
+        self,
+        all_new_measurements: list[MeasurementData],
+        current_sensor_id: int,
+        current_params: tuple[float, float],
+        context: dict
+    ) -> tuple[int, tuple[float, float]]:
+        """
+        Шаги 3-4 для одного пакета измерений.
+        Возвращает сенсор и параметры, действующие после пакета (для следующего микробатча).
+        """
         # Шаг 3: Разделение пакета по смене сенсора
         pre_change_batch, post_change_batch = self.sensor_change_detector.partition_by_sensor_change(
             current_sensor_id, all_new_measurements
         )
+        parts = []
+        result = (current_sensor_id, current_params)
 
-        # Шаг 4.1: Обработка измерений со старого сенсора (если они есть)
+        # Шаг 4.1: Измерения со старого сенсора (если они есть) — с текущими параметрами
         if pre_change_batch:
             logger.info(f"Processing {len(pre_change_batch)} measurements for sensor {current_sensor_id} with existing params.")
-            self._process_measurements_with_predictions(pre_change_batch, current_params)
+            parts.append((pre_change_batch, current_params))
+            if PROCESSING_CONFIG.scheduling != "freshest_first":
+                # В хронологическом порядке эти измерения обрабатываются, пока новый сенсор калибруется в фоне
+                self._process_parts(parts)
+                parts = []
 
-        # Шаг 4.2: Обработка измерений с нового сенсора (если они есть)
+        # Шаг 4.2: Измерения с нового сенсора (если они есть) — калибровка до любой их обработки
         if post_change_batch:
             new_sensor_id = post_change_batch[0].sensor_id
             logger.info(f"Recalibrating for sensor change from {current_sensor_id} to {new_sensor_id}.")
             
             try:
-                # Выполняем калибровку на данных нового сенсора
-                new_params = self.calibration_service.recalibrate_for_sensor_change(
-                    old_sensor=current_sensor_id,
-                    new_sensor=new_sensor_id,
-                    measurements=post_change_batch, # Калибруемся на данных после смены
-                    context=context
+                new_params = self._calibrate(
+                    current_sensor_id, new_sensor_id, post_change_batch,
+                    self._calibration_context(context, current_sensor_id, current_params)
                 )
                 logger.info(f"Processing {len(post_change_batch)} measurements for new sensor {new_sensor_id} with new params.")
-                self._process_measurements_with_predictions(post_change_batch, new_params)
+                parts.append((post_change_batch, new_params))
+                result = (new_sensor_id, new_params)
             except Exception as e:
                 logger.error(f"Failed to recalibrate and process for new sensor {new_sensor_id}. "
                              f"Measurements will be skipped. Error: {e}")
 
+        self._process_parts(parts)
+        return result
+
+    @staticmethod
+    def _calibration_context(context: dict, sensor_id: int, params: tuple[float, float]) -> dict:
+        return dict(context, sensor_id=sensor_id, param1=params[0], param2=params[1])
+
+    def _calibrate(
+        self, old_sensor: int, new_sensor: int, measurements: list[MeasurementData], context: dict
+    ) -> tuple[float, float]:
+        """Параметры нового сенсора: результат фоновой калибровки, если она запущена, иначе синхронная калибровка."""
+        speculative = self.speculative_calibrator.take(old_sensor, new_sensor) if self.speculative_calibrator else None
+        with span("calibrate", old_sensor=old_sensor, new_sensor=new_sensor,
+                  measurements=len(measurements), speculative=speculative is not None):
+            if speculative is not None:
+                # Фоновая калибровка шла на тех же измерениях (первое на устройство), её ошибка повторилась бы
+                return speculative.result()
+            # Калибруемся на данных после смены
+            return self.calibration_service.recalibrate_for_sensor_change(
+                old_sensor=old_sensor,
+                new_sensor=new_sensor,
+                measurements=measurements,
+                context=context
+            )
+
+    def _process_parts(self, parts: list[tuple[list[MeasurementData], tuple[float, float]]]) -> None:
+        """Обрабатывает части пакета в хронологическом порядке или по приоритету свежести."""
+        if PROCESSING_CONFIG.scheduling != "freshest_first":
+            for measurements, params in parts:
+                self._process_measurements_with_predictions(measurements, params)
+            return
+        usage_counter = self.measurement_processor.usage_counter
+        if usage_counter is not None:
+            # Счётчики использований идут по времени измерений, а не по порядку записи
+            usage_counter.assign(sorted(
+                (measurement for measurements, _ in parts for measurement in measurements),
+                key=lambda measurement: measurement.measurement_time
+            ))
+        for chunk in self.scheduler.schedule(parts):
+            logger.info(f"Processing {len(chunk.measurements)} measurements from the {chunk.lane} lane "
+                        f"(newest is {chunk.max_age} old)")
+            self._process_measurements_with_predictions(chunk.measurements, chunk.params, assign_usage=False)
+
     def _get_processing_context(self) -> Optional[dict]:
         """Получение контекста для обработки (последнее предсказание)."""
-        last_prediction = self.data_fetcher.get_last_prediction()
+        with span("context"):
+            # При обработке «сначала свежие» последней пишется не самая новая строка,
+            # поэтому контекст — предсказание самого нового измерения
+            last_prediction = self.data_fetcher.get_last_prediction(
+                by_measurement_time=PROCESSING_CONFIG.scheduling == "freshest_first"
+            )
         if not last_prediction:
             return None
             
@@ -84,21 +306,65 @@ class ApplicationService:
                    f"for sensor {last_prediction['sensor_id']}")
         return last_prediction
         
+    def _recover_interrupted_run(self) -> None:
+        """
+        Дописывает журнал прерванного запуска. Выборку контрольная точка не
+        сдвигает: продолжение идёт по антиджойну необработанных измерений,
+        а точка лишь показывает прогресс (продолжение по ней — у пересчёта истории).
+        """
+        with span("resume", pipeline_id=self.pipeline_id) as stage:
+            checkpoint = self.db.fetch_checkpoint(self.pipeline_id)
+            if checkpoint:
+                logger.info(f"Last checkpoint of pipeline {checkpoint['pipeline_id']}: "
+                            f"{checkpoint['last_measurement_time']} ({checkpoint['processed_total']} processed so far)")
+            replayed = self.measurement_processor.replay_journal()
+            if PROCESSING_CONFIG.sensor_lanes and self._local_path(PROCESSING_CONFIG.journal_path):
+                import glob
+                for path in glob.glob(f"{glob.escape(self._local_path(PROCESSING_CONFIG.journal_path))}.sensor-*"):
+                    replayed += self._lane_processor(int(path.rsplit("-", 1)[1])).replay_journal()
+            stage.set(replayed=replayed)
+        if replayed:
+            logger.info(f"Recovered {replayed} predictions without recomputation")
+
+    def _iter_new_measurements(self):
+        """Новые измерения: одним пакетом или микробатчами, если задан MEMORY_BUDGET_MB."""
+        if PROCESSING_CONFIG.memory_budget_bytes:
+            from services.memory_budget import MemoryBudget
+            budget = MemoryBudget(PROCESSING_CONFIG.memory_budget_bytes)
+            yield from self.data_fetcher.iter_new_measurement_batches(budget)
+            logger.info(f"Peak RSS growth during the run: {budget.peak_rss_growth / 2 ** 20:.0f} MB")
+        else:
+            yield self._get_new_measurements()
+
     def _get_new_measurements(self) -> list[MeasurementData]:
         """Получение новых измерений для обработки."""
-        measurements = self.data_fetcher.get_new_measurements()
+        with span("fetch", grouped=PROCESSING_CONFIG.server_side_grouping) as stage:
+            if PROCESSING_CONFIG.server_side_grouping:
+                measurements = self.data_fetcher.get_new_measurements_grouped()
+            else:
+                measurements = self.data_fetcher.get_new_measurements()
+            if stage.recording:
+                stage.set(measurements=len(measurements), series=sum(len(m.raw_data) for m in measurements))
         logger.info(f"Found {len(measurements)} new measurements")
         return measurements
         
-    def _process_measurements_with_predictions(self, measurements: list[MeasurementData], params: tuple[float, float]) -> None:
-        """Обработка измерений с применением ML-предсказаний."""
-        processed_count = self.measurement_processor.process_batch(measurements, params)
+    def _process_measurements_with_predictions(
+        self, measurements: list[MeasurementData], params: tuple[float, float], **options
+    ) -> None:
+        """Обработка измерений с применением ML-предсказаний (options — см. MeasurementProcessor.process_batch)."""
+        processed_count = self.measurement_processor.process_batch(measurements, params, **options)
         logger.info(f"Successfully processed {processed_count} measurements")
+        if POOL_TUNING_CONFIG.adaptive:
+            self.measurement_processor.workers = self.db.tune_pool()
         
     def cleanup(self) -> None:
         """Очистка ресурсов."""
         try:
+            get_tracer().flush()
+            if getattr(self, 'speculative_calibrator', None):
+                self.speculative_calibrator.shutdown()
             if hasattr(self, 'db'):
+                logger.info(f"Connection pool metrics: {self.db.get_pool_metrics()}")
                 self.db.close_pool()
                 logger.info("Database resources cleaned up")
         except Exception as e:
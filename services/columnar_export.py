@@ -0,0 +1,148 @@
+# services/columnar_export.py
+import os
+import json
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config import EXPORT_CONFIG
+from utils.series_codec import decode_series, SERIES_FIELDS
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_export_state.json"
+PREDICTION_COLUMNS = (
+    "prediction_time", "sensor_id", "device_id", "measurement_time", "param1", "param2", "result", "quality_code"
+)
+
+
+def _pyarrow():
+    """pyarrow нужен только для выгрузки и импортируется при первой записи."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def partition_key(row: Dict) -> Tuple[str, int]:
+    """Раздел файла: день измерения (для старых записей без ключа — день предсказания) и сенсор."""
+    day = (row.get("measurement_time") or row["prediction_time"]).date().isoformat()
+    return day, row["sensor_id"]
+
+
+class ColumnarExporter:
+    """
+    Инкрементальная выгрузка table1 (и по желанию рядов table2) в Parquet.
+
+    Файлы раскладываются по разделам {table}/day=YYYY-MM-DD/sensor_id=N/.
+    Позиция выгрузки — (prediction_time, ROWID) последней выгруженной строки —
+    хранится в _export_state.json и сдвигается после записи файлов батча.
+    Имя файла определяется первой строкой раздела в батче, поэтому после
+    сбоя до сохранения позиции повторная выгрузка перезаписывает те же файлы,
+    а не дублирует их. Свежие строки моложе commit_lag ждут следующего запуска.
+    """
+
+    def __init__(
+        self,
+        db,
+        export_dir: Optional[str] = None,
+        include_series: Optional[bool] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.db = db
+        self.export_dir = export_dir or EXPORT_CONFIG.export_dir
+        self.include_series = EXPORT_CONFIG.include_series if include_series is None else include_series
+        self.batch_size = batch_size or EXPORT_CONFIG.batch_size
+        self.state_path = os.path.join(self.export_dir, STATE_FILE)
+
+    def run(self) -> Dict[str, int]:
+        """Выгружает всё новое с прошлого запуска. Возвращает число строк и файлов."""
+        summary = {"predictions": 0, "series": 0, "files": 0}
+        watermark = self.load_state()
+        while True:
+            rows = self.db.fetch_predictions_after(
+                watermark, lag_seconds=int(EXPORT_CONFIG.commit_lag.total_seconds()), limit=self.batch_size
+            )
+            if not rows:
+                break
+            summary["files"] += self._export_predictions(rows)
+            summary["predictions"] += len(rows)
+            if self.include_series:
+                series_rows, files = self._export_series(rows)
+                summary["series"] += series_rows
+                summary["files"] += files
+            watermark = {"prediction_time": rows[-1]["prediction_time"], "row_id": rows[-1]["row_id"]}
+            self.save_state(watermark)
+            if len(rows) < self.batch_size:
+                break
+        if summary["predictions"]:
+            logger.info(f"Exported to {self.export_dir}: {summary}")
+        return summary
+
+    def load_state(self) -> Optional[Dict]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as f:
+            state = json.load(f)
+        return {"prediction_time": datetime.fromisoformat(state["prediction_time"]), "row_id": state["row_id"]}
+
+    def save_state(self, watermark: Dict) -> None:
+        os.makedirs(self.export_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"prediction_time": watermark["prediction_time"].isoformat(), "row_id": watermark["row_id"]}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _export_predictions(self, rows: List[Dict]) -> int:
+        partitions = defaultdict(list)
+        for row in rows:
+            partitions[partition_key(row)].append(row)
+        for partition, partition_rows in partitions.items():
+            self._write_partition("predictions", partition, partition_rows[0], {
+                column: [row[column] for row in partition_rows] for column in PREDICTION_COLUMNS
+            })
+        return len(partitions)
+
+    def _export_series(self, rows: List[Dict]) -> Tuple[int, int]:
+        """Декодированные ряды измерений выгруженных предсказаний: строка на ряд."""
+        first_row = {}
+        for row in rows:
+            if row["measurement_time"] is not None:
+                first_row.setdefault((row["sensor_id"], row["device_id"], row["measurement_time"]), row)
+        series_rows = self.db.fetch_series_for_measurements(list(first_row))
+
+        partitions = defaultdict(list)
+        for series_row in series_rows:
+            partitions[partition_key(series_row)].append(series_row)
+        for partition, partition_rows in partitions.items():
+            columns = {"sensor_id": [], "device_id": [], "measurement_time": [], "series_index": []}
+            columns.update({field: [] for field in SERIES_FIELDS})
+            index_by_key = defaultdict(int)
+            for series_row in partition_rows:
+                key = (series_row["sensor_id"], series_row["device_id"], series_row["measurement_time"])
+                series = decode_series(series_row["data"])
+                columns["sensor_id"].append(series_row["sensor_id"])
+                columns["device_id"].append(series_row["device_id"])
+                columns["measurement_time"].append(series_row["measurement_time"])
+                columns["series_index"].append(index_by_key[key])
+                index_by_key[key] += 1
+                for field in SERIES_FIELDS:
+                    columns[field].append([float(value) for value in series.get(field, ())])
+            first_key = min(index_by_key)
+            self._write_partition("series", partition, first_row[first_key], columns)
+        return len(series_rows), len(partitions)
+
+    def _write_partition(self, table: str, partition: Tuple[str, int], first_row: Dict, columns: Dict[str, list]) -> str:
+        pyarrow = _pyarrow()
+        day, sensor_id = partition
+        directory = os.path.join(self.export_dir, table, f"day={day}", f"sensor_id={sensor_id}")
+        os.makedirs(directory, exist_ok=True)
+        row_tag = hashlib.sha1(str(first_row["row_id"]).encode()).hexdigest()[:8]
+        path = os.path.join(directory, f"part-{first_row['prediction_time']:%Y%m%dT%H%M%S%f}-{row_tag}.parquet")
+        tmp_path = f"{path}.tmp"
+        pyarrow.parquet.write_table(pyarrow.table(columns), tmp_path)
+        os.replace(tmp_path, path)
+        return path
@@ -2,19 +2,30 @@
 from db.db import DB
 from models.measurement_data import MeasurementData
 import json
-from utils.validators import is_valid_measurement
+from utils.series_codec import decode_series
+from services.dedup_index import content_digest
+from utils.validators import is_valid_measurement, MIN_SERIES_COUNT, MAX_SERIES_COUNT
 from collections import defaultdict
+from datetime import datetime
 import logging
-from typing import List
+from typing import Iterator, List
 
 logger = logging.getLogger(__name__)
 
 class DataFetcher:
-    def __init__(self, db: DB):
+    def __init__(self, db: DB, cache=None, dedup_index=None):
         self.db = db
+        self.cache = cache  # MeasurementCache или None
+        self.dedup_index = dedup_index  # DedupIndex или None — без поиска повторно вставленных измерений
+        self.duplicates: List[MeasurementData] = []  # найденные индексом дубли, см. take_duplicates
+        self.shard_filter = None  # {"shard_count": ..., "shard_ids": [...]} в режиме шардирования
 
-    def get_last_prediction(self):
-        return self.db.fetch_last_prediction()
+    def get_last_prediction(self, by_measurement_time: bool = False):
+        return self.db.fetch_last_prediction(by_measurement_time=by_measurement_time)
+
+    def get_latest_state(self, group_by: str = "device_id") -> dict:
+        """Последнее предсказание каждой группы (устройства или сенсора)."""
+        return self.db.fetch_latest_state(group_by)
 
     def get_last_measurement_for_sensor_device_before(self, sensor_id: int, device_id: int, timestamp) -> MeasurementData:
         """
@@ -30,8 +41,8 @@ class DataFetcher:
             return None
 
         try:
-            raw_data = json.loads(row["data"].read() if hasattr(row["data"], 'read') else row["data"])
-        except (json.JSONDecodeError, TypeError):
+            raw_data = decode_series(row["data"].read() if hasattr(row["data"], 'read') else row["data"])
+        except (ValueError, TypeError):
             return None
 
         measurement = MeasurementData(
@@ -45,16 +56,93 @@ class DataFetcher:
     
     def get_new_measurements(self) -> List[MeasurementData]:
         """Получает новые измерения, группируя временные ряды по measurement_time, sensor_id, device_id"""
-        rows = self.db.fetch_unprocessed_measurements_last24h()
-        
-        # Группировка по уникальным измерениям
-        measurements_map = defaultdict(list)
+        if self.cache is not None:
+            return self._get_new_measurements_cached()
+
+        rows = self.db.fetch_unprocessed_measurements_last24h(**self._shard_kwargs())
+        measurements = self._build_measurements(rows, check_duplicates=True)
+        self._save_dedup_index()
+        return measurements
+
+    def iter_new_measurement_batches(self, budget) -> Iterator[List[MeasurementData]]:
+        """
+        Вариант get_new_measurements, выдающий новые измерения микробатчами
+        под бюджет памяти (services.memory_budget.MemoryBudget). Сначала
+        читаются только размеры измерений, затем данные каждого батча
+        отдельным запросом по диапазону measurement_time; измерения одного
+        момента времени всегда попадают в один батч.
+        """
+        from services.memory_budget import measurement_bytes
+
+        sizes = self.db.fetch_unprocessed_measurement_sizes_last24h(**self._shard_kwargs())
+        start = 0
+        while start < len(sizes):
+            limit = budget.batch_bytes()
+            end = start
+            estimated = 0.0
+            data_length = 0
+            while end < len(sizes):
+                measurement_time = sizes[end]["measurement_time"]
+                group_end = end
+                group_estimate = 0.0
+                group_length = 0
+                while group_end < len(sizes) and sizes[group_end]["measurement_time"] == measurement_time:
+                    group_estimate += budget.estimate(sizes[group_end]["data_length"])
+                    group_length += sizes[group_end]["data_length"]
+                    group_end += 1
+                if end > start and estimated + group_estimate > limit:
+                    break
+                estimated += group_estimate
+                data_length += group_length
+                end = group_end
+
+            rows = self.db.fetch_unprocessed_measurements_last24h(
+                start=sizes[start]["measurement_time"], end=sizes[end - 1]["measurement_time"], **self._shard_kwargs()
+            )
+            measurements = self._build_measurements(rows, check_duplicates=True)
+            del rows
+            budget.observe_batch(data_length, sum(measurement_bytes(m) for m in measurements))
+            logger.info(
+                f"Micro-batch of {len(measurements)} measurements "
+                f"({sizes[start]['measurement_time']} .. {sizes[end - 1]['measurement_time']}), "
+                f"{end}/{len(sizes)} planned"
+            )
+            yield measurements
+            budget.observe_rss()
+            start = end
+        self._save_dedup_index()
+
+    def get_measurements_between(self, start, end, sensor_id: int) -> List[MeasurementData]:
+        """Получает измерения сенсора в интервале [start, end) независимо от наличия предсказаний."""
+        rows = self.db.fetch_measurements_between(start, end, sensor_id)
+        return self._build_measurements(rows)
+
+    def _shard_kwargs(self) -> dict:
+        """Аргументы фильтра по шардам для запросов выборки (пусто вне режима шардирования)."""
+        return dict(self.shard_filter) if self.shard_filter else {}
+
+    def _build_measurements(self, rows, check_duplicates: bool = False) -> List[MeasurementData]:
+        """
+        Группирует строки рядов в измерения и оставляет полные и валидные.
+        Повторно вставленные ряды измерения отбрасываются до декодирования;
+        с check_duplicates — и измерения, уже выданные под другим временем.
+        """
+        # Группировка по уникальным измерениям, одинаковые ряды — один раз
+        measurements_map = defaultdict(dict)
         for row in rows:
             key = (row["measurement_time"], row["sensor_id"], row["device_id"])
-            measurements_map[key].append(row["data"])  # data - это CLOB с JSON
+            series_by_digest = measurements_map[key]
+            digest = content_digest(row["data"])  # data - это CLOB с JSON
+            if digest in series_by_digest:
+                logger.warning(f"Duplicate series dropped: sensor {key[1]}, device {key[2]} at {key[0]}")
+                continue
+            series_by_digest[digest] = row["data"]
 
         measurements = []
-        for (measurement_time, sensor_id, device_id), clob_data_list in measurements_map.items():
+        for (measurement_time, sensor_id, device_id), series_by_digest in measurements_map.items():
+            if self._is_duplicate_measurement(sensor_id, device_id, measurement_time, series_by_digest, check_duplicates):
+                continue
+            clob_data_list = list(series_by_digest.values())
             measurement = MeasurementData(
                 sensor_id=sensor_id,
                 device_id=device_id,
@@ -72,13 +160,155 @@ class DataFetcher:
                     )
                     continue
 
-            if measurement.is_complete() and is_valid_measurement(measurement):
-                measurements.append(measurement)
-            else:
+            self._collect_if_valid(measurement, measurements)
+
+        return sorted(measurements, key=lambda x: x.measurement_time)
+
+    def _is_duplicate_measurement(self, sensor_id, device_id, measurement_time, series_digests, check: bool) -> bool:
+        """series_digests — хэши рядов (content_digest), перебираются только при включённом индексе."""
+        if not check or self.dedup_index is None:
+            return False
+        series_digests = list(series_digests)
+        if self.dedup_index.is_duplicate(sensor_id, device_id, measurement_time, series_digests):
+            logger.warning(
+                f"Duplicate measurement skipped: sensor {sensor_id}, device {device_id} at {measurement_time} "
+                f"repeats an earlier measurement"
+            )
+            self.duplicates.append(MeasurementData(sensor_id, device_id, measurement_time, len(series_digests)))
+            return True
+        return False
+
+    def take_duplicates(self) -> List[MeasurementData]:
+        """Дубли, найденные с прошлого вызова: измерения без рядов, только ключ для записи с quality_code."""
+        duplicates, self.duplicates = self.duplicates, []
+        return duplicates
+
+    def _save_dedup_index(self) -> None:
+        if self.dedup_index is not None:
+            self.dedup_index.prune(datetime.now())
+            self.dedup_index.save()
+
+    def get_new_measurements_grouped(self) -> List[MeasurementData]:
+        """
+        Вариант get_new_measurements с группировкой на стороне БД.
+        Измерения с неподходящим количеством рядов отсекаются запросом и не передаются по сети.
+        """
+        rows = self.db.fetch_unprocessed_measurement_groups_last24h(
+            MIN_SERIES_COUNT, MAX_SERIES_COUNT, **self._shard_kwargs()
+        )
+
+        measurements = []
+        for row in rows:
+            sensor_id, device_id, measurement_time = row["sensor_id"], row["device_id"], row["measurement_time"]
+            measurement = MeasurementData(
+                sensor_id=sensor_id,
+                device_id=device_id,
+                measurement_time=measurement_time,
+                measurement_count=row["series_count"]
+            )
+
+            try:
+                series_list = json.loads(row["payload"])
+                if len(series_list) != len(row["series_hashes"]):
+                    raise ValueError(f"{len(series_list)} series but {len(row['series_hashes'])} hashes")
+            except (json.JSONDecodeError, TypeError, ValueError) as e:
                 logger.warning(
-                    f"Incomplete or invalid measurement: sensor {sensor_id}, "
-                    f"device {device_id} at {measurement_time} "
-                    f"(has {len(measurement.raw_data)} of {measurement.measurement_count} series)"
+                    f"Invalid aggregated payload for sensor {sensor_id}, "
+                    f"device {device_id} at {measurement_time}: {str(e)}"
+                )
+                continue
+
+            # Повторно вставленные ряды отброшены запросом. Хэши посчитаны БД по исходным
+            # CLOB: разобранный JSON хэшировать нельзя, иначе индекс дублей не совпадёт
+            # с другими путями выборки
+            series_by_digest = dict(zip((bytes.fromhex(h) for h in row["series_hashes"]), series_list))
+            if self._is_duplicate_measurement(sensor_id, device_id, measurement_time, series_by_digest, True):
+                continue
+
+            for time_series in series_by_digest.values():
+                try:
+                    # Бинарные ряды приходят в агрегате JSON-строками
+                    measurement.add_series(decode_series(time_series) if isinstance(time_series, str) else time_series)
+                except ValueError as e:
+                    logger.warning(
+                        f"Invalid time series data for sensor {sensor_id}, "
+                        f"device {device_id} at {measurement_time}: {str(e)}"
+                    )
+
+            self._collect_if_valid(measurement, measurements)
+
+        self._save_dedup_index()
+        return sorted(measurements, key=lambda x: x.measurement_time)
+
+    def _get_new_measurements_cached(self) -> List[MeasurementData]:
+        """
+        Вариант get_new_measurements с локальным кэшем: сначала читаются только
+        ключи и хэши рядов, CLOB передаются и декодируются лишь для промахов.
+        """
+        index_rows = self.db.fetch_unprocessed_series_index_last24h(**self._shard_kwargs())
+
+        rows_by_key = defaultdict(dict)
+        for row in index_rows:
+            # Ряды с одинаковым хэшем содержимого — повторная вставка, берётся одна строка
+            rows_by_key[(row["sensor_id"], row["device_id"], row["measurement_time"])].setdefault(row["content_hash"], row)
+
+        measurements = []
+        misses = {}
+        for key, rows_by_hash in rows_by_key.items():
+            sensor_id, device_id, measurement_time = key
+            if self._is_duplicate_measurement(
+                sensor_id, device_id, measurement_time, (bytes.fromhex(h) for h in rows_by_hash), True
+            ):
+                continue
+            rows = list(rows_by_hash.values())
+            content_hash = self.cache.content_hash(row["content_hash"] for row in rows)
+            cached_series = self.cache.get(key, content_hash)
+            if cached_series is None:
+                misses[key] = (rows, content_hash)
+                continue
+            measurement = MeasurementData(
+                sensor_id=sensor_id,
+                device_id=device_id,
+                measurement_time=measurement_time,
+                measurement_count=len(rows),
+                time_series_data=cached_series
+            )
+            self._collect_if_valid(measurement, measurements)
+
+        if misses:
+            row_ids = [row["row_id"] for rows, _ in misses.values() for row in rows]
+            data_by_row_id = self.db.fetch_series_data_by_row_ids(row_ids)
+            for (sensor_id, device_id, measurement_time), (rows, content_hash) in misses.items():
+                measurement = MeasurementData(
+                    sensor_id=sensor_id,
+                    device_id=device_id,
+                    measurement_time=measurement_time,
+                    measurement_count=len(rows)
                 )
+                for row in rows:
+                    try:
+                        measurement.add_time_series(data_by_row_id.get(row["row_id"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(
+                            f"Invalid time series data for sensor {sensor_id}, "
+                            f"device {device_id} at {measurement_time}: {str(e)}"
+                        )
+                if self._collect_if_valid(measurement, measurements):
+                    self.cache.put((sensor_id, device_id, measurement_time), content_hash, measurement.raw_data)
+
+        self.cache.flush()
+        self._save_dedup_index()
+        logger.info(f"Measurement cache: {self.cache.stats()}")
+        return sorted(measurements, key=lambda x: x.measurement_time)
 
-        return sorted(measurements, key=lambda x: x.measurement_time)
\ No newline at end of file
+    def _collect_if_valid(self, measurement: MeasurementData, measurements: List[MeasurementData]) -> bool:
+        """Добавляет измерение в результат, если оно полное и валидное."""
+        if measurement.is_complete() and is_valid_measurement(measurement):
+            measurements.append(measurement)
+            return True
+        logger.warning(
+            f"Incomplete or invalid measurement: sensor {measurement.sensor_id}, "
+            f"device {measurement.device_id} at {measurement.measurement_time} "
+            f"(has {len(measurement.raw_data)} of {measurement.measurement_count} series)"
+        )
+        return False
\ No newline at end of file
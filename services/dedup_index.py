@@ -0,0 +1,107 @@
+# services/dedup_index.py
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from db.db import DUPLICATE_MEASUREMENT  # quality_code строки повторно присланного измерения
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(payload) -> bytes:
+    """
+    Хэш содержимого ряда: SHA-1 текста CLOB в UTF-8, тот же, что
+    DBMS_CRYPTO.HASH(data, HASH_SH1) в запросах БД. Все пути выборки (построчный,
+    сгруппированный, с кэшем) дают одинаковый хэш, и сохранённый DedupIndex не
+    зависит от режима выборки.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return hashlib.sha1(payload).digest()
+
+
+class DedupIndex:
+    """
+    Индекс содержимого уже выданных измерений для поиска повторно вставленных.
+
+    Ключ — 64-битный хэш (sensor_id, device_id, отсортированные хэши рядов),
+    значение — measurement_time первого появления. Измерение с тем же
+    содержимым, но другим measurement_time считается дублем. Тот же ключ с
+    тем же временем — повторная выборка ещё не записанного измерения, она
+    дублем не считается. Индекс хранится в .npz (два массива int64) и
+    очищается от записей старше retention.
+
+    Цель — повторная отправка уже принятого пакета под новым временем
+    (шлюз переотправляет буфер после обрыва связи): ряды, включая ts,
+    совпадают побайтно. Время в ключ не входит, поэтому настоящее измерение,
+    в точности повторившее значения в пределах retention, тоже станет
+    дублем. Такие измерения не пропадают молча: они записываются строкой с
+    quality_code DUPLICATE_MEASUREMENT (см. ApplicationService._record_duplicates).
+    """
+
+    def __init__(self, path: Optional[str] = None, retention: timedelta = timedelta(days=2)):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._first_seen = {}  # ключ -> measurement_time в микросекундах эпохи
+        self.duplicates = 0
+        if path:
+            self._load()
+
+    @staticmethod
+    def _key(sensor_id: int, device_id: int, series_digests: Iterable[bytes]) -> int:
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"{sensor_id}|{device_id}|".encode())
+        for series_digest in sorted(series_digests):
+            digest.update(series_digest)
+        return int.from_bytes(digest.digest(), "little", signed=True)
+
+    @staticmethod
+    def _micros(measurement_time: datetime) -> int:
+        return int(measurement_time.timestamp() * 1_000_000)
+
+    def is_duplicate(self, sensor_id: int, device_id: int, measurement_time: datetime, series_digests) -> bool:
+        """Проверяет измерение и запоминает его при первом появлении."""
+        key = self._key(sensor_id, device_id, series_digests)
+        micros = self._micros(measurement_time)
+        with self._lock:
+            first_seen = self._first_seen.setdefault(key, micros)
+            if first_seen != micros:
+                self.duplicates += 1
+                return True
+            return False
+
+    def prune(self, now: datetime) -> int:
+        cutoff = self._micros(now - self.retention)
+        with self._lock:
+            stale = [key for key, micros in self._first_seen.items() if micros < cutoff]
+            for key in stale:
+                del self._first_seen[key]
+        return len(stale)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        import numpy as np
+        with self._lock:
+            keys = np.fromiter(self._first_seen.keys(), dtype=np.int64, count=len(self._first_seen))
+            times = np.fromiter(self._first_seen.values(), dtype=np.int64, count=len(self._first_seen))
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, keys=keys, times=times)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        import numpy as np
+        try:
+            with np.load(self.path) as stored:
+                self._first_seen = dict(zip(stored["keys"].tolist(), stored["times"].tolist()))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Dedup index {self.path} is unreadable, starting empty: {str(e)}")
+
+    def __len__(self):
+        return len(self._first_seen)
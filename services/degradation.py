@@ -0,0 +1,142 @@
+# services/degradation.py
+import logging
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+import numpy as np
+from config import DEGRADATION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class DegradationModel:
+    """
+    Модель деградации сенсора: коэффициенты (e, i) от числа его использований.
+
+    Коэффициенты для usage < precomputed_size считаются один раз при создании
+    модели и дальше берутся из массива по индексу; большие значения
+    вычисляются формулой. Вычисление векторное: на вход массив usage батча.
+    """
+
+    def __init__(self, precomputed_size: int):
+        self.table = self._formula(np.arange(max(precomputed_size, 0), dtype=np.float64))
+
+    def _formula(self, usage: np.ndarray) -> np.ndarray:
+        """Коэффициенты (n, 2) для массива usage."""
+        raise NotImplementedError
+
+    def coefficients(self, usage) -> np.ndarray:
+        usage = np.asarray(usage, dtype=np.int64)
+        in_table = (usage >= 0) & (usage < len(self.table))
+        if in_table.all():
+            return self.table[usage]
+        result = np.empty(usage.shape + (2,))
+        result[in_table] = self.table[usage[in_table]]
+        result[~in_table] = self._formula(usage[~in_table].astype(np.float64))
+        return result
+
+
+class LinearDegradation(DegradationModel):
+    def __init__(self, slope_e: float, intercept_e: float, slope_i: float, intercept_i: float, precomputed_size: int):
+        self.slope = np.array([slope_e, slope_i])
+        self.intercept = np.array([intercept_e, intercept_i])
+        super().__init__(precomputed_size)
+
+    def _formula(self, usage: np.ndarray) -> np.ndarray:
+        return usage[..., None] * self.slope + self.intercept
+
+
+class QuadraticDegradation(LinearDegradation):
+    def __init__(self, quadratic_e: float, quadratic_i: float, *args, **kwargs):
+        self.quadratic = np.array([quadratic_e, quadratic_i])
+        super().__init__(*args, **kwargs)
+
+    def _formula(self, usage: np.ndarray) -> np.ndarray:
+        return usage[..., None] ** 2 * self.quadratic + super()._formula(usage)
+
+
+class TableDegradation(DegradationModel):
+    """Коэффициенты из таблицы замеров с линейной интерполяцией; за её краями — крайние значения."""
+
+    def __init__(self, usage: np.ndarray, e_coefs: np.ndarray, i_coefs: np.ndarray, precomputed_size: int):
+        order = np.argsort(usage)
+        self.usage = np.asarray(usage, dtype=np.float64)[order]
+        self.e_coefs = np.asarray(e_coefs, dtype=np.float64)[order]
+        self.i_coefs = np.asarray(i_coefs, dtype=np.float64)[order]
+        super().__init__(precomputed_size)
+
+    @classmethod
+    def from_csv(cls, path: str, precomputed_size: int) -> "TableDegradation":
+        rows = np.loadtxt(path, delimiter=",", ndmin=2, comments="#")
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2], precomputed_size)
+
+    def _formula(self, usage: np.ndarray) -> np.ndarray:
+        return np.stack([
+            np.interp(usage, self.usage, self.e_coefs),
+            np.interp(usage, self.usage, self.i_coefs),
+        ], axis=-1)
+
+
+def _linear(config) -> DegradationModel:
+    return LinearDegradation(
+        config.linear_slope_e, config.linear_intercept_e,
+        config.linear_slope_i, config.linear_intercept_i,
+        precomputed_size=config.precomputed_size
+    )
+
+
+def _quadratic(config) -> DegradationModel:
+    return QuadraticDegradation(
+        config.quadratic_e, config.quadratic_i,
+        config.linear_slope_e, config.linear_intercept_e,
+        config.linear_slope_i, config.linear_intercept_i,
+        precomputed_size=config.precomputed_size
+    )
+
+
+def _table(config) -> DegradationModel:
+    if not config.table_path:
+        raise ValueError("DEGRADATION_TABLE_PATH is required for the table degradation model")
+    return TableDegradation.from_csv(config.table_path, config.precomputed_size)
+
+
+DEGRADATION_MODELS: Dict[str, Callable] = {
+    "linear": _linear,
+    "quadratic": _quadratic,
+    "table": _table,
+}
+
+_model: Optional[DegradationModel] = None
+# Модель текущего сайта в многосайтовом режиме; задачи общего пула выполняются в копии контекста сайта
+_site_model: ContextVar[Optional[DegradationModel]] = ContextVar("site_degradation_model", default=None)
+
+
+def register_degradation_model(name: str, factory: Callable) -> None:
+    """Регистрирует фабрику модели: factory(DEGRADATION_CONFIG) -> DegradationModel."""
+    DEGRADATION_MODELS[name] = factory
+
+
+def create_degradation_model(config=DEGRADATION_CONFIG) -> DegradationModel:
+    try:
+        factory = DEGRADATION_MODELS[config.degradation_type]
+    except KeyError:
+        raise ValueError(
+            f"Unknown degradation type {config.degradation_type!r}, available: {sorted(DEGRADATION_MODELS)}"
+        )
+    return factory(config)
+
+
+def use_degradation_model(model: Optional[DegradationModel]):
+    """Задаёт модель для текущего контекста (сайта); возвращает токен для ContextVar.reset."""
+    return _site_model.set(model)
+
+
+def get_degradation_model() -> DegradationModel:
+    """Модель сайта, если задана, иначе общая для процесса (таблица коэффициентов строится один раз)."""
+    site_model = _site_model.get()
+    if site_model is not None:
+        return site_model
+    global _model
+    if _model is None:
+        _model = create_degradation_model()
+        logger.info(f"Degradation model: {DEGRADATION_CONFIG.degradation_type}")
+    return _model
@@ -0,0 +1,74 @@
+# services/freshness_scheduler.py
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from config import PROCESSING_CONFIG
+from models.measurement_data import MeasurementData
+
+Part = Tuple[List[MeasurementData], Tuple[float, float]]
+
+
+@dataclass
+class ScheduledChunk:
+    measurements: List[MeasurementData]
+    params: Tuple[float, float]
+    lane: str  # "fresh" или "backlog"
+    max_age: timedelta  # возраст самого нового измерения порции относительно самого нового в пакете
+
+
+class FreshnessScheduler:
+    """
+    Порядок обработки «сначала свежие».
+
+    Измерения не старше fresh_window от самого нового в пакете идут в
+    быструю полосу от новых к старым; остальные — в полосу запоздавших
+    данных от старых к новым (они первыми выпадут из окна late_data_tolerance).
+    Полосы чередуются порциями так, чтобы запоздавшие данные получали
+    backlog_share пропускной способности. Параметры калибровки назначаются
+    частям пакета до планирования, поэтому порядок не влияет на калибровку.
+    """
+
+    def __init__(
+        self,
+        fresh_window: Optional[timedelta] = None,
+        backlog_share: Optional[float] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.fresh_window = fresh_window or PROCESSING_CONFIG.fresh_window
+        self.backlog_share = PROCESSING_CONFIG.backlog_share if backlog_share is None else backlog_share
+        self.chunk_size = chunk_size or PROCESSING_CONFIG.write_batch_size
+
+    def schedule(self, parts: List[Part]) -> List[ScheduledChunk]:
+        items = [(measurement, params) for measurements, params in parts for measurement in measurements]
+        if not items:
+            return []
+        newest = max(measurement.measurement_time for measurement, _ in items)
+        threshold = newest - self.fresh_window
+        fresh = sorted(
+            (item for item in items if item[0].measurement_time >= threshold),
+            key=lambda item: item[0].measurement_time, reverse=True
+        )
+        backlog = sorted(
+            (item for item in items if item[0].measurement_time < threshold),
+            key=lambda item: item[0].measurement_time
+        )
+
+        fresh_quota = max(1, round(self.chunk_size * (1 - self.backlog_share)))
+        backlog_quota = max(1, round(self.chunk_size * self.backlog_share))
+        chunks = []
+        while fresh or backlog:
+            chunks.extend(self._chunks(fresh[:fresh_quota], "fresh", newest))
+            chunks.extend(self._chunks(backlog[:backlog_quota], "backlog", newest))
+            fresh, backlog = fresh[fresh_quota:], backlog[backlog_quota:]
+        return chunks
+
+    @staticmethod
+    def _chunks(items, lane: str, newest: datetime) -> List[ScheduledChunk]:
+        """Делит порцию полосы на куски с одинаковыми параметрами калибровки."""
+        chunks = []
+        for measurement, params in items:
+            if not chunks or chunks[-1].params != params:
+                chunks.append(ScheduledChunk([], params, lane, timedelta.max))
+            chunks[-1].measurements.append(measurement)
+            chunks[-1].max_age = min(chunks[-1].max_age, newest - measurement.measurement_time)
+        return chunks
@@ -0,0 +1,152 @@
+# services/keypoint_detector.py
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config import KEYPOINT_CONFIG
+
+KEYPOINT_FEATURES = ("ts", "value", "prominence", "width")
+
+
+@dataclass
+class KeypointBatch:
+    """
+    Ключевые точки батча измерений в виде входа модели.
+
+    features: (измерения, ряды, max_keypoints, len(KEYPOINT_FEATURES)), пустые места — NaN
+    mask: (измерения, ряды, max_keypoints), True для найденных точек
+    """
+    features: np.ndarray
+    mask: np.ndarray
+
+
+def stack_series(series_list: List[Dict], field: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Складывает ряды разной длины в матрицы значений и времён, дополняя NaN."""
+    length = max((len(series[field]) for series in series_list), default=0)
+    values = np.full((len(series_list), length), np.nan)
+    times = np.full((len(series_list), length), np.nan)
+    for row, series in enumerate(series_list):
+        n = len(series[field])
+        values[row, :n] = series[field]
+        times[row, :n] = series["ts"] if "ts" in series else np.arange(n)
+    return values, times
+
+
+class KeypointDetector:
+    """
+    Поиск пиков сразу во всех рядах, сложенных в одну матрицу.
+
+    Пик — локальный максимум. Выраженность (prominence) считается как в
+    scipy.signal.peak_prominences с окном: высота пика над большим из двух
+    минимумов, взятых слева и справа до ближайшей более высокой точки, но
+    не дальше window точек. Ширина — число подряд идущих точек не ниже
+    середины выраженности. Циклов по точкам нет: операции идут над
+    матрицей рядов и матрицей окон кандидатов.
+    """
+
+    def __init__(
+        self,
+        min_prominence: Optional[float] = None,
+        min_width: Optional[int] = None,
+        window: Optional[int] = None,
+        max_keypoints: Optional[int] = None,
+        series_field: Optional[str] = None
+    ):
+        self.min_prominence = KEYPOINT_CONFIG.min_prominence if min_prominence is None else min_prominence
+        self.min_width = KEYPOINT_CONFIG.min_width if min_width is None else min_width
+        self.window = KEYPOINT_CONFIG.window if window is None else window
+        self.max_keypoints = KEYPOINT_CONFIG.max_keypoints if max_keypoints is None else max_keypoints
+        self.series_field = series_field or KEYPOINT_CONFIG.series_field
+
+    def detect(self, time_series: List[Dict]) -> np.ndarray:
+        """Ключевые точки рядов одного измерения: (ряды, max_keypoints, признаки)."""
+        values, times = stack_series(time_series, self.series_field)
+        features, _ = self._find(values, times)
+        return features
+
+    def detect_batch(self, batch: List[List[Dict]]) -> KeypointBatch:
+        """Ключевые точки батча измерений за один проход по всем их рядам."""
+        all_series = [series for time_series in batch for series in time_series]
+        values, times = stack_series(all_series, self.series_field)
+        found, found_mask = self._find(values, times)
+
+        max_series = max((len(time_series) for time_series in batch), default=0)
+        features = np.full((len(batch), max_series) + found.shape[1:], np.nan)
+        mask = np.zeros((len(batch), max_series, self.max_keypoints), dtype=bool)
+        row = 0
+        for i, time_series in enumerate(batch):
+            n = len(time_series)
+            features[i, :n] = found[row:row + n]
+            mask[i, :n] = found_mask[row:row + n]
+            row += n
+        return KeypointBatch(features, mask)
+
+    def _find(self, values: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n_rows, n_points = values.shape
+        k = self.max_keypoints
+        features = np.full((n_rows, k, len(KEYPOINT_FEATURES)), np.nan)
+        mask = np.zeros((n_rows, k), dtype=bool)
+        if n_points < 3 or k == 0:
+            return features, mask
+
+        # Кандидаты: строго выше левого соседа и не ниже правого (плато берётся по левому краю)
+        inner = values[:, 1:-1]
+        with np.errstate(invalid="ignore"):
+            candidates = (inner > values[:, :-2]) & (inner >= values[:, 2:])
+        rows, cols = np.nonzero(candidates)
+        cols += 1
+        if rows.size == 0:
+            return features, mask
+
+        # Окна ±window вокруг кандидатов; за краем ряда — +inf, что останавливает поиск основания
+        w = self.window
+        padded = np.pad(np.where(np.isnan(values), np.inf, values), ((0, 0), (w, w)), constant_values=np.inf)
+        windows = sliding_window_view(padded, 2 * w + 1, axis=1)[rows, cols]
+        peaks = values[rows, cols]
+        left = windows[:, :w][:, ::-1]  # от соседа пика наружу
+        right = windows[:, w + 1:]
+
+        prominence = peaks - np.maximum(self._base(left, peaks), self._base(right, peaks))
+        half_level = peaks - prominence / 2
+        width = self._run_length(left, half_level) + self._run_length(right, half_level) + 1
+        keep = (prominence >= self.min_prominence) & (width >= self.min_width)
+
+        dense_prominence = np.full((n_rows, n_points), -np.inf)
+        dense_width = np.zeros((n_rows, n_points))
+        dense_prominence[rows[keep], cols[keep]] = prominence[keep]
+        dense_width[rows[keep], cols[keep]] = width[keep]
+
+        # Самые выраженные k пиков ряда, упорядоченные по времени
+        if k < n_points:
+            top = np.argpartition(-dense_prominence, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n_points), (n_rows, n_points))
+        found = np.isfinite(np.take_along_axis(dense_prominence, top, axis=1))
+        order = np.argsort(np.where(found, top, n_points + top), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        found = np.take_along_axis(found, order, axis=1)
+
+        n = top.shape[1]
+        selected = np.stack([
+            np.take_along_axis(times, top, axis=1),
+            np.take_along_axis(values, top, axis=1),
+            np.take_along_axis(dense_prominence, top, axis=1),
+            np.take_along_axis(dense_width, top, axis=1),
+        ], axis=-1)
+        features[:, :n] = np.where(found[..., None], selected, np.nan)
+        mask[:, :n] = found
+        return features, mask
+
+    @staticmethod
+    def _base(side: np.ndarray, peaks: np.ndarray) -> np.ndarray:
+        """Минимум стороны окна до первой точки выше пика."""
+        higher = side > peaks[:, None]
+        stop = np.where(higher.any(axis=1), higher.argmax(axis=1), side.shape[1])
+        before_stop = np.arange(side.shape[1]) < stop[:, None]
+        return np.where(before_stop, side, np.inf).min(axis=1, initial=np.inf)
+
+    @staticmethod
+    def _run_length(side: np.ndarray, level: np.ndarray) -> np.ndarray:
+        """Число подряд идущих от пика точек не ниже level."""
+        above = np.isfinite(side) & (side >= level[:, None])
+        return np.where(above.all(axis=1), side.shape[1], (~above).argmax(axis=1))
@@ -0,0 +1,171 @@
+# services/measurement_cache.py
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SERIES_FIELDS = ("ts", "feat1", "feat2")
+
+CacheKey = Tuple[int, int, datetime]  # (sensor_id, device_id, measurement_time)
+
+
+class MeasurementCache:
+    """
+    Локальный кэш декодированных временных рядов измерения.
+
+    Каждое измерение хранится двумя .npy файлами: матрица (3, N) с
+    конкатенированными ts/feat1/feat2 всех рядов и массив смещений рядов.
+    Чтение идёт через memory map, ряды возвращаются срезами без копирования.
+    Запись валидна только при совпадении хэша содержимого, вычисленного в БД.
+    Вытеснение — LRU по суммарному размеру файлов.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: OrderedDict = OrderedDict()  # file_key -> {"content_hash", "size"}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def content_hash(series_hashes: Iterable[str]) -> str:
+        """Хэш измерения по хэшам его рядов (не зависит от порядка строк)."""
+        digest = hashlib.sha1()
+        for series_hash in sorted(series_hashes):
+            digest.update(series_hash.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _file_key(key: CacheKey) -> str:
+        sensor_id, device_id, measurement_time = key
+        raw = f"{sensor_id}|{device_id}|{measurement_time.isoformat()}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _paths(self, file_key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, file_key)
+        return f"{base}.data.npy", f"{base}.offsets.npy"
+
+    def get(self, key: CacheKey, content_hash: str) -> Optional[List[Dict]]:
+        """Возвращает ряды измерения или None, если записи нет или содержимое изменилось."""
+        file_key = self._file_key(key)
+        with self._lock:
+            entry = self._index.get(file_key)
+            if entry is None or entry["content_hash"] != content_hash:
+                self.misses += 1
+                return None
+            self._index.move_to_end(file_key)
+            self.hits += 1
+
+        data_path, offsets_path = self._paths(file_key)
+        try:
+            data = np.load(data_path, mmap_mode="r")
+            offsets = np.load(offsets_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Corrupted cache entry for {key}: {str(e)}")
+            self._evict(file_key)
+            return None
+
+        return [
+            {field: data[row, start:end] for row, field in enumerate(SERIES_FIELDS)}
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def put(self, key: CacheKey, content_hash: str, series_list: List[Dict]) -> None:
+        """Сохраняет ряды измерения (ожидаются ts/feat1/feat2 одинаковой длины)."""
+        lengths = [len(series["ts"]) for series in series_list]
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        data = np.empty((len(SERIES_FIELDS), int(offsets[-1])), dtype=np.float64)
+        for series, start, end in zip(series_list, offsets[:-1], offsets[1:]):
+            for row, field in enumerate(SERIES_FIELDS):
+                data[row, start:end] = series[field]
+
+        file_key = self._file_key(key)
+        data_path, offsets_path = self._paths(file_key)
+        np.save(data_path, data)
+        np.save(offsets_path, offsets)
+        size = data.nbytes + offsets.nbytes
+
+        with self._lock:
+            previous = self._index.pop(file_key, None)
+            if previous:
+                self.total_bytes -= previous["size"]
+            self._index[file_key] = {"content_hash": content_hash, "size": size}
+            self.total_bytes += size
+            evicted = self._select_evictions()
+
+        for victim in evicted:
+            self._remove_files(victim)
+
+    def _select_evictions(self) -> List[str]:
+        """Выбирает наименее востребованные записи сверх лимита (под блокировкой)."""
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            file_key, entry = self._index.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            self.evictions += 1
+            evicted.append(file_key)
+        return evicted
+
+    def _evict(self, file_key: str) -> None:
+        with self._lock:
+            entry = self._index.pop(file_key, None)
+            if entry:
+                self.total_bytes -= entry["size"]
+                self.evictions += 1
+        self._remove_files(file_key)
+
+    def _remove_files(self, file_key: str) -> None:
+        for path in self._paths(file_key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> None:
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Measurement cache index is unreadable, starting empty: {str(e)}")
+            return
+        for file_key, entry in entries:
+            if all(os.path.exists(p) for p in self._paths(file_key)):
+                self._index[file_key] = entry
+                self.total_bytes += entry["size"]
+
+    def flush(self) -> None:
+        """Сохраняет индекс (порядок LRU) на диск."""
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        with self._lock:
+            entries = list(self._index.items())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
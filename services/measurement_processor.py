@@ -1,60 +1,273 @@
 # services/measurement_processor.py
 import logging
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from config import PROCESSING_CONFIG, QUALITY_GATE_CONFIG
+from utils.tracing import MEASUREMENT, current_span, span
 from models.measurement_data import MeasurementData
-from services.preprocessing import preprocess
-from services.prediction import predict
+from services.sensor_usage import HistoricalSensorUsage, SensorUsageCounter
 
 logger = logging.getLogger(__name__)
 
+PROCESSING_ERROR = "processing_error"  # quality_code измерения, обработка которого упала при пересчёте истории
+
+
+def preprocess(measurement: MeasurementData):
+    """Препроцессинг; numpy и модули модели загружаются при первом измерении, а не при импорте."""
+    from services.preprocessing import preprocess as _preprocess
+    return _preprocess(measurement)
+
+
+def predict(preprocessed):
+    from services.prediction import predict as _predict
+    return _predict(preprocessed)
+
+
+def degradation_coefficients(usage_counts: List[int]):
+    """Коэффициенты (e, i) модели деградации для массива usage одним векторным вызовом."""
+    from services.degradation import get_degradation_model
+    return get_degradation_model().coefficients(usage_counts)
+
+
 class MeasurementProcessor:
     """Сервис для обработки измерений и выполнения предсказаний."""
-    
-    def __init__(self, db):
+
+    def __init__(
+        self,
+        db,
+        workers: Optional[int] = None,
+        journal=None,
+        pipeline_id: Optional[str] = None,
+        target_version: Optional[str] = None,
+        usage_counter: Optional[SensorUsageCounter] = None,
+        quality_gate=None,
+        executor=None
+    ):
         self.db = db
-        
-    def process_batch(self, measurements: List[MeasurementData], params: Tuple[float, float]) -> int:
+        self.workers = workers if workers is not None else PROCESSING_CONFIG.workers
+        self.journal = journal  # PredictionJournal или None
+        self.pipeline_id = pipeline_id or PROCESSING_CONFIG.pipeline_id
+        self.target_version = target_version  # None — запись в table1, иначе в prediction_backfill
+        # Пересчёт истории не меняет счётчики, а текущие значения для прошлых измерений
+        # не подходят: использования считаются на момент каждого измерения
+        if usage_counter is None:
+            usage_counter = HistoricalSensorUsage(db) if target_version is not None else SensorUsageCounter(db)
+        self.usage_counter = usage_counter
+        if quality_gate is None and QUALITY_GATE_CONFIG.enabled:
+            from services.quality_gate import QualityGate
+            quality_gate = QualityGate()
+        self.quality_gate = quality_gate  # QualityGate или None
+        # Внешний пул (общий для сайтов): порции считаются в нём, записываются по порядку здесь
+        self.executor = executor
+
+    def process_batch(
+        self, measurements: List[MeasurementData], params: Tuple[float, float], assign_usage: bool = True
+    ) -> int:
         """
         Обрабатывает батч измерений с применением ML-предсказаний.
-        
+
+        Предсказания пишутся порциями по write_batch_size: каждая порция и
+        контрольная точка фиксируются одной транзакцией.
+
         Args:
             measurements: Список измерений для обработки
             params: Параметры калибровки (param1, param2)
-            
+            assign_usage: False — счётчики использований уже проставлены вызывающим
+                (порядок записи не совпадает с порядком измерений)
+
         Returns:
             int: Количество успешно обработанных измерений
         """
+        with span("process_batch", pipeline_id=self.pipeline_id, measurements=len(measurements)) as stage:
+            processed_count = self._process_batch(measurements, params, assign_usage)
+            stage.set(processed=processed_count)
+        return processed_count
+
+    def _process_batch(
+        self, measurements: List[MeasurementData], params: Tuple[float, float], assign_usage: bool = True
+    ) -> int:
         param1, param2 = params
+        usage_counter = self.usage_counter if assign_usage else None
+        batch_size = PROCESSING_CONFIG.write_batch_size
         processed_count = 0
-        
-        for measurement in measurements:
+
+        if self.executor is not None:
+            # Счётчики назначаются всему батчу до отправки: кэш растёт только после
+            # коммита, поэтому смещения порций должны продолжать друг друга.
+            # Вычисления идут параллельно, а запись с контрольной точкой — в порядке порций
+            if usage_counter is not None:
+                usage_counter.assign(measurements)
+            futures = []
+            for start in range(0, len(measurements), batch_size):
+                chunk = measurements[start:start + batch_size]
+                futures.append(self.executor.submit(self._compute_predictions, chunk, param1, param2))
+            for future in futures:
+                processed_count += self._write_predictions(future.result())
+            return processed_count
+
+        for start in range(0, len(measurements), batch_size):
+            chunk = measurements[start:start + batch_size]
+            if usage_counter is not None:
+                usage_counter.assign(chunk)
+            predictions = self._compute_predictions(chunk, param1, param2)
+            processed_count += self._write_predictions(predictions)
+
+        return processed_count
+
+    def record_skipped(self, measurements: List[MeasurementData], params: Tuple[float, float], quality_code: str) -> int:
+        """Записывает измерения без вызова модели: result пустой, quality_code — причина."""
+        param1, param2 = params
+        rows = [
+            self._predict_single_measurement(measurement, param1, param2, quality_code)
+            for measurement in sorted(measurements, key=lambda measurement: measurement.measurement_time)
+        ]
+        batch_size = PROCESSING_CONFIG.write_batch_size
+        return sum(self._write_predictions(rows[start:start + batch_size]) for start in range(0, len(rows), batch_size))
+
+    def replay_journal(self) -> int:
+        """Дописывает в БД предсказания, вычисленные до сбоя, но не зафиксированные."""
+        if self.journal is None:
+            return 0
+        pending = self.journal.pending()
+        if not pending:
+            return 0
+        logger.info(f"Replaying {len(pending)} journaled predictions from an interrupted run")
+        return self._write_predictions([], pending)
+
+    def _compute_predictions(self, measurements: List[MeasurementData], param1: float, param2: float) -> List[Dict]:
+        """Считает предсказания порции; порядок измерений сохраняется."""
+        reasons = self.quality_gate.check(measurements) if self.quality_gate else [None] * len(measurements)
+        self._assign_degradation(measurements, reasons)
+        items = list(zip(measurements, reasons))
+        parent = current_span()  # в потоки пула родитель спанов измерений передаётся явно
+        if self.workers > 1 and len(measurements) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(lambda item: self._try_predict(item[0], param1, param2, item[1], parent), items))
+        else:
+            results = [self._try_predict(m, param1, param2, reason, parent) for m, reason in items]
+        return [prediction for prediction in results if prediction is not None]
+
+    @staticmethod
+    def _assign_degradation(measurements: List[MeasurementData], reasons: List[Optional[str]]) -> None:
+        """Коэффициенты деградации измерений порции, которые пойдут в модель, — одним вызовом на порцию."""
+        pending = [m for m, reason in zip(measurements, reasons) if reason is None and m.usage_count is not None]
+        if not pending:
+            return
+        coefs = degradation_coefficients([m.usage_count for m in pending])
+        for measurement, (e_coef, i_coef) in zip(pending, coefs):
+            measurement.degradation_coefs = (float(e_coef), float(i_coef))
+
+    def _try_predict(
+        self, measurement: MeasurementData, param1: float, param2: float, quality_code: Optional[str] = None, parent=None
+    ) -> Optional[Dict]:
+        """
+        Обрабатывает измерение, логируя ошибку вместо выброса исключения. При пересчёте
+        истории упавшее измерение становится строкой с quality_code PROCESSING_ERROR.
+        """
+        with span("measurement", MEASUREMENT, parent=parent) as measurement_span:
+            if measurement_span.recording:
+                measurement_span.set(
+                    sensor_id=measurement.sensor_id,
+                    device_id=measurement.device_id,
+                    measurement_time=measurement.measurement_time,
+                    series=len(measurement.raw_data),
+                    points=sum(len(series.get("ts", ())) for series in measurement.raw_data),
+                    quality_code=quality_code
+                )
             try:
-                self._process_single_measurement(measurement, param1, param2)
-                processed_count += 1
+                return self._predict_single_measurement(measurement, param1, param2, quality_code)
             except Exception as e:
                 logger.error(f"Failed to process measurement {measurement}: {e}")
-                
-        return processed_count
-        
-    def _process_single_measurement(self, measurement: MeasurementData, param1: float, param2: float) -> None:
-        """Обрабатывает одно измерение."""
+                measurement_span.set(error=repr(e))
+                if self.target_version is not None:
+                    # Пересчёт не пропускает измерения молча, но и не останавливается на них:
+                    # ошибка записывается строкой, и контрольная точка уходит дальше. Чанк
+                    # проваливают только ошибки записи (см. _write_rows)
+                    return self._predict_single_measurement(measurement, param1, param2, PROCESSING_ERROR)
+                return None
+
+    def _predict_single_measurement(
+        self, measurement: MeasurementData, param1: float, param2: float, quality_code: Optional[str] = None
+    ) -> Dict:
+        """
+        Обрабатывает одно измерение и возвращает строку предсказания для записи.
+        Измерение, не прошедшее проверку качества, записывается без вызова модели:
+        result пустой, quality_code — причина.
+        """
         # Добавление параметров калибровки
         measurement.add_params(param1, param2)
-        
+
+        if quality_code is not None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Skipping model for {measurement}: {quality_code}")
+            return {
+                "sensor_id": measurement.sensor_id,
+                "device_id": measurement.device_id,
+                "measurement_time": measurement.measurement_time,
+                "param1": param1,
+                "param2": param2,
+                "result": None,
+                "quality_code": quality_code
+            }
+
         # Препроцессинг
         preprocessed = preprocess(measurement)
-        
+
         # Предсказание
         result = predict(preprocessed)
-        
-        # Сохранение результата
-        self.db.insert_prediction(
-            sensor_id=measurement.sensor_id,
-            device_id=measurement.device_id,
-            param1=param1,
-            param2=param2,
-            result=result
-        )
-        
-        logger.debug(f"Processed measurement: sensor={measurement.sensor_id}, "
-                    f"device={measurement.device_id}, result={result}")
\ No newline at end of file
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Processed measurement: sensor={measurement.sensor_id}, "
+                         f"device={measurement.device_id}, result={result}")
+
+        return {
+            "sensor_id": measurement.sensor_id,
+            "device_id": measurement.device_id,
+            "measurement_time": measurement.measurement_time,
+            "param1": param1,
+            "param2": param2,
+            "result": result,
+            "quality_code": None
+        }
+
+    def _write_predictions(self, predictions: List[Dict], pending: Optional[List[Dict]] = None) -> int:
+        """
+        Записывает порцию вместе с контрольной точкой.
+        Журнал хранит всё незафиксированное, поэтому после неудачной записи
+        следующая порция дописывает и предыдущую (MERGE делает это безопасным).
+        """
+        if self.journal is not None and predictions:
+            self.journal.append(predictions)
+            pending = self.journal.pending()
+        rows = pending if pending is not None else predictions
+        if not rows:
+            return 0
+        with span("write", pipeline_id=self.pipeline_id, rows=len(rows), replayed=len(rows) - len(predictions)) as stage:
+            written = self._write_rows(rows, predictions)
+            stage.set(written=written)
+        return written
+
+    def _write_rows(self, rows: List[Dict], predictions: List[Dict]) -> int:
+        last = rows[-1]
+        checkpoint = {
+            "pipeline_id": self.pipeline_id,
+            "last_measurement_time": last["measurement_time"],
+            "last_sensor_id": last["sensor_id"],
+            "last_device_id": last["device_id"],
+            "processed": len(rows)
+        }
+        try:
+            usage_increments = self.db.insert_predictions_batch(rows, checkpoint, target_version=self.target_version)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} predictions: {e}")
+            if self.target_version is not None:
+                # Без журнала следующая порция сдвинула бы контрольную точку за потерянные строки
+                raise
+            return 0
+
+        if self.usage_counter is not None and usage_increments:
+            self.usage_counter.add(usage_increments)
+
+        if self.journal is not None:
+            self.journal.clear()
+        return len(predictions) if predictions else len(rows)
@@ -0,0 +1,83 @@
+# services/memory_budget.py
+import os
+import resource
+import logging
+from typing import Callable, Optional
+import numpy as np
+from models.measurement_data import MeasurementData
+
+logger = logging.getLogger(__name__)
+
+PYTHON_FLOAT_BYTES = 32  # float в списке: объект 24 байта и указатель 8
+DEFAULT_BYTES_PER_CHAR = 2.0  # оценка для JSON до первого замера
+BATCH_SHARE = 0.25  # доля бюджета на сырые данные батча: остальное — препроцессинг, предсказания, запас
+MIN_SCALE = 1 / 16
+MAX_SCALE = 2.0
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса в байтах (на не-Linux — пиковый)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measurement_bytes(measurement: MeasurementData) -> int:
+    """Память декодированных рядов измерения."""
+    total = 0
+    for series in measurement.raw_data:
+        for values in series.values():
+            if isinstance(values, np.ndarray):
+                total += values.nbytes
+            elif isinstance(values, (list, tuple)):
+                total += len(values) * PYTHON_FLOAT_BYTES
+    return total
+
+
+class MemoryBudget:
+    """
+    Размер микробатчей выборки и обработки под бюджет памяти.
+
+    Размер измерения до выборки оценивается по длине его CLOB и замеренному
+    на предыдущих батчах отношению памяти декодированных рядов к длине CLOB
+    (ряды × длина × признаки). Масштаб батча уменьшается вдвое, если прирост
+    RSS от начала запуска превышает бюджет, и плавно растёт, пока RSS ниже
+    половины бюджета.
+    """
+
+    def __init__(self, budget_bytes: int, rss_reader: Callable[[], int] = current_rss):
+        self.budget_bytes = budget_bytes
+        self.rss_reader = rss_reader
+        self.baseline_rss = rss_reader()
+        self.scale = 1.0
+        self.bytes_per_char: Optional[float] = None
+        self.peak_rss_growth = 0
+
+    def batch_bytes(self) -> int:
+        """Целевой объём декодированных данных в одном батче."""
+        return int(self.budget_bytes * BATCH_SHARE * self.scale)
+
+    def estimate(self, data_length: int) -> float:
+        """Оценка памяти измерения по суммарной длине CLOB его рядов."""
+        ratio = self.bytes_per_char if self.bytes_per_char is not None else DEFAULT_BYTES_PER_CHAR
+        return data_length * ratio
+
+    def observe_batch(self, data_length: int, decoded_bytes: int) -> None:
+        """Уточняет отношение памяти к длине CLOB по фактически декодированному батчу."""
+        if data_length <= 0:
+            return
+        ratio = decoded_bytes / data_length
+        self.bytes_per_char = ratio if self.bytes_per_char is None else 0.5 * (self.bytes_per_char + ratio)
+
+    def observe_rss(self) -> int:
+        """Подстраивает масштаб батча под текущий RSS; возвращает прирост RSS."""
+        growth = self.rss_reader() - self.baseline_rss
+        self.peak_rss_growth = max(self.peak_rss_growth, growth)
+        if growth > self.budget_bytes:
+            self.scale = max(MIN_SCALE, self.scale / 2)
+            logger.warning(f"RSS grew by {growth / 2 ** 20:.0f} MB over the budget, shrinking batches to x{self.scale:.3f}")
+        elif growth < self.budget_bytes / 2:
+            self.scale = min(MAX_SCALE, self.scale * 1.25)
+        return growth
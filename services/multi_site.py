@@ -0,0 +1,232 @@
+# services/multi_site.py
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+from config import DB_CONFIG, DEGRADATION_CONFIG, MULTI_SITE_CONFIG, PROCESSING_CONFIG, DatabaseConfig, DegradationConfig
+from db.db import DB
+from services.application_service import ApplicationService
+from services.degradation import create_degradation_model, use_degradation_model
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SiteConfig:
+    """Площадка: своя БД (DSN и размеры пула), допуск опоздавших данных и модель деградации."""
+    name: str
+    database: DatabaseConfig
+    late_data_tolerance: timedelta = field(default_factory=lambda: PROCESSING_CONFIG.late_data_tolerance)
+    degradation: DegradationConfig = field(default_factory=lambda: DEGRADATION_CONFIG)
+
+
+def load_sites(path: str) -> List[SiteConfig]:
+    """
+    Читает список площадок из JSON:
+    [{"name": "plant-a", "dsn": "...", "user": "...", "password_env": "PLANT_A_PASSWORD",
+      "pool_min": 1, "pool_max": 3, "late_data_tolerance_hours": 6,
+      "degradation": {"degradation_type": "quadratic", "quadratic_e": 0.01}}, ...]
+    Не указанные поля берутся из общей конфигурации (переменные окружения).
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    sites = []
+    for entry in entries:
+        name = entry["name"]
+        database = {key: entry[key] for key in ("dsn", "user", "pool_min", "pool_max", "pool_increment") if key in entry}
+        if "password_env" in entry:
+            database["password"] = os.environ[entry["password_env"]]
+        elif "password" in entry:
+            database["password"] = entry["password"]
+        site = SiteConfig(
+            name=name,
+            database=replace(DB_CONFIG, **database),
+            degradation=replace(DEGRADATION_CONFIG, **entry.get("degradation", {}))
+        )
+        if "late_data_tolerance_hours" in entry:
+            site.late_data_tolerance = timedelta(hours=entry["late_data_tolerance_hours"])
+        sites.append(site)
+    names = [site.name for site in sites]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate site names in {path}: {names}")
+    return sites
+
+
+class FairExecutor:
+    """
+    Общий пул воркеров для нескольких площадок с очередью на каждую.
+
+    Воркер берёт задачи из очередей площадок по кругу, поэтому площадка с
+    длинной очередью получает не больше своей доли пула и не задерживает
+    остальные. Задача выполняется в контексте (contextvars), скопированном
+    при отправке, — так до неё доходит модель деградации своей площадки.
+    По площадке считаются задачи, время выполнения и ожидания в очереди.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or MULTI_SITE_CONFIG.workers
+        self._queues: Dict[str, deque] = {}
+        self._order: deque = deque()  # площадки с непустыми очередями, в порядке обхода
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"site-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, site: str, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        context = contextvars.copy_context()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            queue = self._queues.setdefault(site, deque())
+            self._stats.setdefault(site, {"tasks": 0, "busy_seconds": 0.0, "wait_seconds": 0.0})
+            if not queue:
+                self._order.append(site)
+            queue.append((future, context, fn, args, kwargs, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def for_site(self, site: str) -> "SiteExecutor":
+        return SiteExecutor(self, site)
+
+    def _next_task(self):
+        with self._condition:
+            while not self._order and not self._shutdown:
+                self._condition.wait()
+            if not self._order:
+                return None, None
+            site = self._order.popleft()
+            queue = self._queues[site]
+            task = queue.popleft()
+            if queue:
+                self._order.append(site)
+            return site, task
+
+    def _worker(self) -> None:
+        while True:
+            site, task = self._next_task()
+            if task is None:
+                return
+            future, context, fn, args, kwargs, submitted = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finished = time.perf_counter()
+            with self._condition:
+                stats = self._stats[site]
+                stats["tasks"] += 1
+                stats["busy_seconds"] += finished - started
+                stats["wait_seconds"] += started - submitted
+
+    def stats(self, site: str) -> Dict[str, float]:
+        with self._condition:
+            return dict(self._stats.get(site, {"tasks": 0, "busy_seconds": 0.0, "wait_seconds": 0.0}))
+
+    def shutdown(self) -> None:
+        """Дожидается уже поставленных задач и останавливает воркеры."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class SiteExecutor:
+    """Отправка задач одной площадки в FairExecutor с интерфейсом submit(fn, *args)."""
+
+    def __init__(self, executor: FairExecutor, site: str):
+        self.executor = executor
+        self.site = site
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.executor.submit(self.site, fn, *args, **kwargs)
+
+
+class SiteService(ApplicationService):
+    """
+    Обработка одной площадки в многосайтовом режиме.
+
+    Своя БД (пул соединений по конфигурации площадки), свои контрольные
+    точки, журнал и локальные кэши; предсказания считаются в общем пуле.
+    """
+
+    def __init__(self, site: SiteConfig, executor: FairExecutor, db=None):
+        self.site_config = site
+        super().__init__(
+            db=db if db is not None else DB(site.database, late_data_tolerance=site.late_data_tolerance),
+            site=site.name
+        )
+        self.measurement_processor.executor = executor.for_site(site.name)
+        self.degradation_model = create_degradation_model(site.degradation)
+
+    def run(self) -> None:
+        # Модель площадки задаётся в копии контекста и не видна другим площадкам
+        contextvars.copy_context().run(self._run)
+
+    def _run(self) -> None:
+        use_degradation_model(self.degradation_model)
+        self.process_measurements()
+        self.export_results()
+
+
+class MultiSiteRunner:
+    """
+    Запускает все площадки одним процессом: у каждой свой поток-координатор
+    и пул соединений, вычисления — в общем FairExecutor. Ошибка площадки
+    не прерывает остальные. Метрики собираются по площадкам.
+    """
+
+    def __init__(self, sites: List[SiteConfig], workers: Optional[int] = None, service_factory=SiteService):
+        self.sites = sites
+        self.executor = FairExecutor(workers)
+        self.service_factory = service_factory
+
+    def run(self) -> Dict[str, dict]:
+        metrics = {}
+        with ThreadPoolExecutor(max_workers=len(self.sites) or 1, thread_name_prefix="site") as coordinators:
+            futures = {site.name: coordinators.submit(self._run_site, site) for site in self.sites}
+            for name, future in futures.items():
+                metrics[name] = future.result()
+        self.executor.shutdown()
+        for name, site_metrics in metrics.items():
+            logger.info(f"Site {name}: {site_metrics}")
+        return metrics
+
+    def _run_site(self, site: SiteConfig) -> dict:
+        started = time.perf_counter()
+        service = None
+        result = {"status": "ok"}
+        try:
+            service = self.service_factory(site, self.executor)
+            service.run()
+        except Exception as e:
+            logger.error(f"Site {site.name} failed: {e}")
+            result = {"status": "failed", "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["executor"] = self.executor.stats(site.name)
+        if service is not None:
+            try:
+                result["pool"] = service.db.get_pool_metrics()
+                breaker = getattr(service.db, "circuit_breaker", None)
+                if breaker is not None:
+                    result["breaker_state"] = breaker.state
+            except Exception as e:
+                logger.error(f"Site {site.name}: failed to read pool metrics: {e}")
+            service.cleanup()
+        return result
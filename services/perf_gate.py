@@ -0,0 +1,344 @@
+# services/perf_gate.py
+import os
+import json
+import math
+import random
+import resource
+import subprocess
+import sys
+import time
+import platform
+import logging
+import multiprocessing
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Callable, Dict, List, Optional
+from utils.series_codec import encode_series
+
+logger = logging.getLogger(__name__)
+
+BASELINE_FORMAT = "stage-baseline/1"
+T0 = datetime(2023, 10, 1, 12, 0, 0)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Фиксированный синтетический набор: одинаковые ряды при одинаковых параметрах и seed."""
+    sensors: int = 2
+    devices: int = 4
+    times: int = 2
+    series: int = 3
+    length: int = 3000
+    binary_share: float = 0.5  # доля рядов в бинарном формате utils.series_codec, остальные — JSON
+    seed: int = 0
+
+    def rows(self) -> List[dict]:
+        rng = random.Random(self.seed)
+        rows = []
+        for minute in range(self.times):
+            for sensor_id in range(1, self.sensors + 1):
+                for device_id in range(1, self.devices + 1):
+                    for _ in range(self.series):
+                        series = {
+                            "ts": [float(i) for i in range(self.length)],
+                            "feat1": [rng.gauss(0.0, 1.0) for _ in range(self.length)],
+                            "feat2": [rng.uniform(0.0, 10.0) for _ in range(self.length)],
+                        }
+                        data = encode_series(series) if rng.random() < self.binary_share else json.dumps(series)
+                        rows.append({
+                            "sensor_id": sensor_id,
+                            "device_id": device_id,
+                            "measurement_time": T0 + timedelta(minutes=minute),
+                            "data": data,
+                        })
+        return rows
+
+    def snapshot_db(self, rows: List[dict]):
+        from services.snapshot import SnapshotDB
+        context = {"prediction_time": T0, "sensor_id": 1, "device_id": 1, "param1": 1.0, "param2": 2.0, "result": 0.5}
+        return SnapshotDB(context, rows, {sensor_id: 0 for sensor_id in range(1, self.sensors + 1)})
+
+
+# Стадии: подготовка (вне замера) -> функция одного прогона, возвращающая число обработанных измерений
+
+def _fetch(dataset: Dataset, rows: List[dict]) -> Callable[[], int]:
+    from services.data_fetcher import DataFetcher
+    return lambda: len(DataFetcher(dataset.snapshot_db(rows)).get_new_measurements())
+
+
+def _fetch_grouped(dataset: Dataset, rows: List[dict]) -> Callable[[], int]:
+    from services.data_fetcher import DataFetcher
+    return lambda: len(DataFetcher(dataset.snapshot_db(rows)).get_new_measurements_grouped())
+
+
+def _preprocess(dataset: Dataset, rows: List[dict]) -> Callable[[], int]:
+    from services.data_fetcher import DataFetcher
+    from services.preprocessing import preprocess
+    measurements = DataFetcher(dataset.snapshot_db(rows)).get_new_measurements()
+    for measurement in measurements:
+        measurement.add_params(1.0, 2.0)
+    return lambda: len([preprocess(measurement) for measurement in measurements])
+
+
+def _process_batch(dataset: Dataset, rows: List[dict]) -> Callable[[], int]:
+    from services.data_fetcher import DataFetcher
+    from services.measurement_processor import MeasurementProcessor
+    measurements = DataFetcher(dataset.snapshot_db(rows)).get_new_measurements()
+    return lambda: MeasurementProcessor(dataset.snapshot_db(rows), workers=1).process_batch(measurements, (1.0, 2.0))
+
+
+STAGES: Dict[str, Callable[[Dataset, List[dict]], Callable[[], int]]] = {
+    "get_new_measurements": _fetch,
+    "get_new_measurements_grouped": _fetch_grouped,
+    "preprocess": _preprocess,
+    "process_batch": _process_batch,
+}
+
+
+def _percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def _peak_rss() -> int:
+    """
+    Пиковый RSS процесса в байтах. На Linux — VmHWM адресного пространства:
+    ru_maxrss переживает fork и exec и в дочернем процессе начинается с RSS
+    родителя (под pytest — сотни мегабайт). Иначе — ru_maxrss (килобайты,
+    на macOS — байты).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_stage(name: str, dataset: Dataset, repeats: int = 5, warmup: int = 1, min_sample_seconds: float = 0.2) -> dict:
+    """
+    Прогоняет стадию warmup + repeats замеров. Замер повторяет прогон, пока
+    не наберётся min_sample_seconds: единичный прогон быстрой стадии длится
+    миллисекунды и тонет в дрожании таймера и планировщика. Пропускная
+    способность и p95 — по времени одного прогона внутри замеров, шум —
+    относительное медианное отклонение. Пиковый RSS — прирост пика процесса
+    за стадию, поэтому осмыслен только в чистом процессе (см. run_benchmarks).
+    """
+    from services.memory_budget import current_rss
+    rows = dataset.rows()
+    rss_before = current_rss()
+    run = STAGES[name](dataset, rows)
+    started = time.perf_counter()
+    for _ in range(max(warmup, 1)):
+        run()
+    single = (time.perf_counter() - started) / max(warmup, 1)
+    loops = max(1, math.ceil(min_sample_seconds / single)) if single > 0 else 1
+    durations = []
+    items = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            items = run()
+        durations.append((time.perf_counter() - started) / loops)
+    if not items:
+        raise RuntimeError(f"Stage {name} processed nothing: the synthetic dataset no longer passes validation")
+    typical = median(durations)
+    return {
+        "items": items,
+        "repeats": repeats,
+        "loops": loops,
+        "throughput": round(items / typical, 3),
+        "p95_latency": round(_percentile(durations, 0.95), 6),
+        "noise": round(median(abs(d - typical) for d in durations) / typical, 4),
+        "peak_rss_bytes": max(_peak_rss() - rss_before, 0),
+    }
+
+
+def _isolated_stage(name: str, dataset: dict, repeats: int, warmup: int) -> dict:
+    """Замер стадии в процессе `python -m services.perf_gate` (см. _run_in_clean_process)."""
+    logging.disable(logging.INFO)  # журнал стадий в цикле замера только мешает
+    from config import CACHE_CONFIG
+    # Модули стадий импортируются до замера RSS: прирост пика — от самой стадии, а не от импорта
+    import services.data_fetcher  # noqa: F401
+    import services.measurement_processor  # noqa: F401
+    import services.preprocessing  # noqa: F401
+    import services.snapshot  # noqa: F401
+    # Повторные прогоны не должны попадать в кэш нормализации: замеряется само вычисление
+    CACHE_CONFIG.preprocess_memo_max_bytes = 0
+    return run_stage(name, Dataset(**dataset), repeats, warmup)
+
+
+def _run_in_clean_process(name: str, dataset: dict, repeats: int, warmup: int) -> dict:
+    """
+    Запускает замер в новом интерпретаторе. Дочерний процесс multiprocessing
+    (даже spawn) повторно импортирует __main__ родителя — под pytest это весь
+    pytest с плагинами, — и пик RSS ребёнка зависит от того, кто запустил замер.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-m", "services.perf_gate", json.dumps([name, dataset, repeats, warmup])],
+        cwd=root, capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Stage {name} benchmark process failed: {completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+
+
+def merge_sessions(sessions: List[dict]) -> dict:
+    """
+    Сводит сессии стадии (каждая — отдельный процесс) по медиане, чтобы одна
+    удачная или неудачная сессия не становилась базовой линией. Шум — разброс
+    пропускной способности между процессами (половина размаха к медиане):
+    помехи машины меняются между запусками сильнее, чем между прогонами
+    одного процесса. Для одной сессии остаётся её внутренний шум.
+    """
+    throughputs = [session["throughput"] for session in sessions]
+    typical = median(throughputs)
+    if len(sessions) > 1:
+        noise = (max(throughputs) - min(throughputs)) / 2 / typical
+    else:
+        noise = sessions[0]["noise"]
+    return dict(
+        sessions[0],
+        throughput=round(typical, 3),
+        p95_latency=round(median(session["p95_latency"] for session in sessions), 6),
+        peak_rss_bytes=int(median(session["peak_rss_bytes"] for session in sessions)),
+        noise=round(noise, 4),
+        sessions=sum(session.get("sessions", 1) for session in sessions),
+    )
+
+
+def run_benchmarks(
+    dataset: Dataset = Dataset(),
+    stages: Optional[List[str]] = None,
+    repeats: int = 5,
+    warmup: int = 1,
+    sessions: int = 3
+) -> dict:
+    """
+    Каждая сессия стадии — в отдельном чистом интерпретаторе, чтобы пик RSS
+    и прогрев не зависели от соседей и от запустившего процесса; сессии
+    сводятся merge_sessions.
+    """
+    results = {}
+    for name in stages or list(STAGES):
+        runs = [_run_in_clean_process(name, asdict(dataset), repeats, warmup) for _ in range(max(sessions, 1))]
+        results[name] = merge_sessions(runs)
+        logger.info(f"Stage {name}: {results[name]}")
+    return {
+        "format": BASELINE_FORMAT,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": asdict(dataset),
+        "environment": environment(),
+        "stages": results,
+    }
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"{path} is not a stage baseline ({baseline.get('format')!r})")
+    return baseline
+
+
+def save_baseline(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+@dataclass
+class Check:
+    stage: str
+    metric: str
+    baseline: float
+    current: float
+    change: float  # относительное изменение, + — хуже
+    allowed: float  # допустимое ухудшение
+    regressed: bool
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    min_tolerance: float = 0.15,
+    noise_factor: float = 3.0,
+    rss_tolerance: float = 0.2,
+    rss_slack_bytes: int = 8 * 2 ** 20
+) -> List[Check]:
+    """
+    Сравнивает прогон с базовой линией по стадиям, присутствующим в обоих.
+
+    Допуск по времени — не меньше min_tolerance и не меньше noise_factor
+    шумов (больший из шумов базовой линии и прогона), так что на шумной
+    машине порог шире, а на стабильной ловится и небольшое замедление.
+    Пиковый RSS сравнивается с относительным допуском и абсолютным запасом
+    на колебания аллокатора.
+    """
+    checks = []
+    for stage, base in baseline["stages"].items():
+        cur = current["stages"].get(stage)
+        if cur is None:
+            continue
+        allowed = max(min_tolerance, noise_factor * max(base["noise"], cur["noise"]))
+        slowdown = base["throughput"] / cur["throughput"] - 1 if cur["throughput"] else float("inf")
+        checks.append(Check(stage, "throughput", base["throughput"], cur["throughput"], slowdown, allowed, slowdown > allowed))
+        latency = cur["p95_latency"] / base["p95_latency"] - 1 if base["p95_latency"] else 0.0
+        checks.append(Check(stage, "p95_latency", base["p95_latency"], cur["p95_latency"], latency, allowed, latency > allowed))
+        rss_limit = base["peak_rss_bytes"] * (1 + rss_tolerance) + rss_slack_bytes
+        rss_change = cur["peak_rss_bytes"] / base["peak_rss_bytes"] - 1 if base["peak_rss_bytes"] else 0.0
+        rss_allowed = rss_limit / base["peak_rss_bytes"] - 1 if base["peak_rss_bytes"] else float("inf")
+        checks.append(Check(
+            stage, "peak_rss_bytes", base["peak_rss_bytes"], cur["peak_rss_bytes"], rss_change, rss_allowed,
+            cur["peak_rss_bytes"] > rss_limit
+        ))
+    return checks
+
+
+def _format_value(metric: str, value: float) -> str:
+    if metric == "peak_rss_bytes":
+        return f"{value / 2 ** 20:.1f} MB"
+    if metric == "p95_latency":
+        return f"{value * 1000:.1f} ms"
+    return f"{value:.1f}/s"
+
+
+def format_report(checks: List[Check], baseline: dict, current: dict) -> str:
+    """Таблица базовая линия / прогон по стадиям; ухудшения сверх допуска помечены REGRESSED."""
+    lines = []
+    if baseline.get("dataset") != current.get("dataset"):
+        lines.append(f"WARNING: dataset differs from the baseline: {baseline.get('dataset')} vs {current.get('dataset')}")
+    if baseline.get("environment") != current.get("environment"):
+        lines.append(f"WARNING: baseline was recorded on {baseline.get('environment')}, "
+                     f"this run is on {current.get('environment')}; rerun with --update on this machine if expected")
+    header = f"{'stage':<30} {'metric':<15} {'baseline':>12} {'current':>12} {'worse by':>9} {'allowed':>9}  status"
+    lines += [header, "-" * len(header)]
+    for check in checks:
+        allowed = "-" if check.allowed == float("inf") else f"+{check.allowed:.0%}"
+        lines.append(
+            f"{check.stage:<30} {check.metric:<15} {_format_value(check.metric, check.baseline):>12} "
+            f"{_format_value(check.metric, check.current):>12} {check.change:>+9.1%} {allowed:>9}  "
+            f"{'REGRESSED' if check.regressed else 'ok'}"
+        )
+    regressed = sorted({check.stage for check in checks if check.regressed})
+    lines.append(f"Regressed stages: {', '.join(regressed)}" if regressed else "No regressions.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Дочерний процесс run_benchmarks: аргументы стадии — JSON в argv, результат — JSON в stdout
+    print(json.dumps(_isolated_stage(*json.loads(sys.argv[1]))))
@@ -2,18 +2,35 @@
 import time
 import random
 from models.preprocessed_measurement import PreprocessedMeasurement
-from config import DEGRADATION_CONFIG
+from services.degradation import get_degradation_model
+from services.keypoint_detector import KeypointDetector
+
+_keypoint_detector = None
+
+
+def get_keypoint_detector() -> KeypointDetector:
+    """Общий для процесса детектор ключевых точек."""
+    global _keypoint_detector
+    if _keypoint_detector is None:
+        _keypoint_detector = KeypointDetector()
+    return _keypoint_detector
 
 def degradation_shift_calculator(measurements_on_sensor):
-    # Расчет деградации от количества использований
-    e_coef=DEGRADATION_CONFIG.linear_slope_e*measurements_on_sensor+DEGRADATION_CONFIG.linear_intercept_e
-    i_coef=DEGRADATION_CONFIG.linear_slope_i*measurements_on_sensor+DEGRADATION_CONFIG.linear_intercept_i
-    return (e_coef,i_coef)
+    # Расчет деградации от количества использований (коэффициенты предвычислены моделью)
+    e_coef,i_coef=get_degradation_model().coefficients(measurements_on_sensor)
+    return (float(e_coef),float(i_coef))
 
 def predict(preprocessed: PreprocessedMeasurement) -> float:
     # Имитация ML-модели с таймаутом до 3 сек
     time.sleep(0.1)  # Имитация задержки
-    #todo keypoint detector
-    degradation_coefs=degradation_shift_calculator(preprocessed.measurements_count)
-    # prediction=model(key_points_list,preeprocessed.param1,preprocessed.param2,degradation_coefs)
+    key_points = get_keypoint_detector().detect(preprocessed.data["time_series"])
+    # Коэффициенты обычно уже посчитаны на всю порцию одним вызовом модели (MeasurementProcessor)
+    degradation_coefs = preprocessed.data.get("degradation_coefs")
+    if degradation_coefs is None:
+        usage_count = preprocessed.data.get("usage_count")
+        if usage_count is None:
+            # measurement_count — число рядов измерения, а не использований сенсора: подменять им нельзя
+            raise ValueError("usage_count is not assigned: the degradation model needs the sensor usage before the measurement")
+        degradation_coefs=degradation_shift_calculator(usage_count)
+    # prediction=model(key_points,preeprocessed.param1,preprocessed.param2,degradation_coefs)
     return round(random.uniform(0.1, 0.9), 4)
\ No newline at end of file
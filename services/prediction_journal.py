@@ -0,0 +1,54 @@
+# services/prediction_journal.py
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionJournal:
+    """
+    Локальный журнал вычисленных, но ещё не записанных в БД предсказаний.
+
+    Предсказания попадают в журнал до записи батча и удаляются после коммита.
+    Если процесс упал между расчётом и коммитом, перезапуск дописывает их из
+    журнала без повторного препроцессинга и вызова модели (запись идемпотентна).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, predictions: List[Dict]) -> None:
+        with self._lock, open(self.path, "a") as f:
+            for prediction in predictions:
+                record = dict(prediction, measurement_time=prediction["measurement_time"].isoformat())
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def pending(self) -> List[Dict]:
+        with self._lock:
+            if not os.path.exists(self.path):
+                return []
+            predictions = []
+            with open(self.path) as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Обрыв записи при падении процесса: строка не была дописана
+                        logger.warning(f"Skipping truncated journal line {line_number} in {self.path}")
+                        continue
+                    record["measurement_time"] = datetime.fromisoformat(record["measurement_time"])
+                    record.setdefault("quality_code", None)  # записи журнала до появления кода качества
+                    predictions.append(record)
+            return predictions
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
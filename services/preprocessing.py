@@ -1,18 +1,59 @@
 # services/preprocessing.py
+from typing import Dict, List, Optional
+import numpy as np
+from config import CACHE_CONFIG
 from models.measurement_data import MeasurementData
 from models.preprocessed_measurement import PreprocessedMeasurement
+from services.preprocessing_memo import PreprocessingMemo, series_hash, SERIES_FIELDS
+
+_memo: Optional[PreprocessingMemo] = None
+
+
+def get_preprocessing_memo() -> Optional[PreprocessingMemo]:
+    """Общий для процесса кэш нормализованных рядов (None, если выключен)."""
+    global _memo
+    if _memo is None and CACHE_CONFIG.preprocess_memo_max_bytes > 0:
+        _memo = PreprocessingMemo(
+            CACHE_CONFIG.preprocess_memo_max_bytes,
+            CACHE_CONFIG.preprocess_memo_dir or None,
+        )
+    return _memo
+
+
+def normalize_time_series(raw_data: List[Dict], param1: float, param2: float) -> List[Dict]:
+    # todo normalize_time_series: пока только приведение рядов к массивам float64
+    return [
+        {
+            field: np.asarray(values, dtype=np.float64) if field in SERIES_FIELDS else values
+            for field, values in series.items()
+        }
+        for series in raw_data
+    ]
+
 
 def preprocess(measurement: MeasurementData) -> PreprocessedMeasurement:
-    # Заглушка: возвращает структуру с "обработанными" данными
-    # todo normalize_time_series
+    # Результат нормализации зависит только от содержимого рядов и параметров калибровки,
+    # поэтому повторно встречающиеся измерения берутся из кэша
+    memo = get_preprocessing_memo()
+    time_series = None
+    if memo is not None:
+        key = (series_hash(measurement.raw_data), measurement.param1, measurement.param2)
+        time_series = memo.get(key)
+    if time_series is None:
+        time_series = normalize_time_series(measurement.raw_data, measurement.param1, measurement.param2)
+        if memo is not None:
+            memo.put(key, time_series)
+
     processed = {
         "sensor_id": measurement.sensor_id,
         "device_id": measurement.device_id,
         "param1": measurement.param1,
         "param2": measurement.param2,
         "measurement_count":measurement.measurement_count,
+        "usage_count": measurement.usage_count,
+        "degradation_coefs": measurement.degradation_coefs,
         "measurement_time": measurement.measurement_time,
-        "time_series":measurement.raw_data, # must be normalized timeseries
-        "length": sum(len(ts["ts"]) for ts in measurement.raw_data)
+        "time_series":time_series,
+        "length": sum(len(ts["ts"]) for ts in time_series)
     }
-    return PreprocessedMeasurement(processed)
\ No newline at end of file
+    return PreprocessedMeasurement(processed)
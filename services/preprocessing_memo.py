@@ -0,0 +1,126 @@
+# services/preprocessing_memo.py
+import os
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SERIES_FIELDS = ("ts", "feat1", "feat2")
+
+
+def series_hash(raw_data: List[Dict]) -> str:
+    """Хэш содержимого рядов измерения (порядок рядов значим)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for series in raw_data:
+        for field in SERIES_FIELDS:
+            digest.update(np.asarray(series.get(field, ()), dtype=np.float64).tobytes())
+            digest.update(b"|")
+    return digest.hexdigest()
+
+
+class PreprocessingMemo:
+    """
+    Мемоизация результатов нормализации рядов.
+
+    Ключ — (хэш рядов, param1, param2). Память ограничена по суммарному
+    размеру массивов (LRU); опциональный дисковый уровень хранит вытесненные
+    и новые записи в pickle-файлах и переживает перезапуски.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def _size(value: List[Dict]) -> int:
+        return sum(getattr(arr, "nbytes", 0) for series in value for arr in series.values())
+
+    def _disk_path(self, key: Hashable) -> str:
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.pkl")
+
+    def get(self, key: Hashable) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.disk_dir:
+            value = self._load_from_disk(key)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store_in_memory(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: List[Dict]) -> None:
+        self._store_in_memory(key, value)
+        if self.disk_dir:
+            self._save_to_disk(key, value)
+
+    def _store_in_memory(self, key: Hashable, value: List[Dict]) -> None:
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def _load_from_disk(self, key: Hashable) -> Optional[List[Dict]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Corrupted preprocessing memo entry {path}: {str(e)}")
+            return None
+
+    def _save_to_disk(self, key: Hashable, value: List[Dict]) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write preprocessing memo entry {path}: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,101 @@
+# services/quality_gate.py
+import hashlib
+import warnings
+import threading
+from collections import Counter
+from typing import List, Optional
+import numpy as np
+from config import QUALITY_GATE_CONFIG
+from models.measurement_data import MeasurementData
+
+# Коды причин в порядке приоритета: измерению назначается первая сработавшая
+NAN = "nan"
+FLAT = "flat"
+SATURATED = "saturated"
+DUPLICATE_SERIES = "duplicate_series"
+
+
+class QualityGate:
+    """
+    Дешёвая проверка рядов перед препроцессингом и моделью.
+
+    Все ряды порции измерений складываются в матрицы признаков, и доля
+    NaN, разброс и доля точек на экстремумах считаются сразу по всем.
+    Совпадающие по содержимому ряды внутри измерения определяются по хэшу.
+    Для измерений с кодом причины модель не вызывается.
+    """
+
+    def __init__(self, config=QUALITY_GATE_CONFIG):
+        self.config = config
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def check(self, measurements: List[MeasurementData]) -> List[Optional[str]]:
+        """Код причины для каждого измерения или None, если ряды пригодны."""
+        reasons: List[Optional[str]] = [None] * len(measurements)
+        owners = np.array([i for i, m in enumerate(measurements) for _ in m.raw_data], dtype=np.int64)
+        series_list = [series for m in measurements for series in m.raw_data]
+        if series_list:
+            series_reasons = self._check_series(series_list)
+            for priority in (NAN, FLAT, SATURATED):
+                for owner in np.unique(owners[series_reasons == priority]):
+                    if reasons[owner] is None:
+                        reasons[owner] = priority
+
+        for i, measurement in enumerate(measurements):
+            if reasons[i] is None and self._has_duplicate_series(measurement):
+                reasons[i] = DUPLICATE_SERIES
+
+        with self._lock:
+            self.counts.update(reason or "ok" for reason in reasons)
+        return reasons
+
+    def _check_series(self, series_list: List[dict]) -> np.ndarray:
+        """Код причины для каждого ряда (None — ряд пригоден)."""
+        lengths = np.array([len(series.get("ts", ())) for series in series_list])
+        n = np.maximum(lengths, 1)
+        in_series = np.arange(lengths.max(initial=0)) < lengths[:, None]
+        failed = {NAN: np.zeros(len(series_list), dtype=bool)}
+        failed[FLAT] = failed[NAN].copy()
+        failed[SATURATED] = failed[NAN].copy()
+
+        for field in self.config.fields:
+            values = np.full(in_series.shape, np.nan)
+            for row, series in enumerate(series_list):
+                field_values = series.get(field, ())
+                values[row, :min(len(field_values), lengths[row])] = field_values[:lengths[row]]
+            finite = np.isfinite(values) & in_series
+            clean = np.where(finite, values, np.nan)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # ряды целиком из NaN
+                std = np.nanstd(clean, axis=1)
+                high = np.nanmax(clean, axis=1)
+                low = np.nanmin(clean, axis=1)
+            at_extremes = np.maximum((clean == high[:, None]).sum(axis=1), (clean == low[:, None]).sum(axis=1))
+
+            failed[NAN] |= 1 - finite.sum(axis=1) / n > self.config.max_nan_ratio
+            failed[FLAT] |= ~(std >= self.config.min_std)
+            failed[SATURATED] |= at_extremes / n > self.config.max_saturation_ratio
+
+        reasons = np.full(len(series_list), None, dtype=object)
+        for code in (SATURATED, FLAT, NAN):  # в конце — наивысший приоритет
+            reasons[failed[code]] = code
+        return reasons
+
+    @staticmethod
+    def _has_duplicate_series(measurement: MeasurementData) -> bool:
+        seen = set()
+        for series in measurement.raw_data:
+            digest = hashlib.blake2b(digest_size=16)
+            for field in sorted(series):
+                digest.update(field.encode())
+                digest.update(np.asarray(series[field], dtype=np.float64).tobytes())
+            key = digest.digest()
+            if key in seen:
+                return True
+            seen.add(key)
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
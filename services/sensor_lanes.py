@@ -0,0 +1,124 @@
+# services/sensor_lanes.py
+import logging
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from config import PROCESSING_CONFIG
+from models.measurement_data import MeasurementData
+
+logger = logging.getLogger(__name__)
+
+Params = Tuple[float, float]
+
+
+@dataclass
+class Lane:
+    """Измерения одного сенсора в порядке времени и то, с чем их обрабатывать."""
+    sensor_id: int
+    measurements: List[MeasurementData]
+    params: Optional[Params]  # None — новый сенсор, нужна калибровка
+    previous_sensor: Optional[int] = None  # сенсор, который новый сменил на тех же устройствах
+
+
+class SensorLanes:
+    """
+    Обработка независимыми полосами: по полосе на сенсор, полосы параллельно.
+
+    Вместо одного глобального контекста состояние ведётся по группам:
+    параметры — по сенсору (его последнее предсказание или калибровка этого
+    запуска), текущий сенсор — по устройству. Сенсор без параметров считается
+    новым; сменённый им сенсор — тот, что последним измерял большинство его
+    устройств, и калибровка идёт от него. Калибровка выполняется в полосе
+    нового сенсора до обработки его измерений и не задерживает остальные.
+    У каждой полосы свой MeasurementProcessor (свой журнал и контрольная точка).
+    """
+
+    def __init__(
+        self,
+        calibration_service,
+        processor_factory: Callable[[int], object],
+        device_state: Dict[int, dict],
+        sensor_state: Dict[int, dict],
+        workers: Optional[int] = None
+    ):
+        self.calibration_service = calibration_service
+        self.processor_factory = processor_factory  # sensor_id -> MeasurementProcessor
+        self.workers = workers or PROCESSING_CONFIG.lane_workers
+        self.device_sensor = {device_id: state["sensor_id"] for device_id, state in device_state.items()}
+        self.sensor_state = dict(sensor_state)
+        self.params = {sensor_id: (state["param1"], state["param2"]) for sensor_id, state in sensor_state.items()}
+        self._lock = threading.Lock()
+
+    def build_lanes(self, measurements: List[MeasurementData]) -> List[Lane]:
+        by_sensor = defaultdict(list)
+        for measurement in measurements:
+            by_sensor[measurement.sensor_id].append(measurement)
+
+        lanes = []
+        for sensor_id, lane_measurements in by_sensor.items():
+            params = self.params.get(sensor_id)
+            previous_sensor = None
+            if params is None:
+                previous = Counter(
+                    self.device_sensor[m.device_id] for m in lane_measurements
+                    if self.device_sensor.get(m.device_id, sensor_id) != sensor_id
+                )
+                previous_sensor = previous.most_common(1)[0][0] if previous else None
+            lanes.append(Lane(sensor_id, lane_measurements, params, previous_sensor))
+        return lanes
+
+    def run(self, measurements: List[MeasurementData]) -> int:
+        """Обрабатывает пакет по полосам. Возвращает число обработанных измерений."""
+        lanes = self.build_lanes(measurements)
+        if not lanes:
+            return 0
+        logger.info(f"Processing {len(measurements)} measurements in {len(lanes)} sensor lanes")
+        if self.workers > 1 and len(lanes) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sensor-lane") as executor:
+                processed = list(executor.map(self._run_lane, lanes))
+        else:
+            processed = [self._run_lane(lane) for lane in lanes]
+
+        # Текущий сенсор устройства — тот, что измерял его последним (для смен в следующих микробатчах)
+        handled = [m for lane in lanes if lane.sensor_id in self.params for m in lane.measurements]
+        for measurement in sorted(handled, key=lambda m: m.measurement_time):
+            self.device_sensor[measurement.device_id] = measurement.sensor_id
+        return sum(processed)
+
+    def _run_lane(self, lane: Lane) -> int:
+        params = lane.params
+        if params is None:
+            params = self._calibrate(lane)
+            if params is None:
+                return 0
+        processed = self.processor_factory(lane.sensor_id).process_batch(lane.measurements, params)
+        logger.info(f"Lane of sensor {lane.sensor_id}: processed {processed} of {len(lane.measurements)}")
+        return processed
+
+    def _calibrate(self, lane: Lane) -> Optional[Params]:
+        if lane.previous_sensor is None or lane.previous_sensor not in self.sensor_state:
+            logger.error(f"Sensor {lane.sensor_id} has no parameters and replaces no known sensor. "
+                         f"Its {len(lane.measurements)} measurements will be skipped.")
+            return None
+        old_state = self.sensor_state[lane.previous_sensor]
+        logger.info(f"Recalibrating for sensor change from {lane.previous_sensor} to {lane.sensor_id}.")
+        try:
+            params = self.calibration_service.recalibrate_for_sensor_change(
+                old_sensor=lane.previous_sensor,
+                new_sensor=lane.sensor_id,
+                measurements=lane.measurements,
+                context=dict(old_state)
+            )
+        except Exception as e:
+            logger.error(f"Failed to recalibrate for new sensor {lane.sensor_id}. "
+                         f"Measurements will be skipped. Error: {e}")
+            return None
+        with self._lock:
+            # Следующие микробатчи этого запуска обрабатывают сенсор без повторной калибровки
+            self.params[lane.sensor_id] = params
+            self.sensor_state[lane.sensor_id] = dict(
+                old_state, sensor_id=lane.sensor_id, param1=params[0], param2=params[1]
+            )
+        return params
@@ -0,0 +1,96 @@
+# services/sensor_usage.py
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from config import DEGRADATION_CONFIG
+from models.measurement_data import MeasurementData
+
+logger = logging.getLogger(__name__)
+
+
+class SensorUsageCounter:
+    """
+    Кэш счётчиков использований сенсоров из таблицы sensor_usage.
+
+    Счётчики в БД растут в одной транзакции с записью предсказаний, поэтому
+    число использований сенсора берётся из кэша или одним запросом по
+    ключу, без COUNT(*) по истории. Свои записи добавляются в кэш сразу,
+    записи других воркеров становятся видны после usage_cache_ttl.
+    """
+
+    def __init__(self, db, ttl: float = None):
+        self.db = db
+        self.ttl = DEGRADATION_CONFIG.usage_cache_ttl if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._counts: Dict[int, int] = {}
+        self._loaded_at: Dict[int, float] = {}
+
+    def get(self, sensor_id: int) -> int:
+        self.preload([sensor_id])
+        with self._lock:
+            return self._counts[sensor_id]
+
+    def preload(self, sensor_ids: Iterable[int]) -> None:
+        """Загружает одним запросом счётчики отсутствующих или устаревших сенсоров."""
+        now = time.monotonic()
+        with self._lock:
+            stale = sorted({
+                sensor_id for sensor_id in sensor_ids
+                if now - self._loaded_at.get(sensor_id, float("-inf")) > self.ttl
+            })
+        if not stale:
+            return
+        loaded = self.db.fetch_sensor_usage(stale)
+        with self._lock:
+            for sensor_id in stale:
+                self._counts[sensor_id] = int(loaded.get(sensor_id, 0))
+                self._loaded_at[sensor_id] = now
+
+    def assign(self, measurements: List[MeasurementData]) -> None:
+        """Проставляет каждому измерению число использований сенсора до него (с учётом порядка в батче)."""
+        self.preload(m.sensor_id for m in measurements)
+        with self._lock:
+            offsets: Dict[int, int] = {}
+            for measurement in measurements:
+                offset = offsets.get(measurement.sensor_id, 0)
+                measurement.usage_count = self._counts[measurement.sensor_id] + offset
+                offsets[measurement.sensor_id] = offset + 1
+
+    def add(self, increments: Dict[int, int]) -> None:
+        """Учитывает закоммиченные вставки (результат DB.insert_predictions_batch)."""
+        with self._lock:
+            for sensor_id, inserted in increments.items():
+                if sensor_id in self._counts:
+                    self._counts[sensor_id] += inserted
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._loaded_at.clear()
+
+
+class HistoricalSensorUsage:
+    """
+    Число использований сенсора на момент измерения — для пересчёта истории.
+
+    Счётчики sensor_usage уже включают всё записанное после прошлого
+    измерения, поэтому использования считаются по table1: строки сенсора
+    (без дубликатов), использованные раньше measurement_time измерения.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def assign(self, measurements: List[MeasurementData]) -> None:
+        """Проставляет usage_count одним запросом истории на сенсор."""
+        by_sensor: Dict[int, List[MeasurementData]] = defaultdict(list)
+        for measurement in measurements:
+            by_sensor[measurement.sensor_id].append(measurement)
+        for sensor_id, sensor_measurements in by_sensor.items():
+            times = [m.measurement_time for m in sensor_measurements]
+            history = self.db.fetch_sensor_usage_history(sensor_id, min(times), max(times))
+            for measurement in sensor_measurements:
+                measurement.usage_count = history["before"] + bisect_left(history["times"], measurement.measurement_time)
@@ -0,0 +1,164 @@
+# services/shard_worker.py
+import logging
+import threading
+from itertools import groupby
+from typing import List, Optional, Set, Tuple
+from config import SHARDING_CONFIG
+from models.measurement_data import MeasurementData
+from services.data_fetcher import DataFetcher
+from services.measurement_processor import MeasurementProcessor
+from services.sensor_calibration_service import SensorCalibrationService
+
+logger = logging.getLogger(__name__)
+
+LEADER_SHARD = 0  # владелец этого шарда выполняет калибровку новых сенсоров
+
+
+class LeaseManager:
+    """
+    Аренда шардов устройств в таблице work_lease.
+
+    Пока воркер работает, фоновый поток продлевает аренду. Если воркер упал,
+    аренда истекает через lease_ttl и шарды забирают другие воркеры.
+    """
+
+    def __init__(self, db, worker_id: str = None):
+        self.db = db
+        self.worker_id = worker_id or SHARDING_CONFIG.worker_id
+        self.shard_ids: List[int] = []
+        self.lost: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._shards_created = False
+
+    def acquire(self) -> List[int]:
+        if not self._shards_created:
+            self.db.ensure_shards(SHARDING_CONFIG.shard_count)
+            self._shards_created = True
+        self.shard_ids = self.db.claim_shards(
+            self.worker_id, SHARDING_CONFIG.shard_count, SHARDING_CONFIG.shards_per_worker, SHARDING_CONFIG.lease_ttl
+        )
+        self.lost = set()
+        return self.shard_ids
+
+    def renew(self) -> None:
+        renewed = set(self.db.renew_leases(self.worker_id, self.shard_ids, SHARDING_CONFIG.lease_ttl))
+        lost = set(self.shard_ids) - renewed
+        if lost - self.lost:
+            logger.warning(f"Worker {self.worker_id} lost leases on shards {sorted(lost)}")
+        self.lost |= lost
+
+    def start_heartbeat(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop_heartbeat(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(SHARDING_CONFIG.heartbeat_interval):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"Lease heartbeat failed: {str(e)}")
+
+    def release(self) -> None:
+        self.db.release_leases(self.worker_id)
+        self.shard_ids = []
+
+    @property
+    def is_leader(self) -> bool:
+        return LEADER_SHARD in self.shard_ids and LEADER_SHARD not in self.lost
+
+
+class ShardWorker:
+    """
+    Воркер, обрабатывающий только устройства арендованных шардов.
+
+    Измерения обрабатываются непрерывными по времени сегментами одного
+    сенсора. Параметры сенсора берутся из контекста, из опубликованной
+    калибровки (sensor_calibration) или из последних предсказаний сенсора.
+    Новый сенсор калибрует только лидер (владелец шарда 0) по данным всех
+    устройств; остальные воркеры откладывают его измерения до следующего
+    цикла, поэтому калибровка всегда предшествует обработке после смены.
+    """
+
+    def __init__(self, db, lease_manager: LeaseManager = None):
+        self.db = db
+        self.leases = lease_manager or LeaseManager(db)
+        self.data_fetcher = DataFetcher(db)
+        self.calibration_service = SensorCalibrationService()
+        self.measurement_processor = MeasurementProcessor(db, pipeline_id=f"worker:{self.leases.worker_id}")
+
+    def run_cycle(self) -> int:
+        """Один цикл: аренда шардов, выборка и обработка их измерений. Возвращает число обработанных."""
+        shard_ids = self.leases.acquire()
+        if not shard_ids:
+            logger.info(f"Worker {self.leases.worker_id}: no free shards")
+            return 0
+        logger.info(f"Worker {self.leases.worker_id} holds shards {shard_ids}")
+
+        self.data_fetcher.shard_filter = {"shard_count": SHARDING_CONFIG.shard_count, "shard_ids": shard_ids}
+        self.leases.start_heartbeat()
+        try:
+            context = self.data_fetcher.get_last_prediction()
+            if not context:
+                logger.error("Cannot establish processing context. Skipping cycle.")
+                return 0
+            measurements = self.data_fetcher.get_new_measurements()
+            return self._process_by_sensor(measurements, context)
+        finally:
+            self.leases.stop_heartbeat()
+
+    def _process_by_sensor(self, measurements: List[MeasurementData], context: dict) -> int:
+        processed = 0
+        previous_sensor = context["sensor_id"]
+        for sensor_id, segment in groupby(measurements, key=lambda m: m.sensor_id):
+            segment = list(segment)
+            if self.leases.lost:
+                logger.warning("Leases lost, stopping before the next segment")
+                break
+
+            params = self._params_for_sensor(sensor_id, context)
+            if params is None:
+                params = self._calibrate_as_leader(previous_sensor, sensor_id, context)
+            if params is None:
+                # Порядок по сенсору: всё после некалиброванного сегмента ждёт следующего цикла
+                logger.info(
+                    f"Deferring measurements of sensor {sensor_id} from {segment[0].measurement_time} "
+                    f"until its calibration is published"
+                )
+                break
+
+            processed += self.measurement_processor.process_batch(segment, params)
+            previous_sensor = sensor_id
+        return processed
+
+    def _params_for_sensor(self, sensor_id: int, context: dict) -> Optional[Tuple[float, float]]:
+        if sensor_id == context["sensor_id"]:
+            return context["param1"], context["param2"]
+        return self.db.fetch_sensor_calibration(sensor_id) or self.db.fetch_sensor_params(sensor_id)
+
+    def _calibrate_as_leader(self, old_sensor: int, new_sensor: int, context: dict) -> Optional[Tuple[float, float]]:
+        if not self.leases.is_leader:
+            return None
+        # Калибровке нужны устройства всех шардов
+        all_measurements = DataFetcher(self.db).get_new_measurements()
+        new_sensor_measurements = [m for m in all_measurements if m.sensor_id == new_sensor]
+        try:
+            param1, param2 = self.calibration_service.recalibrate_for_sensor_change(
+                old_sensor=old_sensor,
+                new_sensor=new_sensor,
+                measurements=new_sensor_measurements,
+                context=context
+            )
+        except Exception as e:
+            logger.error(f"Leader failed to calibrate sensor {new_sensor}: {e}")
+            return None
+        self.db.save_sensor_calibration(new_sensor, param1, param2, calibrated_by=self.leases.worker_id)
+        # Если калибровку уже опубликовал другой лидер, используем её
+        return self.db.fetch_sensor_calibration(new_sensor) or (param1, param2)
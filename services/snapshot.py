@@ -0,0 +1,208 @@
+# services/snapshot.py
+import json
+import gzip
+import time
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import PROCESSING_CONFIG
+from db.db import DUPLICATE_MEASUREMENT
+from utils.series_codec import is_binary
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "measurement-snapshot/1"
+
+
+def _encode(value):
+    return {"datetime": value.isoformat()} if isinstance(value, datetime) else value
+
+
+def _decode(value):
+    return datetime.fromisoformat(value["datetime"]) if isinstance(value, dict) and "datetime" in value else value
+
+
+def record_snapshot(db, path: str) -> dict:
+    """
+    Записывает окно выборки в сжатый файл: первая строка — контекст последнего
+    предсказания и счётчики сенсоров, далее по строке на ряд table2
+    (sensor_id, device_id, measurement_time, data). Возвращает сводку.
+    """
+    context = db.fetch_last_prediction()
+    rows = db.fetch_unprocessed_measurements_last24h()
+    sensor_ids = sorted({row["sensor_id"] for row in rows})
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "recorded_at": datetime.now().isoformat(),
+        "context": {key: _encode(value) for key, value in context.items()} if context else None,
+        "sensor_usage": [[sensor_id, count] for sensor_id, count in db.fetch_sensor_usage(sensor_ids).items()],
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for row in rows:
+            f.write(json.dumps([
+                row["sensor_id"], row["device_id"], row["measurement_time"].isoformat(), row["data"]
+            ]) + "\n")
+    summary = {"rows": len(rows), "measurements": len({
+        (row["sensor_id"], row["device_id"], row["measurement_time"]) for row in rows
+    }), "sensors": len(sensor_ids)}
+    logger.info(f"Recorded snapshot {path}: {summary}")
+    return summary
+
+
+class SnapshotDB:
+    """
+    Замена DB для воспроизведения записанного окна без базы данных.
+
+    Чтение отдаёт строки снимка во всех формах, которые использует DataFetcher
+    (ряды, агрегаты по измерению, размеры, индекс с хэшами). Записи
+    предсказаний и контрольных точек идут в локальный приёмник (JSON Lines
+    или только в память); уже записанные измерения, как и в table1, из
+    последующих выборок исключаются. Время каждой записи батча сохраняется
+    для отчёта о пропускной способности и задержке.
+    """
+
+    def __init__(self, context: Optional[dict], rows: List[dict], sensor_usage: Dict[int, int], sink_path: Optional[str] = None):
+        self.context = context
+        self.rows = rows
+        self.sensor_usage = dict(sensor_usage)
+        self.sink_path = sink_path
+        self._sink = open(sink_path, "w") if sink_path else None
+        self._written = set()
+        self.checkpoint = None
+        self.predictions = 0
+        self.write_times: List[float] = []  # time.perf_counter() после каждой записи батча
+
+    @classmethod
+    def load(cls, path: str, sink_path: Optional[str] = None) -> "SnapshotDB":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} is not a measurement snapshot ({header.get('format')!r})")
+            rows = []
+            for line in f:
+                sensor_id, device_id, measurement_time, data = json.loads(line)
+                rows.append({
+                    "sensor_id": sensor_id,
+                    "device_id": device_id,
+                    "measurement_time": datetime.fromisoformat(measurement_time),
+                    "data": data
+                })
+        context = {key: _decode(value) for key, value in header["context"].items()} if header["context"] else None
+        logger.info(f"Loaded snapshot {path} recorded at {header['recorded_at']}: {len(rows)} series rows")
+        return cls(context, rows, dict(header["sensor_usage"]), sink_path)
+
+    # Чтение
+
+    def fetch_last_prediction(self, by_measurement_time=False):
+        return dict(self.context) if self.context else None
+
+    def fetch_latest_state(self, group_by="device_id"):
+        # В снимке только общий контекст: он и становится состоянием своей группы
+        return {self.context[group_by]: dict(self.context)} if self.context else {}
+
+    def fetch_checkpoint(self, pipeline_id):
+        return self.checkpoint
+
+    def fetch_sensor_usage(self, sensor_ids):
+        return {sensor_id: self.sensor_usage[sensor_id] for sensor_id in sensor_ids if sensor_id in self.sensor_usage}
+
+    def _unprocessed(self, start=None, end=None):
+        for index, row in enumerate(self.rows):
+            if (row["sensor_id"], row["device_id"], row["measurement_time"]) in self._written:
+                continue
+            if start is not None and end is not None and not start <= row["measurement_time"] <= end:
+                continue
+            yield index, row
+
+    def fetch_unprocessed_measurements_last24h(self, shard_count=None, shard_ids=None, start=None, end=None):
+        return [dict(row) for _, row in self._unprocessed(start, end)]
+
+    def _grouped(self):
+        groups = defaultdict(list)
+        for _, row in self._unprocessed():
+            groups[(row["measurement_time"], row["sensor_id"], row["device_id"])].append(row["data"])
+        return sorted(groups.items())
+
+    def fetch_unprocessed_measurement_groups_last24h(self, min_series, max_series, shard_count=None, shard_ids=None):
+        groups = []
+        for (measurement_time, sensor_id, device_id), data in self._grouped():
+            # Как запрос БД: повторно вставленные ряды отбрасываются до подсчёта, порядок — по хэшу
+            by_hash = dict(sorted({hashlib.sha1(item.encode()).hexdigest(): item for item in data}.items()))
+            if not min_series <= len(by_hash) <= max_series:
+                continue
+            groups.append({
+                "measurement_time": measurement_time,
+                "sensor_id": sensor_id,
+                "device_id": device_id,
+                "series_count": len(by_hash),
+                # Как JSON_ARRAYAGG: бинарные ряды — JSON-строками
+                "payload": "[" + ",".join(json.dumps(item) if is_binary(item) else item for item in by_hash.values()) + "]",
+                "series_hashes": list(by_hash)
+            })
+        return groups
+
+    def fetch_unprocessed_measurement_sizes_last24h(self, shard_count=None, shard_ids=None):
+        return [
+            {
+                "measurement_time": measurement_time,
+                "sensor_id": sensor_id,
+                "device_id": device_id,
+                "series_count": len(data),
+                "data_length": sum(len(item) for item in data)
+            }
+            for (measurement_time, sensor_id, device_id), data in self._grouped()
+        ]
+
+    def fetch_unprocessed_series_index_last24h(self, shard_count=None, shard_ids=None):
+        return [
+            {
+                "row_id": str(index),
+                "sensor_id": row["sensor_id"],
+                "device_id": row["device_id"],
+                "measurement_time": row["measurement_time"],
+                "content_hash": hashlib.sha1(row["data"].encode()).hexdigest()
+            }
+            for index, row in self._unprocessed()
+        ]
+
+    def fetch_series_data_by_row_ids(self, row_ids, chunk_size: int = 1000):
+        return {row_id: self.rows[int(row_id)]["data"] for row_id in row_ids}
+
+    # Запись
+
+    def insert_predictions_batch(self, predictions, checkpoint, target_version=None):
+        usage_increments = Counter()
+        for prediction in predictions:
+            key = (prediction["sensor_id"], prediction["device_id"], prediction["measurement_time"])
+            if key in self._written:
+                continue
+            self._written.add(key)
+            if target_version is None and prediction.get("quality_code") != DUPLICATE_MEASUREMENT:
+                usage_increments[prediction["sensor_id"]] += 1
+            if self._sink:
+                self._sink.write(json.dumps({name: _encode(value) for name, value in prediction.items()}) + "\n")
+        for sensor_id, increment in usage_increments.items():
+            self.sensor_usage[sensor_id] = self.sensor_usage.get(sensor_id, 0) + increment
+        self.checkpoint = dict(
+            checkpoint,
+            processed_total=(self.checkpoint or {}).get("processed_total", 0) + checkpoint["processed"]
+        )
+        self.predictions += len(predictions)
+        self.write_times.append(time.perf_counter())
+        return dict(usage_increments)
+
+    # Пул соединений
+
+    def get_pool_metrics(self) -> dict:
+        return {}
+
+    def tune_pool(self) -> int:
+        return PROCESSING_CONFIG.workers
+
+    def close_pool(self):
+        if self._sink:
+            self._sink.close()
+            self._sink = None
@@ -0,0 +1,65 @@
+# services/speculative_calibration.py
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from config import PROCESSING_CONFIG
+from models.measurement_data import MeasurementData
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeCalibrator:
+    """
+    Фоновая калибровка нового сенсора с момента, когда он впервые виден в выборке.
+
+    observe() вызывается на стадии выборки: первый сенсор после текущего
+    (как его найдёт SensorChangeDetector) копит по одному измерению на
+    устройство, и как только устройств min_devices, калибровка уходит в
+    фоновый поток. Пока она идёт, обрабатываются измерения до смены;
+    take() отдаёт Future для пары (старый, новый сенсор) или None — тогда
+    калибровка выполняется как раньше, синхронно.
+    """
+
+    def __init__(self, calibration_service, min_devices: Optional[int] = None, executor=None):
+        self.calibration_service = calibration_service
+        self.min_devices = PROCESSING_CONFIG.min_calibration_devices if min_devices is None else min_devices
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-calibration")
+        self._first_by_device: Dict[Tuple[int, int], Dict[int, MeasurementData]] = {}
+        self._pending: Dict[Tuple[int, int], Future] = {}
+
+    def observe(self, measurements: List[MeasurementData], current_sensor: int, context: dict) -> None:
+        new_sensor = next((m.sensor_id for m in measurements if m.sensor_id != current_sensor), None)
+        if new_sensor is None:
+            return
+        key = (current_sensor, new_sensor)
+        if key in self._pending:
+            return
+
+        # Калибровке нужно одно (первое) измерение нового сенсора на устройство
+        first_by_device = self._first_by_device.setdefault(key, {})
+        for measurement in measurements:
+            if measurement.sensor_id == new_sensor:
+                first_by_device.setdefault(measurement.device_id, measurement)
+        if len(first_by_device) < self.min_devices:
+            logger.info(f"New sensor {new_sensor} seen on {len(first_by_device)} devices, "
+                        f"waiting for {self.min_devices} to start calibration")
+            return
+
+        logger.info(f"Starting background calibration {current_sensor} -> {new_sensor} "
+                    f"on {len(first_by_device)} devices")
+        self._pending[key] = self._executor.submit(
+            self.calibration_service.recalibrate_for_sensor_change,
+            old_sensor=current_sensor,
+            new_sensor=new_sensor,
+            measurements=list(self._first_by_device.pop(key).values()),
+            context=dict(context)
+        )
+
+    def take(self, old_sensor: int, new_sensor: int) -> Optional[Future]:
+        return self._pending.pop((old_sensor, new_sensor), None)
+
+    def shutdown(self) -> None:
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
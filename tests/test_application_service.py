@@ -92,4 +92,201 @@ def test_cleanup_closes_db_pool(mock_services, caplog):
         app_service.cleanup()
     
     mock_services['db'].close_pool.assert_called_once()
-    assert "Database resources cleaned up" in caplog.text
\ No newline at end of file
+    assert "Database resources cleaned up" in caplog.text
+
+@patch("services.application_service.PROCESSING_CONFIG")
+def test_micro_batches_carry_new_sensor_params_forward(mock_config, mock_services):
+    """После калибровки в одном микробатче следующие обрабатываются новыми параметрами без повторной калибровки."""
+    mock_config.memory_budget_bytes = 10 ** 6
+    mock_config.sensor_lanes = False
+    context = {"prediction_time": datetime.now(), "sensor_id": 1, "param1": 1.0, "param2": 2.0}
+    first = [MeasurementData(2, 1, datetime.now(), 3)]
+    second = [MeasurementData(2, 2, datetime.now(), 3)]
+    mock_services['data_fetcher'].get_last_prediction.return_value = context
+    mock_services['data_fetcher'].iter_new_measurement_batches.return_value = iter([first, second])
+    mock_services['sensor_change_detector'].partition_by_sensor_change.side_effect = [([], first), (second, [])]
+    mock_services['calibration_service'].recalibrate_for_sensor_change.return_value = (1.5, 2.5)
+
+    app_service = ApplicationService()
+    app_service.db = mock_services['db']
+    app_service.data_fetcher = mock_services['data_fetcher']
+    app_service.sensor_change_detector = mock_services['sensor_change_detector']
+    app_service.calibration_service = mock_services['calibration_service']
+    app_service.measurement_processor = mock_services['measurement_processor']
+
+    app_service.process_measurements()
+
+    partition_calls = mock_services['sensor_change_detector'].partition_by_sensor_change.call_args_list
+    assert [c[0][0] for c in partition_calls] == [1, 2]
+    mock_services['calibration_service'].recalibrate_for_sensor_change.assert_called_once()
+    assert [c[0][1] for c in mock_services['measurement_processor'].process_batch.call_args_list] == [
+        (1.5, 2.5), (1.5, 2.5)
+    ]
+
+def test_speculative_calibration_waits_for_enough_devices():
+    from services.speculative_calibration import SpeculativeCalibrator
+    calibration = MagicMock()
+    calibration.recalibrate_for_sensor_change.return_value = (1.5, 2.5)
+    calibrator = SpeculativeCalibrator(calibration, min_devices=2)
+    now = datetime.now()
+    context = {"prediction_time": now, "sensor_id": 1, "param1": 1.0, "param2": 2.0}
+
+    calibrator.observe([MeasurementData(1, 1, now, 3), MeasurementData(2, 1, now, 3)], 1, context)
+    assert calibrator.take(1, 2) is None
+
+    calibrator.observe([MeasurementData(2, 1, now, 3), MeasurementData(2, 2, now, 3)], 1, context)
+    assert calibrator.take(1, 2).result() == (1.5, 2.5)
+    measurements = calibration.recalibrate_for_sensor_change.call_args[1]["measurements"]
+    assert [(m.sensor_id, m.device_id) for m in measurements] == [(2, 1), (2, 2)]
+    calibrator.shutdown()
+
+@patch("services.application_service.PROCESSING_CONFIG")
+def test_speculative_calibration_overlaps_pre_change_processing(mock_config, mock_services):
+    """Калибровка стартует при выборке и идёт, пока обрабатываются измерения старого сенсора."""
+    import threading
+    from services.speculative_calibration import SpeculativeCalibrator
+    mock_config.memory_budget_bytes = 0
+    mock_config.sensor_lanes = False
+    mock_config.server_side_grouping = False
+    mock_config.scheduling = "fifo"
+    mock_config.min_calibration_devices = 2
+    now = datetime.now()
+    context = {"prediction_time": now, "sensor_id": 1, "param1": 1.0, "param2": 2.0}
+    pre = [MeasurementData(1, 1, now, 3)]
+    post = [MeasurementData(2, 1, now, 3), MeasurementData(2, 2, now, 3)]
+    mock_services['data_fetcher'].get_last_prediction.return_value = context
+    mock_services['data_fetcher'].get_new_measurements.return_value = pre + post
+    mock_services['sensor_change_detector'].partition_by_sensor_change.return_value = (pre, post)
+    calibration_started = threading.Event()
+    events = []
+
+    def calibrate(**kwargs):
+        events.append("calibrated")
+        calibration_started.set()
+        return 1.5, 2.5
+
+    def process(measurements, params):
+        # Калибровка уже запущена в фоне к началу обработки старого сенсора
+        if params == (1.0, 2.0):
+            assert calibration_started.wait(5)
+        events.append(params)
+        return len(measurements)
+
+    mock_services['calibration_service'].recalibrate_for_sensor_change.side_effect = calibrate
+    mock_services['measurement_processor'].process_batch.side_effect = process
+
+    app_service = ApplicationService()
+    app_service.db = mock_services['db']
+    app_service.data_fetcher = mock_services['data_fetcher']
+    app_service.sensor_change_detector = mock_services['sensor_change_detector']
+    app_service.calibration_service = mock_services['calibration_service']
+    app_service.measurement_processor = mock_services['measurement_processor']
+    app_service.speculative_calibrator = SpeculativeCalibrator(mock_services['calibration_service'])
+
+    app_service.process_measurements()
+    app_service.speculative_calibrator.shutdown()
+
+    mock_services['calibration_service'].recalibrate_for_sensor_change.assert_called_once()
+    assert events == ["calibrated", (1.0, 2.0), (1.5, 2.5)]
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+@patch("services.application_service.PROCESSING_CONFIG")
+def test_freshest_first_keeps_context_and_usage_across_runs(mock_config, mock_preprocess, mock_predict, mock_services):
+    """
+    Два запуска «сначала свежие» через смену сенсора: последней пишется старая
+    строка сенсора 1, но следующий запуск продолжает с сенсора 2 и его
+    параметров, а счётчики использований растут по времени измерений.
+    """
+    from services.freshness_scheduler import FreshnessScheduler
+    from services.measurement_processor import MeasurementProcessor
+    from services.sensor_change_detector import SensorChangeDetector
+    mock_config.memory_budget_bytes = 0
+    mock_config.sensor_lanes = False
+    mock_config.server_side_grouping = False
+    mock_config.scheduling = "freshest_first"
+    now = datetime(2023, 10, 1, 12, 0)
+    table = [{"prediction_time": 0, "sensor_id": 1, "device_id": 1, "measurement_time": now - timedelta(hours=6),
+              "param1": 1.0, "param2": 2.0, "result": 0.5}]
+    usage = {1: 10}
+    db = mock_services['db']
+    db.fetch_checkpoint.return_value = None
+    db.fetch_sensor_usage.side_effect = lambda sensor_ids: {s: usage[s] for s in sensor_ids if s in usage}
+
+    def insert(rows, checkpoint, target_version=None):
+        # prediction_time — момент записи, как SYSTIMESTAMP в MERGE
+        increments = {}
+        for row in rows:
+            table.append(dict(row, prediction_time=len(table)))
+            increments[row["sensor_id"]] = increments.get(row["sensor_id"], 0) + 1
+        for sensor_id, inserted in increments.items():
+            usage[sensor_id] = usage.get(sensor_id, 0) + inserted
+        return increments
+
+    def last_prediction(by_measurement_time=False):
+        key = (lambda row: (row["measurement_time"], row["prediction_time"])) if by_measurement_time \
+            else (lambda row: row["prediction_time"])
+        return dict(max(table, key=key))
+
+    db.insert_predictions_batch.side_effect = insert
+    data_fetcher = mock_services['data_fetcher']
+    data_fetcher.get_last_prediction.side_effect = last_prediction
+    calibration = mock_services['calibration_service']
+    calibration.recalibrate_for_sensor_change.return_value = (1.5, 2.5)
+
+    app_service = ApplicationService(db=db, local_state=False)
+    app_service.data_fetcher = data_fetcher
+    app_service.sensor_change_detector = SensorChangeDetector(data_fetcher)
+    app_service.calibration_service = calibration
+    app_service.measurement_processor = MeasurementProcessor(db, workers=1, pipeline_id="test")
+    app_service.speculative_calibrator = None
+    app_service.scheduler = FreshnessScheduler(fresh_window=timedelta(minutes=30), backlog_share=0.5, chunk_size=2)
+
+    # Запуск 1: старый сенсор в полосе запоздавших, новый — в свежей
+    first = [MeasurementData(1, i, now - timedelta(minutes=m), 3) for i, m in enumerate([300, 200, 100])]
+    first += [MeasurementData(2, i, now - timedelta(minutes=m), 3) for i, m in enumerate([10, 0])]
+    data_fetcher.get_new_measurements.return_value = first
+    app_service.process_measurements()
+    assert table[-1]["sensor_id"] == 1  # последней записана старая строка
+
+    # Запуск 2: новое измерение сенсора 2 — смены сенсора нет
+    second = [MeasurementData(2, 0, now + timedelta(minutes=10), 3)]
+    data_fetcher.get_new_measurements.return_value = second
+    app_service.process_measurements()
+
+    calibration.recalibrate_for_sensor_change.assert_called_once()
+    assert (table[-1]["sensor_id"], table[-1]["param1"], table[-1]["param2"]) == (2, 1.5, 2.5)
+    assert [m.usage_count for m in first] == [10, 11, 12, 0, 1]
+    assert second[0].usage_count == 2
+
+
+@patch("services.application_service.PROCESSING_CONFIG")
+def test_duplicates_are_recorded_before_the_batch(mock_config, mock_services):
+    """Дубли текущего сенсора записываются с quality_code до обработки; дубли нового сенсора ждут."""
+    mock_config.memory_budget_bytes = 0
+    mock_config.sensor_lanes = False
+    mock_config.server_side_grouping = False
+    mock_config.scheduling = "fifo"
+    now = datetime.now()
+    context = {"prediction_time": now, "sensor_id": 1, "param1": 1.0, "param2": 2.0}
+    measurements = [MeasurementData(1, 1, now, 3)]
+    own, foreign = MeasurementData(1, 2, now, 3), MeasurementData(2, 3, now, 3)
+    mock_services['data_fetcher'].get_last_prediction.return_value = context
+    mock_services['data_fetcher'].get_new_measurements.return_value = measurements
+    mock_services['data_fetcher'].take_duplicates.return_value = [own, foreign]
+    mock_services['sensor_change_detector'].partition_by_sensor_change.return_value = (measurements, [])
+
+    app_service = ApplicationService()
+    app_service.db = mock_services['db']
+    app_service.data_fetcher = mock_services['data_fetcher']
+    app_service.sensor_change_detector = mock_services['sensor_change_detector']
+    app_service.measurement_processor = mock_services['measurement_processor']
+    app_service.speculative_calibrator = None
+
+    app_service.process_measurements()
+
+    calls = [c for c in mock_services['measurement_processor'].mock_calls if c[0] in ("record_skipped", "process_batch")]
+    assert calls[0] == ("record_skipped", ([own], (1.0, 2.0), "duplicate_measurement"), {})
+    assert calls[1][0] == "process_batch"
+    assert len(calls) == 2
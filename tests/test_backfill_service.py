@@ -0,0 +1,153 @@
+# tests/test_backfill_service.py
+import pytest
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
+from models.measurement_data import MeasurementData
+from services.backfill_service import BackfillService, BackfillChunk, BackfillProgress
+
+START = datetime(2023, 10, 1, 0, 0)
+END = datetime(2023, 10, 2, 0, 0)
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.fetch_checkpoint.return_value = None
+    db.fetch_sensor_params_at.return_value = (1.0, 2.0)
+    db.fetch_sensor_usage_history.return_value = {"before": 0, "times": []}
+    db.insert_predictions_batch.return_value = {}  # запись в prediction_backfill не меняет счётчики
+    return db
+
+
+def test_plan_chunks_splits_on_sensor_change(db):
+    """Чанки не пересекают точку смены сенсора."""
+    change = START + timedelta(hours=10)
+    db.fetch_sensor_segments.return_value = [
+        {"start_time": START + timedelta(minutes=5), "sensor_id": 1},
+        {"start_time": change, "sensor_id": 2},
+    ]
+
+    chunks = BackfillService(db).plan_chunks(START, END, timedelta(hours=6))
+
+    assert chunks == [
+        BackfillChunk(START, START + timedelta(hours=6), 1),
+        BackfillChunk(START + timedelta(hours=6), change, 1),
+        BackfillChunk(change, change + timedelta(hours=6), 2),
+        BackfillChunk(change + timedelta(hours=6), change + timedelta(hours=12), 2),
+        BackfillChunk(change + timedelta(hours=12), END, 2),
+    ]
+
+
+@patch("services.backfill_service.MeasurementProcessor")
+def test_run_processes_chunks_into_versioned_target(mock_processor_cls, db):
+    db.fetch_sensor_segments.return_value = [{"start_time": START, "sensor_id": 1}]
+    mock_processor_cls.return_value.process_batch.return_value = 5
+    service = BackfillService(db, workers=2)
+    service.data_fetcher = MagicMock()
+    service.data_fetcher.get_measurements_between.return_value = [MagicMock()]
+
+    summary = service.run(START, END, "v2", chunk_size=timedelta(hours=12))
+
+    assert summary["processed"] == 10
+    assert summary["chunks"] == "2/2"
+    assert summary["percent"] == 100.0
+    kwargs = mock_processor_cls.call_args[1]
+    assert kwargs["target_version"] == "v2"
+    assert kwargs["pipeline_id"].startswith("backfill:v2:1:")
+
+
+@patch("services.backfill_service.MeasurementProcessor")
+def test_chunk_resumes_from_checkpoint(mock_processor_cls, db):
+    """Повторный запуск начинает чанк с контрольной точки."""
+    resume_at = START + timedelta(hours=3)
+    db.fetch_checkpoint.return_value = {"last_measurement_time": resume_at}
+    service = BackfillService(db)
+    service.data_fetcher = MagicMock()
+    service.data_fetcher.get_measurements_between.return_value = []
+
+    service._process_chunk(BackfillChunk(START, START + timedelta(hours=6), 1), "v2", (1.0, 2.0))
+
+    service.data_fetcher.get_measurements_between.assert_called_once_with(resume_at, START + timedelta(hours=6), 1)
+
+
+def test_failed_chunk_is_reported(db, caplog):
+    db.fetch_sensor_segments.return_value = [{"start_time": START, "sensor_id": 1}]
+    db.fetch_sensor_params_at.return_value = None
+
+    with caplog.at_level("ERROR"):
+        summary = BackfillService(db).run(START, END, "v2", chunk_size=timedelta(days=1))
+
+    assert summary["failed_chunks"] == 1
+    assert "No calibration params known for sensor 1" in caplog.text
+
+
+def test_progress_eta():
+    progress = BackfillProgress(total_chunks=4, total_seconds=4 * 3600)
+    progress.started_at -= 10
+
+    snapshot = progress.chunk_done(BackfillChunk(START, START + timedelta(hours=1), 1), processed=3)
+
+    assert snapshot["percent"] == 25.0
+    assert snapshot["eta_s"] == pytest.approx(30, rel=0.1)
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.preprocess")
+def test_chunk_fails_without_advancing_checkpoint_past_lost_rows(mock_preprocess, mock_config, db):
+    """Незаписанная порция проваливает чанк: контрольная точка не уходит за потерянные строки."""
+    mock_config.write_batch_size = 2
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=START + timedelta(minutes=i), measurement_count=0)
+        for i in range(4)
+    ]
+    db.insert_predictions_batch.side_effect = [Exception("ORA-03113: end-of-file on communication channel"), None]
+    service = BackfillService(db)
+    service.data_fetcher = MagicMock()
+    service.data_fetcher.get_measurements_between.return_value = measurements
+
+    with patch("services.measurement_processor.predict", return_value=0.5):
+        with pytest.raises(Exception):
+            service._process_chunk(BackfillChunk(START, START + timedelta(hours=6), 1), "v2", (1.0, 2.0))
+
+    # Ни одна порция после неудачной не записана вместе со своей контрольной точкой
+    assert db.insert_predictions_batch.call_count == 1
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.preprocess")
+def test_failing_measurement_is_recorded_and_chunk_moves_on(mock_preprocess, mock_config, db):
+    """Измерение, на котором падает модель, пишется строкой с ошибкой, а не держит чанк навсегда."""
+    mock_config.write_batch_size = 2
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=START + timedelta(minutes=i), measurement_count=0)
+        for i in range(4)
+    ]
+    service = BackfillService(db)
+    service.data_fetcher = MagicMock()
+    service.data_fetcher.get_measurements_between.return_value = measurements
+
+    with patch("services.measurement_processor.predict", side_effect=[0.5, ValueError("bad series"), 0.5, 0.5]):
+        processed = service._process_chunk(BackfillChunk(START, START + timedelta(hours=6), 1), "v2", (1.0, 2.0))
+
+    assert processed == 4
+    written = [row for c in db.insert_predictions_batch.call_args_list for row in c[0][0]]
+    assert [(row["result"], row["quality_code"]) for row in written] == [
+        (0.5, None), (None, "processing_error"), (0.5, None), (0.5, None)
+    ]
+    assert db.insert_predictions_batch.call_args[0][1]["last_measurement_time"] == START + timedelta(minutes=3)
+
+
+@patch("services.backfill_service.MeasurementProcessor")
+def test_chunk_uses_params_in_effect_at_its_start(mock_processor_cls, db):
+    """Параметры чанка — действовавшие на начало чанка, а не текущие параметры сенсора."""
+    db.fetch_sensor_segments.return_value = [{"start_time": START, "sensor_id": 1}]
+    db.fetch_sensor_params_at.side_effect = lambda sensor_id, at_time: (1.0, 2.0) if at_time < START + timedelta(hours=12) else (3.0, 4.0)
+    mock_processor_cls.return_value.process_batch.return_value = 1
+    service = BackfillService(db, workers=1)
+    service.data_fetcher = MagicMock()
+    service.data_fetcher.get_measurements_between.return_value = [MagicMock()]
+
+    service.run(START, END, "v2", chunk_size=timedelta(hours=12))
+
+    assert sorted(c[0][1] for c in mock_processor_cls.return_value.process_batch.call_args_list) == [(1.0, 2.0), (3.0, 4.0)]
+    db.fetch_sensor_params.assert_not_called()
@@ -0,0 +1,79 @@
+# tests/test_columnar_export.py
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from services.columnar_export import ColumnarExporter, partition_key
+
+T0 = datetime(2023, 10, 1, 23, 59, 0)
+
+
+def _prediction(i, sensor_id=1, measurement_time=None):
+    return {
+        "row_id": f"AAA{i}", "prediction_time": T0 + timedelta(minutes=i), "sensor_id": sensor_id, "device_id": 1,
+        "measurement_time": measurement_time or T0 + timedelta(minutes=i), "param1": 1.0, "param2": 2.0,
+        "result": 0.5, "quality_code": None
+    }
+
+
+def test_partition_key_uses_measurement_day_and_sensor():
+    row = _prediction(0)
+    legacy = dict(_prediction(5), measurement_time=None)
+
+    assert partition_key(row) == ("2023-10-01", 1)
+    assert partition_key(legacy) == ("2023-10-02", 1)
+
+
+def test_export_is_incremental(tmp_path):
+    db = MagicMock()
+    db.fetch_predictions_after.side_effect = [
+        [_prediction(0), _prediction(1), _prediction(2, sensor_id=2)],
+        [_prediction(3)],
+        [],
+    ]
+    written = []
+
+    with patch.object(ColumnarExporter, "_write_partition", side_effect=lambda *args: written.append(args[:2])):
+        exporter = ColumnarExporter(db, export_dir=str(tmp_path), include_series=False, batch_size=3)
+        first = exporter.run()
+        second = ColumnarExporter(db, export_dir=str(tmp_path), include_series=False, batch_size=3).run()
+
+    assert first == {"predictions": 4, "series": 0, "files": 4}
+    assert second == {"predictions": 0, "series": 0, "files": 0}
+    assert [partition for _, partition in written] == [
+        ("2023-10-01", 1), ("2023-10-02", 1), ("2023-10-02", 2), ("2023-10-02", 1)
+    ]
+    # Второй запуск продолжает с последней выгруженной строки
+    assert db.fetch_predictions_after.call_args_list[2][0][0] == {"prediction_time": _prediction(3)["prediction_time"],
+                                                                  "row_id": "AAA3"}
+    assert json.loads((tmp_path / "_export_state.json").read_text())["row_id"] == "AAA3"
+
+
+def test_failed_write_does_not_advance_watermark(tmp_path):
+    db = MagicMock()
+    db.fetch_predictions_after.return_value = [_prediction(0)]
+
+    with patch.object(ColumnarExporter, "_write_partition", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            ColumnarExporter(db, export_dir=str(tmp_path), include_series=False).run()
+
+    assert not (tmp_path / "_export_state.json").exists()
+
+
+def test_export_writes_parquet_partitions(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    series = json.dumps({"ts": [0, 1], "feat1": [0.5, 0.6], "feat2": [1.0, 1.1]})
+    db = MagicMock()
+    db.fetch_predictions_after.side_effect = [[_prediction(0), _prediction(1)], []]
+    db.fetch_series_for_measurements.return_value = [
+        {"sensor_id": 1, "device_id": 1, "measurement_time": T0, "data": series},
+        {"sensor_id": 1, "device_id": 1, "measurement_time": T0, "data": series},
+    ]
+
+    summary = ColumnarExporter(db, export_dir=str(tmp_path), include_series=True, batch_size=10).run()
+
+    assert summary == {"predictions": 2, "series": 2, "files": 3}
+    predictions = parquet.read_table(str(tmp_path / "predictions" / "day=2023-10-01" / "sensor_id=1"))
+    assert predictions.num_rows == 1
+    series_table = parquet.read_table(str(tmp_path / "series" / "day=2023-10-01" / "sensor_id=1"))
+    assert series_table.column("series_index").to_pylist() == [0, 1]
@@ -0,0 +1,171 @@
+# tests/test_data_fetcher.py
+import json
+import pytest
+from unittest.mock import MagicMock
+from datetime import datetime
+from services.data_fetcher import DataFetcher
+from services.dedup_index import content_digest
+
+MEASUREMENT_TIME = datetime(2023, 10, 1, 12, 0, 0)
+
+
+def _series(length=3000, level=1.0):
+    return {"ts": list(range(length)), "feat1": [0.0] * length, "feat2": [level] * length}
+
+
+def _clob(series):
+    """Текст CLOB ряда: бинарный формат уже строка, остальное — JSON."""
+    return series if isinstance(series, str) else json.dumps(series)
+
+
+def _group_row(series_list, series_count=None, device_id=1, measurement_time=MEASUREMENT_TIME):
+    return {
+        "measurement_time": measurement_time,
+        "sensor_id": 1,
+        "device_id": device_id,
+        "series_count": len(series_list) if series_count is None else series_count,
+        "payload": json.dumps(series_list),
+        # SHA-1 исходных CLOB, как DBMS_CRYPTO.HASH в запросе
+        "series_hashes": [content_digest(_clob(series)).hex() for series in series_list],
+    }
+
+
+def test_get_new_measurements_grouped_builds_measurements():
+    """Агрегированные строки превращаются в измерения без повторной группировки."""
+    db = MagicMock()
+    db.fetch_unprocessed_measurement_groups_last24h.return_value = [_group_row([_series(level=k) for k in (1.0, 2.0, 3.0)])]
+
+    measurements = DataFetcher(db).get_new_measurements_grouped()
+
+    db.fetch_unprocessed_measurement_groups_last24h.assert_called_once_with(3, 10)
+    assert len(measurements) == 1
+    assert measurements[0].measurement_count == 3
+    assert len(measurements[0].raw_data) == 3
+
+
+def test_get_new_measurements_grouped_decodes_binary_series():
+    """В агрегате бинарные ряды приходят JSON-строками и декодируются наравне с JSON."""
+    from utils.series_codec import encode_series
+    db = MagicMock()
+    db.fetch_unprocessed_measurement_groups_last24h.return_value = [
+        _group_row([_series(), encode_series(_series(level=2.0)), encode_series(_series(level=3.0))])
+    ]
+
+    measurements = DataFetcher(db).get_new_measurements_grouped()
+
+    assert len(measurements) == 1
+    assert list(measurements[0].raw_data[1]["ts"]) == _series()["ts"]
+
+
+def test_get_new_measurements_grouped_skips_invalid(caplog):
+    """Битый payload и неполные измерения отбрасываются с предупреждением."""
+    broken = _group_row([_series()] * 3, device_id=2)
+    broken["payload"] = "not json"
+    db = MagicMock()
+    db.fetch_unprocessed_measurement_groups_last24h.return_value = [
+        _group_row([_series(), _series(), "bad"], device_id=1),
+        broken,
+    ]
+
+    with caplog.at_level("WARNING"):
+        measurements = DataFetcher(db).get_new_measurements_grouped()
+
+    assert measurements == []
+    assert "Incomplete or invalid measurement" in caplog.text
+    assert "Invalid aggregated payload" in caplog.text
+
+
+def test_get_new_measurements_uses_cache(tmp_path):
+    """Повторная выборка берёт ряды из кэша без передачи CLOB."""
+    from services.measurement_cache import MeasurementCache
+
+    db = MagicMock()
+    db.fetch_unprocessed_series_index_last24h.return_value = [
+        {"row_id": f"R{i}", "sensor_id": 1, "device_id": 1,
+         "measurement_time": MEASUREMENT_TIME, "content_hash": f"h{i}"}
+        for i in range(3)
+    ]
+    db.fetch_series_data_by_row_ids.return_value = {f"R{i}": json.dumps(_series()) for i in range(3)}
+    fetcher = DataFetcher(db, cache=MeasurementCache(str(tmp_path), max_bytes=10 ** 7))
+
+    first = fetcher.get_new_measurements()
+    second = fetcher.get_new_measurements()
+
+    assert len(first) == len(second) == 1
+    db.fetch_series_data_by_row_ids.assert_called_once_with(["R0", "R1", "R2"])
+    assert len(second[0].raw_data) == 3
+    assert list(second[0].raw_data[0]["ts"][:3]) == [0, 1, 2]
+
+
+def _series_rows(series_list, measurement_time=MEASUREMENT_TIME):
+    return [
+        {"measurement_time": measurement_time, "sensor_id": 1, "device_id": 1, "data": json.dumps(series)}
+        for series in series_list
+    ]
+
+
+def test_get_new_measurements_drops_duplicate_series():
+    """Дважды вставленный ряд не завышает measurement_count и декодируется один раз."""
+    db = MagicMock()
+    db.fetch_unprocessed_measurements_last24h.return_value = _series_rows(
+        [_series(level=k) for k in (1.0, 2.0, 3.0, 3.0)]
+    )
+
+    measurements = DataFetcher(db).get_new_measurements()
+
+    assert len(measurements) == 1
+    assert measurements[0].measurement_count == 3
+    assert len(measurements[0].raw_data) == 3
+
+
+def test_get_new_measurements_skips_measurement_resent_under_new_time(tmp_path):
+    from datetime import timedelta
+    from services.dedup_index import DedupIndex
+    series = [_series(level=k) for k in (1.0, 2.0, 3.0)]
+    db = MagicMock()
+    db.fetch_unprocessed_measurements_last24h.return_value = (
+        _series_rows(series) + _series_rows(series, MEASUREMENT_TIME + timedelta(minutes=1))
+    )
+    path = str(tmp_path / "dedup.npz")
+
+    fetcher = DataFetcher(db, dedup_index=DedupIndex(path, retention=timedelta(days=10 ** 4)))
+    measurements = fetcher.get_new_measurements()
+
+    assert [m.measurement_time for m in measurements] == [MEASUREMENT_TIME]
+    # Дубль отдаётся отдельно для записи с quality_code, без рядов
+    (duplicate,) = fetcher.take_duplicates()
+    assert (duplicate.sensor_id, duplicate.measurement_time, duplicate.measurement_count) == (
+        1, MEASUREMENT_TIME + timedelta(minutes=1), 3
+    )
+    assert fetcher.take_duplicates() == []
+    # Индекс сохранён: следующий запуск видит уже выданное измерение
+    db.fetch_unprocessed_measurements_last24h.return_value = _series_rows(series, MEASUREMENT_TIME + timedelta(minutes=2))
+    assert DataFetcher(db, dedup_index=DedupIndex(path, retention=timedelta(days=10 ** 4))).get_new_measurements() == []
+
+
+def test_dedup_index_matches_across_fetch_paths(tmp_path):
+    """Хэш содержимого одинаков в построчной, сгруппированной и кэшированной выборке."""
+    from datetime import timedelta
+    from services.dedup_index import DedupIndex
+    from services.measurement_cache import MeasurementCache
+    series = [_series(level=k) for k in (1.0, 2.0, 3.0)]
+    path = str(tmp_path / "dedup.npz")
+    index = lambda: DedupIndex(path, retention=timedelta(days=10 ** 4))
+    db = MagicMock()
+    db.fetch_unprocessed_measurements_last24h.return_value = _series_rows(series)
+    assert len(DataFetcher(db, dedup_index=index()).get_new_measurements()) == 1
+
+    resent_at = MEASUREMENT_TIME + timedelta(minutes=5)
+    db.fetch_unprocessed_measurement_groups_last24h.return_value = [_group_row(series, measurement_time=resent_at)]
+    grouped = DataFetcher(db, dedup_index=index())
+    assert grouped.get_new_measurements_grouped() == []
+    assert len(grouped.take_duplicates()) == 1
+
+    db.fetch_unprocessed_series_index_last24h.return_value = [
+        {"row_id": f"R{i}", "sensor_id": 1, "device_id": 1, "measurement_time": resent_at,
+         "content_hash": content_digest(json.dumps(s)).hex()}
+        for i, s in enumerate(series)
+    ]
+    cached = DataFetcher(db, cache=MeasurementCache(str(tmp_path / "cache"), max_bytes=10 ** 7), dedup_index=index())
+    assert cached.get_new_measurements() == []
+    assert len(cached.take_duplicates()) == 1
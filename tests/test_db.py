@@ -140,6 +140,16 @@ def test_fetch_last_prediction_returns_none_if_no_data(db_instance):
     assert result is None
 
 
+def test_fetch_last_prediction_by_measurement_time(db_instance):
+    """Test that the newest measurement wins over the latest write when asked."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = None
+
+    db_instance.fetch_last_prediction(by_measurement_time=True)
+
+    assert "ORDER BY measurement_time DESC NULLS LAST, prediction_time DESC" in cursor.execute.call_args[0][0]
+
+
 def test_fetch_unprocessed_measurements_last24h_no_max_time(db_instance, caplog):
     """Test that fetch_unprocessed_measurements returns [] if no max prediction_time."""
     cursor = db_instance.pool.acquire.return_value.cursor.return_value
@@ -307,4 +317,285 @@ def test_init_pool_failure(mock_oracledb):
     mock_oracledb.create_pool.side_effect = Exception("Network error")
 
     with pytest.raises(Exception, match="Network error"):
-        DB()
\ No newline at end of file
+        DB()
+
+def test_get_connection_records_acquire_wait(db_instance):
+    """Acquire is timed into pool metrics."""
+    db_instance.get_connection()
+
+    assert db_instance.metrics.acquire_count == 1
+    assert db_instance.get_pool_metrics()["acquire_count"] == 1
+
+
+def test_queries_are_recorded_in_metrics(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = None
+
+    db_instance.fetch_last_prediction()
+    db_instance.fetch_last_prediction()
+
+    metrics = db_instance.get_pool_metrics()
+    assert metrics["query_count"] == 2
+    assert metrics["stmt_cache_hit_rate"] == 0.5
+
+
+def test_warm_up_opens_connections_on_init(mock_oracledb):
+    """Pool warm-up acquires and releases connections at startup."""
+    with patch("db.db.POOL_TUNING_CONFIG") as mock_tuning, \
+         patch("db.db.PROCESSING_CONFIG") as mock_processing:
+        mock_tuning.warmup = True
+        mock_tuning.stmt_cache_size = 20
+        mock_processing.workers = 3
+        db = DB()
+
+    assert db.pool.acquire.call_count == 3
+    assert db.pool.acquire.return_value.close.call_count == 3
+    assert db.metrics.acquire_count == 0
+
+
+def test_warm_up_failure_is_not_fatal(mock_oracledb, caplog):
+    mock_oracledb.create_pool.return_value.acquire.side_effect = Exception("refused")
+
+    with caplog.at_level("WARNING"):
+        db = DB()
+
+    assert db.pool is mock_oracledb.create_pool.return_value
+    assert "Connection pool warm-up failed" in caplog.text
+
+
+def test_warm_up_releases_acquired_connections_when_one_acquire_fails(mock_oracledb, caplog):
+    acquired = [MagicMock(), MagicMock()]
+    mock_oracledb.create_pool.return_value.acquire.side_effect = [acquired[0], Exception("refused"), acquired[1]]
+
+    with patch("db.db.POOL_TUNING_CONFIG") as mock_tuning, \
+         patch("db.db.PROCESSING_CONFIG") as mock_processing, \
+         caplog.at_level("WARNING"):
+        mock_tuning.warmup = True
+        mock_tuning.stmt_cache_size = 20
+        mock_processing.workers = 3
+        DB()
+
+    assert all(conn.close.call_count == 1 for conn in acquired)
+    assert "Connection pool warm-up failed for 1 of 3 connections" in caplog.text
+
+
+def test_fetch_unprocessed_measurement_groups_last24h(db_instance):
+    """Grouped fetch returns one row per measurement with series count and payload."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (FAKE_PREDICTION_TIME,)
+    payload = MagicMock()
+    payload.read.return_value = '[{"ts": [1]}]'
+    cursor.__iter__.return_value = iter([(FAKE_MEASUREMENT_TIME, 101, 202, 3, payload, '["0A1B"]')])
+
+    result = db_instance.fetch_unprocessed_measurement_groups_last24h(3, 10)
+
+    assert result == [{
+        "measurement_time": FAKE_MEASUREMENT_TIME,
+        "sensor_id": 101,
+        "device_id": 202,
+        "series_count": 3,
+        "payload": '[{"ts": [1]}]',
+        "series_hashes": ["0A1B"],
+    }]
+    sql, = cursor.execute.call_args[0]
+    assert "GROUP BY" in sql and "HAVING COUNT(*) BETWEEN :min_series AND :max_series" in sql
+    # Повторно вставленные ряды отбрасываются до подсчёта
+    assert sql.index("copy_number = 1") < sql.index("HAVING COUNT(*)")
+    assert cursor.execute.call_args[1]["min_series"] == 3
+    assert cursor.execute.call_args[1]["max_series"] == 10
+
+
+def test_fetch_unprocessed_measurement_groups_no_predictions(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (None,)
+
+    assert db_instance.fetch_unprocessed_measurement_groups_last24h(3, 10) == []
+
+
+def test_fetch_series_data_by_row_ids_chunks_in_list(db_instance):
+    """Row ids are fetched in IN-lists of at most chunk_size binds."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.__iter__.side_effect = [iter([("A", "{}"), ("B", "{}")]), iter([("C", "{}")])]
+
+    result = db_instance.fetch_series_data_by_row_ids(["A", "B", "C"], chunk_size=2)
+
+    assert result == {"A": "{}", "B": "{}", "C": "{}"}
+    assert cursor.execute.call_count == 2
+    assert cursor.execute.call_args_list[1][1] == {"r0": "C"}
+
+
+def test_insert_predictions_batch_writes_rows_and_checkpoint_atomically(db_instance):
+    """Predictions are merged and the checkpoint advanced before a single commit."""
+    conn = db_instance.pool.acquire.return_value
+    cursor = conn.cursor.return_value
+    rows = [{"sensor_id": 101, "device_id": 202, "measurement_time": FAKE_MEASUREMENT_TIME,
+             "param1": 1.0, "param2": 2.0, "result": 0.5, "quality_code": None}]
+    checkpoint = {"pipeline_id": "default", "last_measurement_time": FAKE_MEASUREMENT_TIME,
+                  "last_sensor_id": 101, "last_device_id": 202, "processed": 1}
+
+    db_instance.insert_predictions_batch(rows, checkpoint)
+
+    merge_sql, bound_rows = cursor.executemany.call_args[0]
+    assert "MERGE INTO table1" in merge_sql and "WHEN NOT MATCHED" in merge_sql
+    assert bound_rows == rows
+    assert "MERGE INTO processing_checkpoint" in cursor.execute.call_args[0][0]
+    assert cursor.execute.call_args[1] == checkpoint
+    conn.commit.assert_called_once()
+
+
+def test_insert_predictions_batch_rolls_back_on_checkpoint_failure(db_instance):
+    conn = db_instance.pool.acquire.return_value
+    cursor = conn.cursor.return_value
+    cursor.execute.side_effect = Exception("checkpoint failed")
+
+    with pytest.raises(Exception, match="checkpoint failed"):
+        db_instance.insert_predictions_batch([], {"pipeline_id": "default", "last_measurement_time": None})
+
+    conn.rollback.assert_called_once()
+    conn.commit.assert_not_called()
+
+
+def test_fetch_checkpoint(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (FAKE_MEASUREMENT_TIME, 101, 202, 7, FAKE_PREDICTION_TIME)
+
+    checkpoint = db_instance.fetch_checkpoint("default")
+
+    assert checkpoint["last_measurement_time"] == FAKE_MEASUREMENT_TIME
+    assert checkpoint["processed_total"] == 7
+
+
+def test_claim_shards_skips_locked_rows_and_takes_leases(db_instance):
+    conn = db_instance.pool.acquire.return_value
+    cursor = conn.cursor.return_value
+    cursor.fetchmany.return_value = [(0,), (3,)]
+
+    shard_ids = db_instance.claim_shards("w1", shard_count=8, limit=2, ttl_seconds=60)
+
+    assert shard_ids == [0, 3]
+    assert "FOR UPDATE SKIP LOCKED" in cursor.execute.call_args[0][0]
+    cursor.fetchmany.assert_called_once_with(2)
+    assert [row["shard_id"] for row in cursor.executemany.call_args[0][1]] == [0, 3]
+    conn.commit.assert_called_once()
+
+
+def test_unprocessed_fetch_is_restricted_to_shards(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (FAKE_MEASUREMENT_TIME,)
+    cursor.fetchall.return_value = []
+
+    db_instance.fetch_unprocessed_measurements_last24h(shard_count=8, shard_ids=[1, 5])
+
+    sql, binds = cursor.execute.call_args[0][0], cursor.execute.call_args[1]
+    assert "MOD(t2.device_id, :shard_count) IN (:shard0, :shard1)" in sql
+    assert binds["shard_count"] == 8 and binds["shard0"] == 1 and binds["shard1"] == 5
+
+
+def test_insert_predictions_batch_counts_only_inserted_rows(db_instance):
+    """Повторно записанные (уже существующие) строки не увеличивают sensor_usage."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.getarraydmlrowcounts.return_value = [1, 0, 1]
+    rows = [
+        {"sensor_id": sensor_id, "device_id": device_id, "measurement_time": FAKE_MEASUREMENT_TIME,
+         "param1": 1.0, "param2": 2.0, "result": 0.5, "quality_code": None}
+        for sensor_id, device_id in [(101, 1), (101, 2), (102, 1)]
+    ]
+    checkpoint = {"pipeline_id": "default", "last_measurement_time": FAKE_MEASUREMENT_TIME,
+                  "last_sensor_id": 102, "last_device_id": 1, "processed": 3}
+
+    increments = db_instance.insert_predictions_batch(rows, checkpoint)
+
+    assert increments == {101: 1, 102: 1}
+    usage_sql, usage_rows = cursor.executemany.call_args_list[1][0]
+    assert "MERGE INTO sensor_usage" in usage_sql
+    assert usage_rows == [{"sensor_id": 101, "inserted": 1}, {"sensor_id": 102, "inserted": 1}]
+
+
+def test_duplicate_measurement_rows_are_not_sensor_usage(db_instance):
+    """Строки повторно присланных измерений не увеличивают sensor_usage и не входят в пересчёт."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.getarraydmlrowcounts.return_value = [1, 1]
+    rows = [
+        {"sensor_id": 101, "device_id": device_id, "measurement_time": FAKE_MEASUREMENT_TIME,
+         "param1": 1.0, "param2": 2.0, "result": result, "quality_code": quality_code}
+        for device_id, result, quality_code in [(1, 0.5, None), (2, None, "duplicate_measurement")]
+    ]
+    checkpoint = {"pipeline_id": "default", "last_measurement_time": FAKE_MEASUREMENT_TIME,
+                  "last_sensor_id": 101, "last_device_id": 2, "processed": 2}
+
+    assert db_instance.insert_predictions_batch(rows, checkpoint) == {101: 1}
+
+    db_instance.rebuild_sensor_usage()
+    db_instance.check_sensor_usage()
+    statements = [c[0][0] for c in cursor.execute.call_args_list if "COUNT(*)" in c[0][0]]
+    assert len(statements) == 2
+    assert all("quality_code <> 'duplicate_measurement'" in sql for sql in statements)
+
+
+def test_fetch_sensor_usage_history_counts_uses_before_the_window(db_instance):
+    """История использований для пересчёта: до начала окна — числом, внутри — моментами."""
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (12,)
+    cursor.__iter__.return_value = iter([(FAKE_MEASUREMENT_TIME,)])
+    end = FAKE_MEASUREMENT_TIME + timedelta(hours=1)
+
+    history = db_instance.fetch_sensor_usage_history(101, FAKE_MEASUREMENT_TIME, end)
+
+    assert history == {"before": 12, "times": [FAKE_MEASUREMENT_TIME]}
+    count_sql, times_sql = [c[0][0] for c in cursor.execute.call_args_list]
+    assert "quality_code <> 'duplicate_measurement'" in count_sql
+    assert "NVL(measurement_time, prediction_time) < :start_time" in count_sql
+    assert cursor.execute.call_args[1] == {"sensor_id": 101, "start_time": FAKE_MEASUREMENT_TIME, "end_time": end}
+
+
+def test_fetch_sensor_params_at_prefers_latest_use_before_the_time(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.fetchone.return_value = (1.5, 2.5)
+
+    assert db_instance.fetch_sensor_params_at(101, FAKE_MEASUREMENT_TIME) == (1.5, 2.5)
+
+    sql = cursor.execute.call_args[0][0]
+    assert "CASE WHEN used_at <= :at_time THEN used_at END DESC" in sql
+    assert cursor.execute.call_args[1] == {"sensor_id": 101, "at_time": FAKE_MEASUREMENT_TIME}
+
+
+def test_check_sensor_usage_reports_mismatches(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.__iter__.return_value = iter([(101, 5, 7), (102, None, 3)])
+
+    assert db_instance.check_sensor_usage() == [
+        {"sensor_id": 101, "stored": 5, "actual": 7},
+        {"sensor_id": 102, "stored": None, "actual": 3},
+    ]
+
+
+def test_fetch_predictions_after_continues_from_watermark(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.__iter__.return_value = iter([
+        ("AAAB", FAKE_MEASUREMENT_TIME, 101, 1, FAKE_MEASUREMENT_TIME, 1.0, 2.0, 0.5, None)
+    ])
+
+    rows = db_instance.fetch_predictions_after(
+        {"prediction_time": FAKE_MEASUREMENT_TIME, "row_id": "AAAA"}, lag_seconds=30, limit=100
+    )
+
+    sql = cursor.execute.call_args[0][0]
+    binds = cursor.execute.call_args[1]
+    assert "t1.ROWID > CHARTOROWID(:after_row_id)" in sql
+    assert binds["after_row_id"] == "AAAA" and binds["lag_seconds"] == 30
+    assert rows[0]["row_id"] == "AAAB" and rows[0]["sensor_id"] == 101
+
+
+def test_fetch_latest_state_groups_by_device(db_instance):
+    cursor = db_instance.pool.acquire.return_value.cursor.return_value
+    cursor.__iter__.return_value = iter([
+        (FAKE_MEASUREMENT_TIME, 101, 1, 1.0, 2.0, 0.5),
+        (FAKE_MEASUREMENT_TIME, 102, 2, 3.0, 4.0, 0.6),
+    ])
+
+    state = db_instance.fetch_latest_state("device_id")
+
+    assert "PARTITION BY t1.device_id" in cursor.execute.call_args[0][0]
+    assert state[2]["sensor_id"] == 102 and state[2]["param1"] == 3.0
+    with pytest.raises(ValueError):
+        db_instance.fetch_latest_state("result")
@@ -0,0 +1,45 @@
+# tests/test_dedup_index.py
+from datetime import datetime, timedelta
+from services.dedup_index import DedupIndex, content_digest
+
+T0 = datetime(2023, 10, 1, 12, 0, 0)
+DIGESTS = [content_digest("a"), content_digest("b"), content_digest("c")]
+
+
+def test_same_content_at_other_time_is_duplicate():
+    index = DedupIndex()
+
+    assert not index.is_duplicate(1, 1, T0, DIGESTS)
+    assert index.is_duplicate(1, 1, T0 + timedelta(minutes=5), list(reversed(DIGESTS)))
+    assert index.duplicates == 1
+
+
+def test_refetch_of_same_measurement_is_not_duplicate():
+    """Повторная выборка ещё не записанного измерения в следующем окне — не дубль."""
+    index = DedupIndex()
+
+    assert not index.is_duplicate(1, 1, T0, DIGESTS)
+    assert not index.is_duplicate(1, 1, T0, DIGESTS)
+    assert not index.is_duplicate(1, 2, T0 + timedelta(minutes=5), DIGESTS)
+
+
+def test_index_persists_and_prunes(tmp_path):
+    path = str(tmp_path / "dedup.npz")
+    index = DedupIndex(path)
+    index.is_duplicate(1, 1, T0, DIGESTS)
+    index.is_duplicate(1, 1, T0 + timedelta(days=3), DIGESTS[:2])
+    index.save()
+
+    restored = DedupIndex(path)
+    assert len(restored) == 2
+    assert restored.is_duplicate(1, 1, T0 + timedelta(hours=1), DIGESTS)
+
+    assert restored.prune(T0 + timedelta(days=3)) == 1
+    assert len(restored) == 1
+
+
+def test_unreadable_index_starts_empty(tmp_path):
+    path = tmp_path / "dedup.npz"
+    path.write_bytes(b"garbage")
+
+    assert len(DedupIndex(str(path))) == 0
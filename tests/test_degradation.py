@@ -0,0 +1,103 @@
+# tests/test_degradation.py
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from services.degradation import (
+    LinearDegradation, QuadraticDegradation, TableDegradation, create_degradation_model
+)
+from services.prediction import degradation_shift_calculator
+
+
+def _config(**overrides):
+    config = MagicMock(
+        degradation_type="linear", linear_slope_e=0.5, linear_intercept_e=1.0,
+        linear_slope_i=0.25, linear_intercept_i=2.0, quadratic_e=0.1, quadratic_i=0.0,
+        table_path="", precomputed_size=10
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def test_linear_uses_table_and_formula_beyond_it():
+    model = LinearDegradation(0.5, 1.0, 0.25, 2.0, precomputed_size=10)
+
+    coefs = model.coefficients([0, 4, 20])
+
+    assert coefs.tolist() == [[1.0, 2.0], [3.0, 3.0], [11.0, 7.0]]
+
+
+def test_quadratic_adds_square_term():
+    model = create_degradation_model(_config(degradation_type="quadratic"))
+
+    assert isinstance(model, QuadraticDegradation)
+    assert model.coefficients(np.array([3, 30])).tolist() == [[3.4, 2.75], [106.0, 9.5]]
+
+
+def test_table_interpolates_and_holds_edges(tmp_path):
+    path = tmp_path / "degradation.csv"
+    path.write_text("# usage,e,i\n0,1.0,1.0\n10,2.0,0.0\n")
+
+    model = create_degradation_model(_config(degradation_type="table", table_path=str(path), precomputed_size=5))
+
+    assert isinstance(model, TableDegradation)
+    assert model.coefficients([5, 10, 100]).tolist() == [[1.5, 0.5], [2.0, 0.0], [2.0, 0.0]]
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(ValueError, match="Unknown degradation type"):
+        create_degradation_model(_config(degradation_type="cubic"))
+
+
+def test_degradation_shift_calculator_returns_scalar_pair():
+    model = LinearDegradation(0.5, 1.0, 0.25, 2.0, precomputed_size=10)
+    with patch("services.prediction.get_degradation_model", return_value=model):
+        assert degradation_shift_calculator(4) == (3.0, 3.0)
+
+
+@patch("services.prediction.time.sleep")
+def test_predict_takes_usage_from_preprocessed_data(mock_sleep):
+    from models.preprocessed_measurement import PreprocessedMeasurement
+    from services.prediction import predict
+    preprocessed = PreprocessedMeasurement({
+        "measurement_count": 2,
+        "usage_count": 7,
+        "time_series": [{"ts": np.arange(5.0), "feat1": np.array([0, 1, 0, 2, 0.0])}],
+    })
+
+    with patch("services.prediction.degradation_shift_calculator", return_value=(1.0, 1.0)) as calculator:
+        result = predict(preprocessed)
+
+    calculator.assert_called_once_with(7)
+    assert 0.1 <= result <= 0.9
+
+
+@patch("services.prediction.time.sleep")
+def test_predict_without_usage_count_fails_instead_of_using_series_count(mock_sleep):
+    from models.preprocessed_measurement import PreprocessedMeasurement
+    from services.prediction import predict
+    preprocessed = PreprocessedMeasurement({
+        "measurement_count": 2,
+        "usage_count": None,
+        "time_series": [{"ts": np.arange(5.0), "feat1": np.array([0, 1, 0, 2, 0.0])}],
+    })
+
+    with pytest.raises(ValueError, match="usage_count is not assigned"):
+        predict(preprocessed)
+
+
+@patch("services.prediction.time.sleep")
+def test_predict_uses_coefficients_precomputed_for_the_batch(mock_sleep):
+    from models.preprocessed_measurement import PreprocessedMeasurement
+    from services.prediction import predict
+    preprocessed = PreprocessedMeasurement({
+        "measurement_count": 2,
+        "usage_count": 7,
+        "degradation_coefs": (4.5, 3.75),
+        "time_series": [{"ts": np.arange(5.0), "feat1": np.array([0, 1, 0, 2, 0.0])}],
+    })
+
+    with patch("services.prediction.degradation_shift_calculator") as calculator:
+        predict(preprocessed)
+
+    calculator.assert_not_called()
@@ -0,0 +1,51 @@
+# tests/test_freshness_scheduler.py
+from datetime import datetime, timedelta
+from models.measurement_data import MeasurementData
+from services.freshness_scheduler import FreshnessScheduler
+
+NOW = datetime(2023, 10, 1, 12, 0, 0)
+OLD_PARAMS = (1.0, 2.0)
+NEW_PARAMS = (1.5, 2.5)
+
+
+def _measurements(sensor_id, minutes_ago):
+    return [MeasurementData(sensor_id, i, NOW - timedelta(minutes=m), 3) for i, m in enumerate(minutes_ago)]
+
+
+def test_fresh_lane_goes_first_newest_to_oldest():
+    scheduler = FreshnessScheduler(fresh_window=timedelta(minutes=30), backlog_share=0.5, chunk_size=4)
+    measurements = _measurements(1, [300, 200, 20, 10, 0])
+
+    chunks = scheduler.schedule([(measurements, OLD_PARAMS)])
+
+    assert [c.lane for c in chunks] == ["fresh", "backlog", "fresh"]
+    assert [m.measurement_time for m in chunks[0].measurements] == [NOW, NOW - timedelta(minutes=10)]
+    assert [m.measurement_time for m in chunks[1].measurements] == [
+        NOW - timedelta(minutes=300), NOW - timedelta(minutes=200)
+    ]
+
+
+def test_backlog_gets_its_share_while_fresh_data_remains():
+    scheduler = FreshnessScheduler(fresh_window=timedelta(minutes=30), backlog_share=0.25, chunk_size=4)
+    measurements = _measurements(1, list(range(0, 12)) + list(range(100, 104)))
+
+    chunks = scheduler.schedule([(measurements, OLD_PARAMS)])
+
+    assert [(c.lane, len(c.measurements)) for c in chunks[:4]] == [
+        ("fresh", 3), ("backlog", 1), ("fresh", 3), ("backlog", 1)
+    ]
+    assert sum(len(c.measurements) for c in chunks) == 16
+
+
+def test_chunks_keep_calibration_params_of_their_part():
+    """Калибровка назначена частям до планирования: порядок свежести не смешивает параметры."""
+    scheduler = FreshnessScheduler(fresh_window=timedelta(minutes=30), backlog_share=0.2, chunk_size=10)
+    before_change = _measurements(1, [25, 20])
+    after_change = _measurements(2, [10, 0])
+
+    chunks = scheduler.schedule([(before_change, OLD_PARAMS), (after_change, NEW_PARAMS)])
+
+    assert [(c.params, [m.sensor_id for m in c.measurements]) for c in chunks] == [
+        (NEW_PARAMS, [2, 2]), (OLD_PARAMS, [1, 1])
+    ]
+    assert chunks[1].max_age == timedelta(minutes=20)
@@ -0,0 +1,41 @@
+# tests/test_import_time.py
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Бюджет импорта main (мс); после переноса тяжёлых импортов — около 70 мс
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "150"))
+HEAVY_MODULES = ("numpy", "oracledb")
+
+
+def _import_main():
+    """Импортирует main в чистом интерпретаторе с -X importtime: (время в мс, загруженные модули)."""
+    code = "import sys, main; print(','.join(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    cumulative_us = next(
+        int(line.split("|")[1])
+        for line in completed.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[2].strip() == "main"
+    )
+    return cumulative_us / 1000, set(completed.stdout.strip().split(","))
+
+
+def test_main_import_does_not_load_heavy_dependencies():
+    _, modules = _import_main()
+
+    assert not {m for m in modules if m.split(".")[0] in HEAVY_MODULES}
+
+
+def test_main_import_time_within_budget():
+    # Лучший из трёх запусков: разброс из-за кэша ФС и загрузки машины не должен ронять проверку
+    best_ms = min(_import_main()[0] for _ in range(3))
+
+    assert best_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"import main took {best_ms:.0f} ms, budget {IMPORT_TIME_BUDGET_MS:.0f} ms; "
+        f"see python -X importtime -c 'import main'"
+    )
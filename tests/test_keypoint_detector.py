@@ -0,0 +1,102 @@
+# tests/test_keypoint_detector.py
+import os
+import time
+import numpy as np
+import pytest
+from services.keypoint_detector import KeypointDetector, KEYPOINT_FEATURES
+
+
+def _reference_prominences(x, window):
+    """Поточечный расчёт выраженности пиков для сверки."""
+    result = {}
+    for i in range(1, len(x) - 1):
+        if x[i] > x[i - 1] and x[i] >= x[i + 1]:
+            left_base = right_base = x[i]
+            j = i - 1
+            while j >= max(0, i - window) and x[j] <= x[i]:
+                left_base = min(left_base, x[j])
+                j -= 1
+            j = i + 1
+            while j <= min(len(x) - 1, i + window) and x[j] <= x[i]:
+                right_base = min(right_base, x[j])
+                j += 1
+            result[i] = x[i] - max(left_base, right_base)
+    return result
+
+
+def _series(values):
+    return {"ts": np.arange(len(values), dtype=float), "feat1": np.asarray(values, dtype=float)}
+
+
+def test_detects_peaks_with_prominence_and_width():
+    detector = KeypointDetector(min_prominence=0.5, min_width=1, window=10, max_keypoints=4)
+    values = [0, 1, 3, 1, 0, 0, 2, 2.5, 2, 0, 0.2, 0]
+
+    keypoints = detector.detect([_series(values)])
+
+    assert keypoints.shape == (1, 4, len(KEYPOINT_FEATURES))
+    found = keypoints[0][~np.isnan(keypoints[0, :, 0])]
+    assert found[:, 0].tolist() == [2, 7]  # пик 0.2 отсеян по выраженности
+    assert found[:, 2].tolist() == [3, 2.5]
+    assert found[:, 3].tolist() == [1, 3]
+
+
+def test_prominence_matches_pointwise_reference():
+    rng = np.random.default_rng(1)
+    values = np.cumsum(rng.standard_normal(500))
+    detector = KeypointDetector(min_prominence=-np.inf, window=25, max_keypoints=500)
+
+    keypoints = detector.detect([_series(values)])[0]
+
+    found = {int(ts): prominence for ts, prominence in keypoints[:, [0, 2]] if not np.isnan(ts)}
+    reference = _reference_prominences(values, 25)
+    assert found.keys() == reference.keys()
+    assert np.allclose([found[i] for i in reference], list(reference.values()))
+
+
+def test_keeps_most_prominent_in_time_order():
+    detector = KeypointDetector(min_prominence=0, window=5, max_keypoints=2)
+    values = [0, 1, 0, 5, 0, 2, 0, 4, 0]
+
+    keypoints = detector.detect([_series(values)])[0]
+
+    assert keypoints[:, 0].tolist() == [3, 7]
+
+
+def test_batch_pads_series_and_keypoints():
+    detector = KeypointDetector(min_prominence=0.5, window=5, max_keypoints=3)
+    first = [_series([0, 2, 0]), _series([0, 1, 0, 3, 0, 0])]
+    second = [_series([1, 1, 1])]
+
+    batch = detector.detect_batch([first, second])
+
+    assert batch.features.shape == (2, 2, 3, len(KEYPOINT_FEATURES))
+    assert batch.mask.sum(axis=-1).tolist() == [[1, 2], [0, 0]]
+    assert np.isnan(batch.features[1]).all()
+    assert np.array_equal(batch.features[0], detector.detect(first), equal_nan=True)
+
+
+def _benchmark_input():
+    rng = np.random.default_rng(0)
+    ts = np.linspace(0, 60, 8000)
+    series = [{"ts": ts, "feat1": np.sin(ts * (1 + i / 10)) + 0.05 * rng.standard_normal(8000)} for i in range(10)]
+    return series, KeypointDetector(min_prominence=0.5, min_width=3, window=50, max_keypoints=32)
+
+
+def test_detect_10x8000_shape():
+    series, detector = _benchmark_input()
+
+    assert detector.detect(series).shape == (10, 32, len(KEYPOINT_FEATURES))
+
+
+@pytest.mark.skipif(not os.getenv("PERF_GATE"), reason="set PERF_GATE=1 to run wall-clock benchmarks")
+def test_detect_10x8000_benchmark():
+    """Порог с большим запасом: поточечная реализация на таком входе занимает секунды."""
+    series, detector = _benchmark_input()
+
+    started = time.perf_counter()
+    keypoints = detector.detect(series)
+    elapsed = time.perf_counter() - started
+
+    assert keypoints.shape == (10, 32, len(KEYPOINT_FEATURES))
+    assert elapsed < 1.0
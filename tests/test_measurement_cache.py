@@ -0,0 +1,70 @@
+# tests/test_measurement_cache.py
+import numpy as np
+import pytest
+from datetime import datetime
+from services.measurement_cache import MeasurementCache
+
+KEY = (1, 2, datetime(2023, 10, 1, 12, 0, 0))
+
+
+def _series(length, offset=0.0):
+    return {
+        "ts": list(range(length)),
+        "feat1": [offset + i * 0.5 for i in range(length)],
+        "feat2": [offset - i for i in range(length)],
+    }
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    """Записанные ряды читаются обратно через memory map."""
+    cache = MeasurementCache(str(tmp_path), max_bytes=10 ** 6)
+    series = [_series(5), _series(3, offset=1.0)]
+
+    cache.put(KEY, "hash", series)
+    restored = cache.get(KEY, "hash")
+
+    assert len(restored) == 2
+    for original, cached in zip(series, restored):
+        for field in ("ts", "feat1", "feat2"):
+            np.testing.assert_array_equal(cached[field], original[field])
+    assert isinstance(restored[0]["ts"].base, np.memmap)
+    assert cache.stats()["hits"] == 1
+
+
+def test_changed_content_hash_is_a_miss(tmp_path):
+    cache = MeasurementCache(str(tmp_path), max_bytes=10 ** 6)
+    cache.put(KEY, "old", [_series(3)])
+
+    assert cache.get(KEY, "new") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_by_size(tmp_path):
+    """При превышении лимита вытесняется наименее востребованная запись."""
+    entry_size = 3 * 10 * 8 + 2 * 8
+    cache = MeasurementCache(str(tmp_path), max_bytes=2 * entry_size)
+    keys = [(1, device, KEY[2]) for device in range(3)]
+
+    cache.put(keys[0], "h", [_series(10)])
+    cache.put(keys[1], "h", [_series(10)])
+    cache.get(keys[0], "h")  # keys[1] становится самым старым
+    cache.put(keys[2], "h", [_series(10)])
+
+    assert cache.get(keys[1], "h") is None
+    assert cache.get(keys[0], "h") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 2 * entry_size
+
+
+def test_index_persists_between_instances(tmp_path):
+    cache = MeasurementCache(str(tmp_path), max_bytes=10 ** 6)
+    cache.put(KEY, "hash", [_series(4)])
+    cache.flush()
+
+    reopened = MeasurementCache(str(tmp_path), max_bytes=10 ** 6)
+
+    assert reopened.get(KEY, "hash") is not None
+
+
+def test_content_hash_ignores_row_order():
+    assert MeasurementCache.content_hash(["a", "b"]) == MeasurementCache.content_hash(["b", "a"])
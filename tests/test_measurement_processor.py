@@ -1,8 +1,10 @@
 # tests/test_measurement_processor.py
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from datetime import datetime
 from models.measurement_data import MeasurementData
 from services.measurement_processor import MeasurementProcessor
+from services.prediction_journal import PredictionJournal
 
 def test_process_batch_success():
     """Тест успешной обработки батча измерений."""
@@ -35,4 +37,112 @@ def test_process_batch_with_failures(caplog):
     
     assert processed_count == 1
     assert "Failed to process measurement" in caplog.text
-    
\ No newline at end of file
+    
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_process_batch_with_workers(mock_preprocess, mock_predict):
+    """Параллельная обработка батча несколькими воркерами."""
+    db = MagicMock()
+    processor = MeasurementProcessor(db, workers=3)
+
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=None, measurement_count=0)
+        for i in range(4)
+    ]
+
+    processed_count = processor.process_batch(measurements, (1.0, 2.0))
+
+    assert processed_count == 4
+    rows, checkpoint = db.insert_predictions_batch.call_args[0]
+    assert [row["device_id"] for row in rows] == [0, 1, 2, 3]
+    assert checkpoint["last_device_id"] == 3
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_process_batch_commits_checkpoint_per_write_batch(mock_preprocess, mock_predict, mock_config):
+    """Каждая порция записывается одной транзакцией вместе с контрольной точкой."""
+    mock_config.write_batch_size = 2
+    mock_config.pipeline_id = "test"
+    db = MagicMock()
+    processor = MeasurementProcessor(db, workers=1)
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=datetime(2023, 10, 1, 12, i), measurement_count=0)
+        for i in range(3)
+    ]
+
+    assert processor.process_batch(measurements, (1.0, 2.0)) == 3
+
+    assert db.insert_predictions_batch.call_count == 2
+    checkpoints = [c[0][1] for c in db.insert_predictions_batch.call_args_list]
+    assert [cp["last_measurement_time"] for cp in checkpoints] == [
+        datetime(2023, 10, 1, 12, 1), datetime(2023, 10, 1, 12, 2)
+    ]
+    assert all(cp["pipeline_id"] == "test" for cp in checkpoints)
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_degradation_coefficients_are_computed_once_per_write_batch(mock_preprocess, mock_predict, mock_config):
+    """Модель деградации вызывается векторно на порцию, а не по измерению; отбракованные не считаются."""
+    import numpy as np
+    mock_config.write_batch_size = 3
+    db = MagicMock()
+    db.fetch_sensor_usage.return_value = {1: 10}
+    db.insert_predictions_batch.return_value = {1: 3}
+    gate = MagicMock()
+    gate.check.side_effect = lambda batch: [None, "flat", None][:len(batch)]
+    processor = MeasurementProcessor(db, workers=1, quality_gate=gate)
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=datetime(2023, 10, 1, 12, i), measurement_count=0)
+        for i in range(4)
+    ]
+    model = MagicMock()
+    model.coefficients.side_effect = lambda usage: np.array([[u * 0.5, 1.0] for u in usage])
+
+    with patch("services.degradation.get_degradation_model", return_value=model):
+        processor.process_batch(measurements, (1.0, 2.0))
+
+    assert [c[0][0] for c in model.coefficients.call_args_list] == [[10, 12], [13]]
+    assert [m.degradation_coefs for m in measurements] == [(5.0, 1.0), None, (6.0, 1.0), (6.5, 1.0)]
+
+
+@patch("services.measurement_processor.predict")
+@patch("services.measurement_processor.preprocess")
+def test_record_skipped_writes_rows_without_model(mock_preprocess, mock_predict):
+    """Пропущенные измерения записываются в порядке времени с пустым result и причиной."""
+    db = MagicMock()
+    processor = MeasurementProcessor(db, workers=1)
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=datetime(2023, 10, 1, 12, 5 - i), measurement_count=3)
+        for i in range(2)
+    ]
+
+    assert processor.record_skipped(measurements, (1.0, 2.0), "duplicate_measurement") == 2
+
+    mock_predict.assert_not_called()
+    rows = db.insert_predictions_batch.call_args[0][0]
+    assert [row["device_id"] for row in rows] == [1, 0]
+    assert all(row["result"] is None and row["quality_code"] == "duplicate_measurement" for row in rows)
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_failed_write_is_replayed_from_journal_without_recompute(mock_preprocess, mock_predict, tmp_path):
+    """Незаписанные предсказания дописываются из журнала без повторного вызова модели."""
+    db = MagicMock()
+    db.insert_predictions_batch.side_effect = [Exception("DB down"), None]
+    processor = MeasurementProcessor(db, workers=1, journal=PredictionJournal(str(tmp_path / "journal.jsonl")))
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=1, measurement_time=datetime(2023, 10, 1, 12, 0), measurement_count=0)
+    ]
+
+    assert processor.process_batch(measurements, (1.0, 2.0)) == 0
+    assert processor.replay_journal() == 1
+
+    assert mock_predict.call_count == 1
+    replayed_rows = db.insert_predictions_batch.call_args[0][0]
+    assert replayed_rows[0]["measurement_time"] == datetime(2023, 10, 1, 12, 0)
+    assert processor.journal.pending() == []
@@ -0,0 +1,90 @@
+# tests/test_memory_budget.py
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from models.measurement_data import MeasurementData
+from services.data_fetcher import DataFetcher
+from services.memory_budget import MemoryBudget, measurement_bytes, PYTHON_FLOAT_BYTES
+
+START = datetime(2023, 10, 1, 12, 0, 0)
+# Три разных ряда одинаковой длины: одинаковые ряды измерения отбрасываются как дубли
+SERIES_SET = [json.dumps({"ts": list(range(3000)), "feat1": [0.0] * 3000, "feat2": [k] * 3000}) for k in (1.0, 2.0, 3.0)]
+SERIES = SERIES_SET[0]
+
+
+class FakeTable2:
+    """Строки table2: по 3 ряда на измерение, одно устройство на момент времени."""
+
+    def __init__(self, measurements):
+        self.rows = [
+            {"sensor_id": 1, "device_id": 1, "measurement_time": START + timedelta(minutes=i), "data": series}
+            for i in range(measurements) for series in SERIES_SET
+        ]
+        self.fetched = []
+
+    def sizes(self, **kwargs):
+        return [
+            {"measurement_time": row["measurement_time"], "sensor_id": 1, "device_id": 1,
+             "series_count": 3, "data_length": 3 * len(SERIES)}
+            for row in self.rows[::3]
+        ]
+
+    def between(self, start=None, end=None, **kwargs):
+        rows = [row for row in self.rows if start <= row["measurement_time"] <= end]
+        self.fetched.append(len(rows) // 3)
+        return rows
+
+
+def _fetcher(table):
+    db = MagicMock()
+    db.fetch_unprocessed_measurement_sizes_last24h.side_effect = table.sizes
+    db.fetch_unprocessed_measurements_last24h.side_effect = table.between
+    return DataFetcher(db)
+
+
+def test_measurement_bytes_counts_lists_and_arrays():
+    import numpy as np
+    measurement = MeasurementData(1, 1, START, 2, [
+        {"ts": [1, 2], "feat1": [0, 0], "feat2": [0, 0]},
+        {"ts": np.zeros(2), "feat1": np.zeros(2), "feat2": np.zeros(2)},
+    ])
+
+    assert measurement_bytes(measurement) == 6 * PYTHON_FLOAT_BYTES + 6 * 8
+
+
+def test_batches_are_bounded_by_budget_regardless_of_backlog():
+    """Размер батча зависит от бюджета, а не от длины окна."""
+    per_measurement = 3 * 3 * 3000 * PYTHON_FLOAT_BYTES
+    rss = MagicMock(return_value=0)
+
+    for backlog in (20, 200):
+        table = FakeTable2(backlog)
+        budget = MemoryBudget(budget_bytes=4 * 5 * per_measurement, rss_reader=rss)
+        budget.bytes_per_char = per_measurement / (3 * len(SERIES))
+        budget.scale = 1.0
+        with patch("services.memory_budget.MAX_SCALE", 1.0):
+            batches = list(_fetcher(table).iter_new_measurement_batches(budget))
+
+        assert sum(len(batch) for batch in batches) == backlog
+        assert max(table.fetched) == 5
+
+
+def test_first_batch_learns_bytes_per_char():
+    table = FakeTable2(4)
+    budget = MemoryBudget(budget_bytes=10 ** 9, rss_reader=lambda: 0)
+
+    list(_fetcher(table).iter_new_measurement_batches(budget))
+
+    assert budget.bytes_per_char == 3 * 3000 * 3 * PYTHON_FLOAT_BYTES / (3 * len(SERIES))
+
+
+def test_rss_over_budget_shrinks_and_low_rss_grows_batches():
+    readings = iter([0, 200, 200, 10])
+    budget = MemoryBudget(budget_bytes=100, rss_reader=lambda: next(readings))
+
+    budget.observe_rss()
+    budget.observe_rss()
+    assert budget.scale == 0.25
+    budget.observe_rss()
+    assert budget.scale == 0.3125
+    assert budget.peak_rss_growth == 200
@@ -0,0 +1,158 @@
+# tests/test_multi_site.py
+import json
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import pytest
+from models.measurement_data import MeasurementData
+from services.degradation import LinearDegradation, get_degradation_model, use_degradation_model
+from services.measurement_processor import MeasurementProcessor
+from services.sensor_usage import SensorUsageCounter
+from utils.retry import CircuitBreaker
+from services.multi_site import FairExecutor, MultiSiteRunner, SiteConfig, load_sites
+from config import DB_CONFIG
+
+
+def test_load_sites_overrides_shared_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLANT_B_PASSWORD", "secret")
+    path = tmp_path / "sites.json"
+    path.write_text(json.dumps([
+        {"name": "plant-a", "dsn": "db-a:1521/A", "pool_max": 2, "late_data_tolerance_hours": 6},
+        {"name": "plant-b", "dsn": "db-b:1521/B", "password_env": "PLANT_B_PASSWORD",
+         "degradation": {"degradation_type": "quadratic", "quadratic_e": 0.01}},
+    ]))
+
+    site_a, site_b = load_sites(str(path))
+
+    assert site_a.database.dsn == "db-a:1521/A"
+    assert site_a.database.pool_max == 2
+    assert site_a.database.user == DB_CONFIG.user
+    assert site_a.late_data_tolerance == timedelta(hours=6)
+    assert site_b.database.password == "secret"
+    assert site_b.degradation.degradation_type == "quadratic"
+    assert site_b.degradation.quadratic_e == 0.01
+
+
+def test_load_sites_rejects_duplicate_names(tmp_path):
+    path = tmp_path / "sites.json"
+    path.write_text(json.dumps([{"name": "plant-a"}, {"name": "plant-a"}]))
+
+    with pytest.raises(ValueError):
+        load_sites(str(path))
+
+
+def test_busy_site_does_not_starve_others():
+    """Очереди площадок обходятся по кругу: задачи тихой площадки не ждут всю очередь занятой."""
+    executor = FairExecutor(workers=1)
+    started, gate = threading.Event(), threading.Event()
+    order = []
+    # Занимает единственный воркер, пока очереди заполняются
+    executor.submit("busy", lambda: (started.set(), gate.wait()))
+    started.wait()
+    for index in range(5):
+        executor.submit("busy", order.append, ("busy", index))
+    for index in range(2):
+        executor.submit("quiet", order.append, ("quiet", index))
+
+    gate.set()
+    executor.shutdown()
+
+    assert order[:4] == [("busy", 0), ("quiet", 0), ("busy", 1), ("quiet", 1)]
+    assert executor.stats("busy")["tasks"] == 6
+    assert executor.stats("quiet")["tasks"] == 2
+
+
+def test_task_sees_degradation_model_of_its_site():
+    executor = FairExecutor(workers=2)
+    model = LinearDegradation(0.0, 1.0, 0.0, 2.0, precomputed_size=10)
+    use_degradation_model(model)
+    try:
+        site_model = executor.submit("plant-a", get_degradation_model).result()
+    finally:
+        use_degradation_model(None)
+    other_model = executor.submit("plant-b", get_degradation_model).result()
+    executor.shutdown()
+
+    assert site_model is model
+    assert other_model is not model
+
+
+def test_task_exception_is_returned_in_future():
+    executor = FairExecutor(workers=1)
+    future = executor.submit("plant-a", lambda: 1 / 0)
+    executor.shutdown()
+
+    with pytest.raises(ZeroDivisionError):
+        future.result()
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_processor_computes_on_shared_pool_and_writes_in_order(mock_preprocess, mock_predict, mock_config):
+    mock_config.write_batch_size = 2
+    mock_config.pipeline_id = "test:plant-a"
+    executor = FairExecutor(workers=3)
+    db = MagicMock()
+    processor = MeasurementProcessor(db, workers=1, executor=executor.for_site("plant-a"))
+    measurements = [
+        MeasurementData(sensor_id=1, device_id=i, measurement_time=datetime(2023, 10, 1, 12, i), measurement_count=0)
+        for i in range(5)
+    ]
+
+    assert processor.process_batch(measurements, (1.0, 2.0)) == 5
+    executor.shutdown()
+
+    checkpoints = [c[0][1]["last_measurement_time"] for c in db.insert_predictions_batch.call_args_list]
+    assert checkpoints == [datetime(2023, 10, 1, 12, i) for i in (1, 3, 4)]
+    assert executor.stats("plant-a")["tasks"] == 3
+
+
+@patch("services.measurement_processor.PROCESSING_CONFIG")
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_usage_counts_continue_across_chunks_on_shared_pool(mock_preprocess, mock_predict, mock_config):
+    """Порции считаются до коммита предыдущих, но счётчики идут подряд, как при последовательной обработке."""
+    mock_config.write_batch_size = 2
+    mock_config.pipeline_id = "test:plant-a"
+    db = MagicMock()
+    db.fetch_sensor_usage.return_value = {1: 100}
+    db.insert_predictions_batch.side_effect = lambda rows, checkpoint, target_version=None: {1: len(rows)}
+
+    def run(executor):
+        measurements = [
+            MeasurementData(sensor_id=1, device_id=i, measurement_time=datetime(2023, 10, 1, 12, i), measurement_count=0)
+            for i in range(4)
+        ]
+        MeasurementProcessor(db, workers=1, usage_counter=SensorUsageCounter(db), executor=executor).process_batch(
+            measurements, (1.0, 2.0)
+        )
+        return [m.usage_count for m in measurements]
+
+    executor = FairExecutor(workers=2)
+    on_pool = run(executor.for_site("plant-a"))
+    executor.shutdown()
+
+    assert on_pool == run(None) == [100, 101, 102, 103]
+
+
+def test_failed_site_does_not_stop_others():
+    sites = [SiteConfig("plant-a", DB_CONFIG), SiteConfig("plant-b", DB_CONFIG)]
+    services = {}
+
+    def factory(site, executor):
+        service = MagicMock()
+        if site.name == "plant-a":
+            service.run.side_effect = Exception("ORA-12541: no listener")
+        service.db.get_pool_metrics.return_value = {"acquires": 1}
+        service.db.circuit_breaker = CircuitBreaker(site.name)
+        services[site.name] = service
+        return service
+
+    metrics = MultiSiteRunner(sites, workers=1, service_factory=factory).run()
+
+    assert metrics["plant-a"]["status"] == "failed"
+    assert metrics["plant-b"]["status"] == "ok"
+    assert metrics["plant-b"]["pool"] == {"acquires": 1}
+    assert metrics["plant-b"]["breaker_state"] == "closed"
+    assert all(service.cleanup.called for service in services.values())
@@ -0,0 +1,106 @@
+# tests/test_perf_gate.py
+import os
+import pytest
+from services.perf_gate import Dataset, compare, format_report, load_baseline, merge_sessions, run_benchmarks, run_stage
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "perf_baseline.json")
+
+
+def _stage(throughput=100.0, p95_latency=0.1, noise=0.01, peak_rss_bytes=50 * 2 ** 20):
+    return {"items": 10, "repeats": 5, "throughput": throughput, "p95_latency": p95_latency,
+            "noise": noise, "peak_rss_bytes": peak_rss_bytes}
+
+
+def _results(**stages):
+    return {"dataset": {"seed": 0}, "environment": {"cpus": 1}, "stages": stages}
+
+
+def _regressed(checks):
+    return {(check.stage, check.metric) for check in checks if check.regressed}
+
+
+def test_thirty_percent_slowdown_is_a_regression():
+    baseline = _results(process_batch=_stage())
+    current = _results(process_batch=_stage(throughput=100 / 1.3, p95_latency=0.13))
+
+    checks = compare(baseline, current)
+
+    assert _regressed(checks) == {("process_batch", "throughput"), ("process_batch", "p95_latency")}
+
+
+def test_slowdown_within_noise_is_tolerated():
+    baseline = _results(fetch=_stage(noise=0.15))
+    current = _results(fetch=_stage(throughput=100 / 1.3, p95_latency=0.13))
+
+    assert _regressed(compare(baseline, current)) == set()
+
+
+def test_peak_rss_growth_beyond_tolerance_and_slack_is_a_regression():
+    baseline = _results(fetch=_stage())
+    current = _results(fetch=_stage(peak_rss_bytes=80 * 2 ** 20), preprocess=_stage())
+
+    assert _regressed(compare(baseline, current)) == {("fetch", "peak_rss_bytes")}
+    assert _regressed(compare(baseline, _results(fetch=_stage(peak_rss_bytes=60 * 2 ** 20)))) == set()
+
+
+def test_merge_sessions_takes_medians_and_counts_spread_between_processes_as_noise():
+    merged = merge_sessions([
+        _stage(throughput=100.0, p95_latency=0.2, noise=0.01),
+        _stage(throughput=80.0, p95_latency=0.1, noise=0.01),
+        _stage(throughput=90.0, p95_latency=0.15, noise=0.01, peak_rss_bytes=60 * 2 ** 20),
+    ])
+
+    assert merged["throughput"] == 90.0
+    assert merged["p95_latency"] == 0.15
+    assert merged["peak_rss_bytes"] == 50 * 2 ** 20
+    assert merged["noise"] == round(10 / 90, 4)
+    assert merged["sessions"] == 3
+
+
+def test_single_session_keeps_its_own_noise():
+    assert merge_sessions([_stage(noise=0.05)])["noise"] == 0.05
+
+
+def test_report_names_regressed_stage_and_environment_change():
+    baseline = _results(process_batch=_stage())
+    current = dict(_results(process_batch=_stage(throughput=50.0)), environment={"cpus": 8})
+
+    report = format_report(compare(baseline, current), baseline, current)
+
+    assert "REGRESSED" in report
+    assert "Regressed stages: process_batch" in report
+    assert "WARNING: baseline was recorded on" in report
+
+
+def test_run_stage_on_small_dataset():
+    result = run_stage("get_new_measurements", Dataset(sensors=1, devices=2, times=1), repeats=2, min_sample_seconds=0.05)
+
+    assert result["items"] == 2
+    assert result["throughput"] > 0
+    assert result["p95_latency"] > 0
+    # Быстрая стадия повторяется внутри замера, пока он не станет достаточно длинным
+    assert result["loops"] > 1
+
+
+def test_benchmarks_run_each_session_in_a_clean_process():
+    results = run_benchmarks(Dataset(sensors=1, devices=2, times=1), stages=["preprocess"], repeats=1, sessions=2)
+
+    stage = results["stages"]["preprocess"]
+    assert stage["items"] == 2
+    assert stage["sessions"] == 2
+    assert stage["peak_rss_bytes"] >= 0
+
+
+def test_baseline_in_repo_covers_all_stages():
+    baseline = load_baseline(BASELINE_PATH)
+
+    assert set(baseline["stages"]) == {"get_new_measurements", "get_new_measurements_grouped", "preprocess", "process_batch"}
+
+
+@pytest.mark.skipif(not os.getenv("PERF_GATE"), reason="set PERF_GATE=1 to compare stage benchmarks with the baseline")
+def test_stages_do_not_regress_against_baseline():
+    baseline = load_baseline(BASELINE_PATH)
+    current = run_benchmarks(Dataset(**baseline["dataset"]))
+    checks = compare(baseline, current)
+
+    assert not any(check.regressed for check in checks), format_report(checks, baseline, current)
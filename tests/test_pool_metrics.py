@@ -0,0 +1,85 @@
+# tests/test_pool_metrics.py
+import pytest
+from unittest.mock import MagicMock, patch
+from db.pool_metrics import PoolMetrics, PoolTuner
+
+
+@pytest.fixture
+def tuning_config():
+    with patch("db.pool_metrics.POOL_TUNING_CONFIG") as mock_tuning, \
+         patch("db.pool_metrics.DB_CONFIG") as mock_db_config:
+        mock_tuning.adaptive_max = 8
+        mock_tuning.min_workers = 1
+        mock_tuning.max_workers = 6
+        mock_tuning.wait_ratio = 0.2
+        mock_db_config.pool_min = 1
+        mock_db_config.pool_increment = 1
+        yield mock_tuning
+
+
+def test_snapshot_reports_wait_latency_and_cache_hit_rate():
+    """Метрики считают среднее ожидание, латентность и долю попаданий в кэш."""
+    metrics = PoolMetrics(stmt_cache_size=2)
+    metrics.record_acquire(0.1)
+    metrics.record_acquire(0.3)
+    for sql in ["A", "A", "B", "C", "A"]:
+        metrics.query_started()
+        metrics.record_query(sql, 0.01)
+
+    data = metrics.snapshot()
+
+    assert data["acquire_count"] == 2
+    assert data["acquire_wait_avg"] == pytest.approx(0.2)
+    assert data["acquire_wait_max"] == pytest.approx(0.3)
+    assert data["query_count"] == 5
+    # A вытеснен из LRU размером 2 после B и C
+    assert data["stmt_cache_hit_rate"] == pytest.approx(1 / 5)
+
+
+def test_snapshot_includes_pool_counts():
+    metrics = PoolMetrics()
+    pool = MagicMock(busy=2, opened=3, max=5)
+
+    data = metrics.snapshot(pool)
+
+    assert (data["busy"], data["opened"], data["max"]) == (2, 3, 5)
+
+
+def test_tuner_grows_pool_on_acquire_starvation(tuning_config):
+    """Долгое ожидание acquire увеличивает пул и число воркеров."""
+    metrics = PoolMetrics()
+    pool = MagicMock(max=4)
+    metrics.record_acquire(0.5)
+    metrics.query_started()
+    metrics.record_query("SELECT 1", 0.1)
+
+    workers = PoolTuner(metrics).tune(pool)
+
+    pool.reconfigure.assert_called_once_with(max=5)
+    assert workers == 5
+
+
+def test_tuner_respects_upper_bound(tuning_config):
+    metrics = PoolMetrics()
+    pool = MagicMock(max=8)
+    metrics.record_acquire(0.5)
+    metrics.query_started()
+    metrics.record_query("SELECT 1", 0.1)
+
+    workers = PoolTuner(metrics).tune(pool)
+
+    pool.reconfigure.assert_not_called()
+    assert workers == 6  # ограничено max_workers
+
+
+def test_tuner_shrinks_underused_pool(tuning_config):
+    """Без ожидания и при низком параллелизме пул сжимается."""
+    metrics = PoolMetrics()
+    pool = MagicMock(max=4)
+    metrics.record_acquire(0.0)
+    metrics.query_started()
+    metrics.record_query("SELECT 1", 0.1)
+
+    PoolTuner(metrics).tune(pool)
+
+    pool.reconfigure.assert_called_once_with(max=3)
@@ -0,0 +1,80 @@
+# tests/test_preprocessed_measurement.py
+import json
+import numpy as np
+import pytest
+from datetime import datetime
+from models.preprocessed_measurement import PreprocessedMeasurement
+
+MEASUREMENT_TIME = datetime(2023, 10, 1, 12, 0, 0)
+
+
+def _preprocessed(lengths=(3000, 5000)):
+    return PreprocessedMeasurement({
+        "sensor_id": 1,
+        "device_id": 2,
+        "param1": 0.1,
+        "param2": 0.2,
+        "measurement_count": len(lengths),
+        "usage_count": None,
+        "measurement_time": MEASUREMENT_TIME,
+        "time_series": [
+            {"ts": np.arange(n, dtype=np.float64), "feat1": np.ones(n, dtype=np.float32), "feat2": np.zeros(n)}
+            for n in lengths
+        ],
+        "length": sum(lengths),
+    })
+
+
+def test_bytes_roundtrip_keeps_fields_and_arrays():
+    original = _preprocessed()
+
+    restored = PreprocessedMeasurement.from_bytes(original.to_bytes())
+
+    assert {k: v for k, v in restored.data.items() if k != "time_series"} == \
+        {k: v for k, v in original.data.items() if k != "time_series"}
+    for restored_series, series in zip(restored.data["time_series"], original.data["time_series"]):
+        for field in ("ts", "feat1", "feat2"):
+            assert restored_series[field].dtype == series[field].dtype
+            assert np.array_equal(restored_series[field], series[field])
+
+
+def test_from_bytes_does_not_copy_arrays():
+    buffer = bytearray(_preprocessed().to_bytes())
+
+    restored = PreprocessedMeasurement.from_bytes(buffer)
+    buffer[-8:] = np.float64(42).tobytes()  # последний элемент feat2 второго ряда
+
+    assert restored.data["time_series"][1]["feat2"][-1] == 42
+
+
+def test_load_memory_maps_file(tmp_path):
+    path = str(tmp_path / "measurement.pmb")
+    _preprocessed().save(path)
+
+    restored = PreprocessedMeasurement.load(path)
+
+    assert restored.data["time_series"][0]["ts"][2999] == 2999
+    assert not restored.data["time_series"][0]["ts"].flags.writeable
+
+
+def test_binary_is_compact_compared_to_json_arrays():
+    preprocessed = _preprocessed()
+    rng = np.random.default_rng(0)
+    for series in preprocessed.data["time_series"]:
+        series["feat2"] = rng.standard_normal(len(series["ts"]))
+    as_json = json.dumps([{k: v.tolist() for k, v in s.items()} for s in preprocessed.data["time_series"]])
+
+    assert len(preprocessed.to_bytes()) < 0.7 * len(as_json)
+
+
+def test_to_json_is_metadata_only():
+    meta = json.loads(_preprocessed().to_json())
+
+    assert meta["series_lengths"] == [3000, 5000]
+    assert meta["measurement_time"] == {"datetime": MEASUREMENT_TIME.isoformat()}
+    assert "time_series" not in meta
+
+
+def test_from_bytes_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        PreprocessedMeasurement.from_bytes(b"JUNKJUNKJUNK")
@@ -0,0 +1,67 @@
+# tests/test_preprocessing_memo.py
+import numpy as np
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models.measurement_data import MeasurementData
+from services import preprocessing
+from services.preprocessing_memo import PreprocessingMemo, series_hash
+
+
+def _series(length=10, offset=0.0):
+    return {"ts": list(range(length)), "feat1": [offset] * length, "feat2": [offset + 1] * length}
+
+
+def _normalized(length=10):
+    return [{field: np.zeros(length) for field in ("ts", "feat1", "feat2")}]
+
+
+def test_series_hash_depends_on_content():
+    assert series_hash([_series()]) == series_hash([_series()])
+    assert series_hash([_series()]) != series_hash([_series(offset=1.0)])
+
+
+def test_memo_hit_miss_and_eviction_counters():
+    """LRU ограничен по байтам и ведёт счётчики попаданий и вытеснений."""
+    entry_bytes = 3 * 10 * 8
+    memo = PreprocessingMemo(max_bytes=2 * entry_bytes)
+
+    assert memo.get(("a", 1.0, 2.0)) is None
+    memo.put(("a", 1.0, 2.0), _normalized())
+    memo.put(("b", 1.0, 2.0), _normalized())
+    assert memo.get(("a", 1.0, 2.0)) is not None
+    memo.put(("c", 1.0, 2.0), _normalized())
+
+    assert memo.get(("b", 1.0, 2.0)) is None
+    assert memo.stats() == {
+        "entries": 2, "bytes": 2 * entry_bytes, "hits": 1, "disk_hits": 0, "misses": 2, "evictions": 1,
+    }
+
+
+def test_memo_disk_tier_survives_new_instance(tmp_path):
+    PreprocessingMemo(max_bytes=10 ** 6, disk_dir=str(tmp_path)).put(("a", 1.0, 2.0), _normalized())
+
+    memo = PreprocessingMemo(max_bytes=10 ** 6, disk_dir=str(tmp_path))
+    value = memo.get(("a", 1.0, 2.0))
+
+    assert value is not None
+    np.testing.assert_array_equal(value[0]["ts"], np.zeros(10))
+    assert memo.stats()["disk_hits"] == 1
+
+
+def test_preprocess_reuses_memoized_series():
+    """Повторный препроцессинг тех же рядов с теми же параметрами не пересчитывается."""
+    memo = PreprocessingMemo(max_bytes=10 ** 6)
+    measurement = MeasurementData(1, 1, datetime(2023, 10, 1), 1, [_series()])
+    measurement.add_params(1.0, 2.0)
+
+    with patch.object(preprocessing, "get_preprocessing_memo", return_value=memo), \
+         patch.object(preprocessing, "normalize_time_series", wraps=preprocessing.normalize_time_series) as normalize:
+        first = preprocessing.preprocess(measurement)
+        second = preprocessing.preprocess(measurement)
+        measurement.add_params(1.5, 2.0)
+        preprocessing.preprocess(measurement)
+
+    assert normalize.call_count == 2
+    assert second.data["time_series"] is first.data["time_series"]
+    assert first.data["length"] == 10
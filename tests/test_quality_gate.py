@@ -0,0 +1,58 @@
+# tests/test_quality_gate.py
+import numpy as np
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from models.measurement_data import MeasurementData
+from services.measurement_processor import MeasurementProcessor
+from services.quality_gate import QualityGate, NAN, FLAT, SATURATED, DUPLICATE_SERIES
+
+rng = np.random.default_rng(0)
+
+
+def _good(n=200):
+    return {"ts": list(range(n)), "feat1": rng.standard_normal(n).tolist(), "feat2": rng.standard_normal(n).tolist()}
+
+
+def _measurement(series_list, device_id=1):
+    return MeasurementData(1, device_id, datetime(2023, 10, 1), len(series_list), series_list)
+
+
+def test_good_measurements_pass():
+    gate = QualityGate()
+
+    assert gate.check([_measurement([_good(), _good(), _good(150)])]) == [None]
+
+
+def test_reason_codes_and_priority():
+    flat = dict(_good(), feat1=[1.0] * 200)
+    with_nans = dict(_good(), feat2=[float("nan")] * 100 + [0.5] * 100)
+    saturated = dict(_good(), feat1=[9.0] * 60 + _good()["feat1"][60:])
+    duplicated = _good()
+    gate = QualityGate()
+
+    reasons = gate.check([
+        _measurement([_good(), flat, _good()]),
+        _measurement([flat, with_nans, _good()]),  # NaN важнее «плоского» ряда
+        _measurement([saturated, _good(), _good()]),
+        _measurement([duplicated, dict(duplicated), _good()]),
+    ])
+
+    assert reasons == [FLAT, NAN, SATURATED, DUPLICATE_SERIES]
+    assert gate.stats() == {FLAT: 1, NAN: 1, SATURATED: 1, DUPLICATE_SERIES: 1}
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_gated_measurements_skip_model_and_are_written_with_reason(mock_preprocess, mock_predict):
+    db = MagicMock()
+    processor = MeasurementProcessor(db, workers=1, quality_gate=QualityGate())
+    measurements = [
+        _measurement([_good(), _good(), _good()], device_id=1),
+        _measurement([dict(_good(), feat1=[0.0] * 200), _good(), _good()], device_id=2),
+    ]
+
+    assert processor.process_batch(measurements, (1.0, 2.0)) == 2
+
+    assert mock_predict.call_count == 1
+    rows = db.insert_predictions_batch.call_args[0][0]
+    assert [(row["result"], row["quality_code"]) for row in rows] == [(0.5, None), (None, FLAT)]
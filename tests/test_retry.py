@@ -2,7 +2,27 @@
 import pytest
 from unittest.mock import MagicMock, patch, call
 import time
-from utils.retry import retry_db_operation
+from utils.retry import (
+    retry_db_operation,
+    get_retry_metrics,
+    CircuitBreaker,
+    CircuitOpenError,
+    CIRCUIT_BREAKER,
+    RETRY_METRICS,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_retry_state():
+    """Сбрасывает глобальный предохранитель и метрики, отключает jitter."""
+    CIRCUIT_BREAKER.reset()
+    RETRY_METRICS.reset()
+    with patch("utils.retry.RETRY_BUDGET_CONFIG") as mock_budget_config:
+        mock_budget_config.max_retries = 5
+        mock_budget_config.deadline = 60.0
+        mock_budget_config.jitter = 0.0
+        yield mock_budget_config
+    CIRCUIT_BREAKER.reset()
 
 
 # Dummy function to decorate
@@ -137,4 +157,293 @@ class TestRetryDBOperation:
             pass
 
         assert example.__name__ == "example"
-        assert example.__doc__ == "Example docstring."
\ No newline at end of file
+        assert example.__doc__ == "Example docstring."
+
+
+def _retry_config(mock_retry_config, attempts=3):
+    mock_retry_config.attempts = attempts
+    mock_retry_config.delay = 0.01
+    mock_retry_config.backoff = 2
+    mock_retry_config.exceptions = (OSError,)
+
+
+class TestRetryBudget:
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_nested_calls_share_retry_budget(self, mock_sleep, mock_retry_config, reset_retry_state):
+        """Вложенные вызовы расходуют общий бюджет, а не перемножают попытки."""
+        _retry_config(mock_retry_config)
+        reset_retry_state.max_retries = 3
+
+        inner_func = MagicMock(side_effect=OSError("DB down"))
+        inner = retry_db_operation(inner_func)
+
+        @retry_db_operation
+        def outer():
+            return inner()
+
+        with pytest.raises(OSError, match="DB down"):
+            outer()
+
+        # Без общего бюджета было бы 3 * 3 = 9 вызовов
+        assert inner_func.call_count == 4
+        assert mock_sleep.call_count == 3
+        assert get_retry_metrics()["budget_exhausted"] >= 1
+
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_jitter_keeps_delay_within_bounds(self, mock_sleep, mock_retry_config, reset_retry_state):
+        """Задержка с jitter лежит в диапазоне [delay * (1 - jitter), delay]."""
+        _retry_config(mock_retry_config, attempts=2)
+        reset_retry_state.jitter = 0.5
+
+        decorated = retry_db_operation(MagicMock(side_effect=[OSError("Fail"), "ok"]))
+        assert decorated() == "ok"
+
+        slept = mock_sleep.call_args[0][0]
+        assert 0.005 <= slept <= 0.01
+
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_new_budget_for_each_top_level_call(self, mock_sleep, mock_retry_config, reset_retry_state):
+        """Каждый внешний вызов получает свежий бюджет."""
+        _retry_config(mock_retry_config, attempts=2)
+        reset_retry_state.max_retries = 1
+
+        mock_func = MagicMock(side_effect=[OSError("Fail"), "ok", OSError("Fail"), "ok"])
+        decorated = retry_db_operation(mock_func)
+
+        assert decorated() == "ok"
+        assert decorated() == "ok"
+        assert mock_func.call_count == 4
+
+
+    @patch("utils.retry.time.monotonic")
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_deadline_starts_at_first_failure(self, mock_sleep, mock_retry_config, mock_monotonic, reset_retry_state):
+        """Вложенная операция в долгом запуске получает свой повтор: дедлайн идёт от отказа, а не от начала main."""
+        _retry_config(mock_retry_config)
+        reset_retry_state.deadline = 60.0
+        mock_monotonic.return_value = 0.0
+        op = retry_db_operation(MagicMock(side_effect=[OSError("Fail"), "ok"]))
+
+        @retry_db_operation
+        def main():
+            mock_monotonic.return_value = 600.0  # запуск идёт дольше дедлайна
+            return op()
+
+        assert main() == "ok"
+        assert get_retry_metrics()["budget_exhausted"] == 0
+
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_success_restores_budget_for_later_operations(self, mock_sleep, mock_retry_config, reset_retry_state):
+        """Разовые сбои в разных операциях одного запуска не исчерпывают общий бюджет."""
+        _retry_config(mock_retry_config)
+        reset_retry_state.max_retries = 2
+
+        class Database:
+            circuit_breaker = CircuitBreaker("db")
+
+            def __init__(self):
+                self.calls = 0
+
+            @retry_db_operation
+            def query(self):
+                self.calls += 1
+                if self.calls % 2:
+                    raise OSError("Blip")
+                return "ok"
+
+        db = Database()
+
+        @retry_db_operation
+        def main():
+            return [db.query() for _ in range(5)]
+
+        assert main() == ["ok"] * 5
+        assert get_retry_metrics()["retries"] == 5
+        assert get_retry_metrics()["budget_exhausted"] == 0
+
+
+class TestCircuitBreaker:
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_breaker_opens_and_fails_fast(self, mock_sleep, mock_retry_config, mock_breaker_config):
+        """После серии отказов вызовы отклоняются без обращения к БД."""
+        _retry_config(mock_retry_config, attempts=1)
+        mock_breaker_config.failure_threshold = 2
+        mock_breaker_config.reset_timeout = 30.0
+
+        mock_func = MagicMock(side_effect=OSError("DB down"))
+        decorated = retry_db_operation(mock_func)
+
+        for _ in range(2):
+            with pytest.raises(OSError):
+                decorated()
+
+        with pytest.raises(CircuitOpenError):
+            decorated()
+
+        assert mock_func.call_count == 2
+        metrics = get_retry_metrics()
+        assert metrics["breaker_state"] == "open"
+        assert metrics["breaker_opened"] == 1
+        assert metrics["breaker_rejections"] == 1
+
+    @patch("utils.retry.time.monotonic")
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_breaker_half_open_closes_on_success(
+        self, mock_sleep, mock_retry_config, mock_breaker_config, mock_monotonic
+    ):
+        """По истечении reset_timeout пробный вызов закрывает предохранитель."""
+        _retry_config(mock_retry_config, attempts=1)
+        mock_breaker_config.failure_threshold = 1
+        mock_breaker_config.reset_timeout = 30.0
+        mock_monotonic.return_value = 100.0
+
+        mock_func = MagicMock(side_effect=[OSError("DB down"), "ok"])
+        decorated = retry_db_operation(mock_func)
+
+        with pytest.raises(OSError):
+            decorated()
+        assert CIRCUIT_BREAKER.state == "open"
+
+        mock_monotonic.return_value = 131.0
+        assert decorated() == "ok"
+        assert CIRCUIT_BREAKER.state == "closed"
+
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_owner_breakers_are_independent(self, mock_sleep, mock_retry_config, mock_breaker_config):
+        """Отказы одной БД (площадки) открывают только её предохранитель."""
+        _retry_config(mock_retry_config, attempts=1)
+        mock_breaker_config.failure_threshold = 2
+        mock_breaker_config.reset_timeout = 30.0
+
+        class Site:
+            def __init__(self, name, fails):
+                self.circuit_breaker = CircuitBreaker(name)
+                self.fails = fails
+
+            @retry_db_operation
+            def query(self):
+                if self.fails:
+                    raise OSError(f"{self.circuit_breaker.name} down")
+                return "ok"
+
+        broken, healthy = Site("plant-a", fails=True), Site("plant-b", fails=False)
+        for _ in range(2):
+            with pytest.raises(OSError):
+                broken.query()
+
+        with pytest.raises(CircuitOpenError, match="plant-a"):
+            broken.query()
+        assert healthy.query() == "ok"
+        assert broken.circuit_breaker.state == "open"
+        assert healthy.circuit_breaker.state == "closed"
+        assert CIRCUIT_BREAKER.state == "closed"
+
+    @patch("utils.retry.time.monotonic")
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    def test_half_open_lets_a_single_probe_through(self, mock_breaker_config, mock_monotonic):
+        """Пока пробный вызов не завершён, остальные вызовы отклоняются."""
+        mock_breaker_config.failure_threshold = 1
+        mock_breaker_config.reset_timeout = 30.0
+        mock_monotonic.return_value = 100.0
+        breaker = CircuitBreaker("plant-a")
+        breaker.record_failure()
+
+        mock_monotonic.return_value = 131.0
+        breaker.before_call()  # пробный вызов
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        breaker.before_call()
+        assert breaker.state == "closed"
+
+    @patch("utils.retry.time.monotonic")
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_half_open_probe_reaches_db_through_nested_calls(
+        self, mock_sleep, mock_retry_config, mock_breaker_config, mock_monotonic
+    ):
+        """Пробный fetch_* не отклоняется своим же вложенным get_connection и закрывает предохранитель по итогам БД."""
+        _retry_config(mock_retry_config, attempts=1)
+        mock_breaker_config.failure_threshold = 1
+        mock_breaker_config.reset_timeout = 30.0
+        mock_monotonic.return_value = 100.0
+
+        class Database:
+            def __init__(self):
+                self.circuit_breaker = CircuitBreaker("db")
+                self.connections = 0
+
+            @retry_db_operation
+            def get_connection(self):
+                self.connections += 1
+                return "connection"
+
+            @retry_db_operation
+            def fetch_last_prediction(self):
+                return self.get_connection()
+
+        db = Database()
+        db.circuit_breaker.record_failure()
+        assert db.circuit_breaker.state == "open"
+
+        mock_monotonic.return_value = 131.0
+        assert db.fetch_last_prediction() == "connection"
+        assert db.connections == 1
+        assert db.circuit_breaker.state == "closed"
+
+    @patch("utils.retry.time.monotonic")
+    @patch("utils.retry.CIRCUIT_BREAKER_CONFIG")
+    @patch("utils.retry.RETRY_CONFIG")
+    def test_probe_failing_outside_db_is_not_a_success(self, mock_retry_config, mock_breaker_config, mock_monotonic):
+        """Ошибка не БД в пробном вызове не закрывает предохранитель, следующий вызов снова пробный."""
+        _retry_config(mock_retry_config, attempts=1)
+        mock_breaker_config.failure_threshold = 1
+        mock_breaker_config.reset_timeout = 30.0
+        mock_monotonic.return_value = 100.0
+        CIRCUIT_BREAKER.record_failure()
+
+        mock_monotonic.return_value = 131.0
+        with pytest.raises(CircuitOpenError):
+            retry_db_operation(MagicMock(side_effect=CircuitOpenError("other site")))()
+        assert CIRCUIT_BREAKER.state == "open"
+
+        assert retry_db_operation(MagicMock(return_value="ok"))() == "ok"
+        assert CIRCUIT_BREAKER.state == "closed"
+
+    @patch("utils.retry.RETRY_CONFIG")
+    @patch("utils.retry.time.sleep")
+    def test_nested_success_does_not_refill_budget(self, mock_sleep, mock_retry_config, reset_retry_state):
+        """Успешный вложенный get_connection в каскаде отказов операции не пополняет бюджет."""
+        _retry_config(mock_retry_config, attempts=10)
+        reset_retry_state.max_retries = 2
+
+        class Database:
+            circuit_breaker = CircuitBreaker("db")
+
+            @retry_db_operation
+            def get_connection(self):
+                return "connection"
+
+            @retry_db_operation
+            def fetch(self):
+                self.get_connection()
+                raise OSError("ORA-03113")
+
+        with pytest.raises(OSError):
+            Database().fetch()
+        assert get_retry_metrics()["retries"] == 2
+        assert get_retry_metrics()["budget_exhausted"] == 1
@@ -0,0 +1,68 @@
+# tests/test_sensor_lanes.py
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from models.measurement_data import MeasurementData
+from services.sensor_lanes import SensorLanes
+
+T0 = datetime(2023, 10, 1, 12, 0, 0)
+
+
+def _state(sensor_id, device_id, param1, param2):
+    return {"prediction_time": T0, "sensor_id": sensor_id, "device_id": device_id,
+            "param1": param1, "param2": param2, "result": 0.5}
+
+
+def _lanes(calibration=None, workers=2):
+    device_state = {1: _state(1, 1, 1.0, 1.0), 2: _state(1, 2, 1.0, 1.0), 3: _state(2, 3, 2.0, 2.0)}
+    sensor_state = {1: _state(1, 2, 1.0, 1.0), 2: _state(2, 3, 2.0, 2.0)}
+    processors = {}
+
+    def factory(sensor_id):
+        processor = processors.setdefault(sensor_id, MagicMock())
+        processor.process_batch.side_effect = lambda measurements, params: len(measurements)
+        return processor
+
+    lanes = SensorLanes(calibration or MagicMock(), factory, device_state, sensor_state, workers=workers)
+    return lanes, processors
+
+
+def test_each_sensor_is_processed_with_its_own_params():
+    lanes, processors = _lanes()
+    measurements = [
+        MeasurementData(1, 1, T0, 3), MeasurementData(2, 3, T0, 3),
+        MeasurementData(1, 2, T0 + timedelta(minutes=1), 3), MeasurementData(2, 3, T0 + timedelta(minutes=1), 3),
+    ]
+
+    assert lanes.run(measurements) == 4
+
+    assert processors[1].process_batch.call_args[0] == ([measurements[0], measurements[2]], (1.0, 1.0))
+    assert processors[2].process_batch.call_args[0] == ([measurements[1], measurements[3]], (2.0, 2.0))
+
+
+def test_new_sensor_is_calibrated_from_the_sensor_it_replaced():
+    calibration = MagicMock()
+    calibration.recalibrate_for_sensor_change.return_value = (3.0, 3.0)
+    lanes, processors = _lanes(calibration)
+    new_sensor = [MeasurementData(5, 1, T0, 3), MeasurementData(5, 2, T0, 3)]
+
+    assert lanes.run(new_sensor + [MeasurementData(2, 3, T0, 3)]) == 3
+
+    kwargs = calibration.recalibrate_for_sensor_change.call_args[1]
+    assert (kwargs["old_sensor"], kwargs["new_sensor"]) == (1, 5)
+    assert processors[5].process_batch.call_args[0] == (new_sensor, (3.0, 3.0))
+    # Следующий пакет: параметры уже известны, устройства числятся за новым сенсором
+    lanes.run([MeasurementData(5, 1, T0 + timedelta(minutes=1), 3)])
+    calibration.recalibrate_for_sensor_change.assert_called_once()
+    assert lanes.device_sensor[1] == 5
+
+
+def test_unknown_sensor_without_predecessor_is_skipped(caplog):
+    calibration = MagicMock()
+    lanes, processors = _lanes(calibration, workers=1)
+
+    with caplog.at_level("ERROR"):
+        assert lanes.run([MeasurementData(9, 42, T0, 3)]) == 0
+
+    calibration.recalibrate_for_sensor_change.assert_not_called()
+    assert 9 not in processors
+    assert "replaces no known sensor" in caplog.text
@@ -0,0 +1,66 @@
+# tests/test_sensor_usage.py
+from datetime import datetime
+from unittest.mock import MagicMock
+from models.measurement_data import MeasurementData
+from services.sensor_usage import HistoricalSensorUsage, SensorUsageCounter
+
+
+def _measurement(sensor_id):
+    return MeasurementData(sensor_id, 1, datetime(2023, 10, 1), 3)
+
+
+def test_preload_fetches_missing_sensors_once():
+    db = MagicMock()
+    db.fetch_sensor_usage.return_value = {1: 10}
+    counter = SensorUsageCounter(db, ttl=60)
+
+    assert counter.get(1) == 10
+    assert counter.get(2) == 0
+    assert counter.get(1) == 10
+
+    assert [c[0][0] for c in db.fetch_sensor_usage.call_args_list] == [[1], [2]]
+
+
+def test_assign_counts_earlier_measurements_in_batch():
+    db = MagicMock()
+    db.fetch_sensor_usage.return_value = {1: 10, 2: 5}
+    counter = SensorUsageCounter(db, ttl=60)
+    batch = [_measurement(1), _measurement(2), _measurement(1)]
+
+    counter.assign(batch)
+
+    assert [m.usage_count for m in batch] == [10, 5, 11]
+    db.fetch_sensor_usage.assert_called_once_with([1, 2])
+
+
+def test_add_applies_committed_increments():
+    db = MagicMock()
+    db.fetch_sensor_usage.side_effect = [{1: 10}, {2: 8}]
+    counter = SensorUsageCounter(db, ttl=60)
+    counter.get(1)
+
+    counter.add({1: 3, 2: 4})
+
+    assert counter.get(1) == 13
+    assert counter.get(2) == 8  # не был в кэше — значение из БД уже включает вставку
+
+
+def test_stale_entries_are_reloaded():
+    db = MagicMock()
+    db.fetch_sensor_usage.side_effect = [{1: 10}, {1: 25}]
+    counter = SensorUsageCounter(db, ttl=0)
+
+    assert counter.get(1) == 10
+    assert counter.get(1) == 25
+
+
+def test_historical_usage_counts_uses_before_each_measurement():
+    db = MagicMock()
+    t0 = datetime(2023, 10, 1)
+    db.fetch_sensor_usage_history.return_value = {"before": 40, "times": [t0, t0.replace(minute=1), t0.replace(minute=5)]}
+    batch = [MeasurementData(1, 1, t0.replace(minute=minute), 3) for minute in (0, 1, 2, 6)]
+
+    HistoricalSensorUsage(db).assign(batch)
+
+    assert [m.usage_count for m in batch] == [40, 41, 42, 43]
+    db.fetch_sensor_usage_history.assert_called_once_with(1, t0, t0.replace(minute=6))
@@ -0,0 +1,97 @@
+# tests/test_series_codec.py
+import json
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from utils.series_codec import BINARY_PREFIX, decode_series, encode_series, is_binary
+from convert_series import convert, convert_series
+
+
+def _series(n=100, integer_ts=True):
+    rng = np.random.default_rng(n)
+    ts = np.arange(n) * 10 if integer_ts else np.cumsum(rng.uniform(0.9, 1.1, n))
+    return {"ts": ts.tolist(), "feat1": rng.standard_normal(n).tolist(), "feat2": rng.standard_normal(n).tolist()}
+
+
+@pytest.mark.parametrize("integer_ts", [True, False])
+def test_roundtrip_keeps_ts_exact_and_features_in_float32(integer_ts):
+    series = _series(integer_ts=integer_ts)
+
+    decoded = decode_series(encode_series(series))
+
+    assert np.array_equal(decoded["ts"], series["ts"])
+    assert np.allclose(decoded["feat1"], series["feat1"], rtol=1e-6)
+    assert decoded["feat2"].dtype == np.float32
+
+
+def test_float64_features_are_lossless():
+    series = _series()
+
+    decoded = decode_series(encode_series(series, feature_dtype=np.float64))
+
+    assert np.array_equal(decoded["feat1"], series["feat1"])
+
+
+def test_binary_is_smaller_than_json():
+    series = _series(5000)
+
+    payload = encode_series(series)
+
+    assert is_binary(payload) and payload.startswith(BINARY_PREFIX)
+    assert len(payload) < 0.4 * len(json.dumps(series))
+
+
+def test_decode_detects_json():
+    assert decode_series('{"ts": [1, 2]}') == {"ts": [1, 2]}
+
+
+@pytest.mark.parametrize("payload", ["{broken", BINARY_PREFIX + "not-base64!"])
+def test_decode_rejects_corrupted_payload(payload):
+    with pytest.raises(ValueError):
+        decode_series(payload)
+
+
+def test_encode_rejects_unknown_fields_and_length_mismatch():
+    with pytest.raises(ValueError, match="extra keys"):
+        encode_series({"ts": [1], "feat1": [1], "feat2": [1], "label": "x"})
+    with pytest.raises(ValueError, match="same length"):
+        encode_series({"ts": [1, 2], "feat1": [1], "feat2": [1, 2]})
+
+
+def test_converter_rewrites_json_rows_and_skips_unsupported():
+    db = MagicMock()
+    db.fetch_json_series_batch.side_effect = [
+        [{"row_id": "A", "data": json.dumps(_series())}, {"row_id": "B", "data": '{"ts": [1], "other": 1}'}],
+        [],
+    ]
+
+    summary = convert(db, batch_size=2, feature_dtype=np.float32)
+
+    written = db.update_series_data.call_args[0][0]
+    assert [row["row_id"] for row in written] == ["A"]
+    assert is_binary(written[0]["data"])
+    assert summary["rows"] == 1 and summary["skipped"] == 1
+    assert db.fetch_json_series_batch.call_args_list[1][0] == ("B", 2)
+
+
+def test_converter_dry_run_does_not_write():
+    db = MagicMock()
+    db.fetch_json_series_batch.side_effect = [[{"row_id": "A", "data": json.dumps(_series())}], []]
+
+    summary = convert(db, batch_size=10, feature_dtype=np.float32, dry_run=True)
+
+    db.update_series_data.assert_not_called()
+    assert summary["size_ratio"] < 1
+
+
+def test_converter_keeps_features_lossless_unless_float32_is_requested():
+    """Перезапись необратима: без --float32 признаки сохраняются точно."""
+    series = {"ts": [0, 1, 2], "feat1": [0.1234567891234, 1.0, 2.0], "feat2": [1.0, 2.0, 3.0]}
+    db = MagicMock()
+    with patch("convert_series.DB", return_value=db):
+        for argv, dtype, exact in [([], np.float64, True), (["--float32"], np.float32, False)]:
+            db.fetch_json_series_batch.side_effect = [[{"row_id": "A", "data": json.dumps(series)}], []]
+            convert_series(argv)
+            decoded = decode_series(db.update_series_data.call_args[0][0][0]["data"])
+            assert decoded["feat1"].dtype == dtype
+            assert (float(decoded["feat1"][0]) == series["feat1"][0]) is exact
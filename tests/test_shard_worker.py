@@ -0,0 +1,162 @@
+# tests/test_shard_worker.py
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
+from models.measurement_data import MeasurementData
+from services.shard_worker import LeaseManager, ShardWorker
+
+
+class LocalLeaseDB:
+    """Локальная замена таблицы work_lease с управляемыми часами."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.leases = {}  # shard_id -> (owner, lease_until)
+
+    def ensure_shards(self, shard_count):
+        for shard_id in range(shard_count):
+            self.leases.setdefault(shard_id, (None, None))
+
+    def claim_shards(self, worker_id, shard_count, limit, ttl_seconds):
+        claimable = [
+            shard_id for shard_id, (owner, until) in sorted(self.leases.items())
+            if shard_id < shard_count and (owner is None or owner == worker_id or until < self.now)
+        ][:limit]
+        for shard_id in claimable:
+            self.leases[shard_id] = (worker_id, self.now + ttl_seconds)
+        return claimable
+
+    def renew_leases(self, worker_id, shard_ids, ttl_seconds):
+        renewed = []
+        for shard_id in shard_ids:
+            if self.leases[shard_id][0] == worker_id:
+                self.leases[shard_id] = (worker_id, self.now + ttl_seconds)
+                renewed.append(shard_id)
+        return renewed
+
+    def release_leases(self, worker_id):
+        for shard_id, (owner, _) in self.leases.items():
+            if owner == worker_id:
+                self.leases[shard_id] = (None, None)
+
+
+@pytest.fixture
+def sharding_config():
+    with patch("services.shard_worker.SHARDING_CONFIG") as config:
+        config.shard_count = 4
+        config.shards_per_worker = 2
+        config.lease_ttl = 60
+        config.heartbeat_interval = 0.01
+        yield config
+
+
+def test_workers_claim_disjoint_shards(sharding_config):
+    db = LocalLeaseDB()
+    first, second, third = (LeaseManager(db, worker_id=w) for w in ("a", "b", "c"))
+
+    assert first.acquire() == [0, 1]
+    assert second.acquire() == [2, 3]
+    assert third.acquire() == []
+
+
+def test_crashed_worker_leases_are_reclaimed(sharding_config):
+    """Шарды упавшего воркера переходят другому после истечения аренды."""
+    db = LocalLeaseDB()
+    crashed, survivor = LeaseManager(db, worker_id="a"), LeaseManager(db, worker_id="b")
+    sharding_config.shards_per_worker = 4
+    crashed.acquire()
+
+    assert survivor.acquire() == []
+    db.now += 61
+    assert survivor.acquire() == [0, 1, 2, 3]
+
+    crashed.renew()
+    assert crashed.lost == {0, 1, 2, 3}
+    assert not crashed.is_leader
+
+
+def test_heartbeat_keeps_leases_alive(sharding_config):
+    db = LocalLeaseDB()
+    manager = LeaseManager(db, worker_id="a")
+    manager.acquire()
+    db.now = 50
+
+    manager.start_heartbeat()
+    time.sleep(0.05)
+    manager.stop_heartbeat()
+
+    assert db.leases[0] == ("a", 110)
+
+
+def _measurement(sensor_id, minute):
+    return MeasurementData(sensor_id, 1, datetime(2023, 10, 1, 12, minute), 3)
+
+
+@pytest.fixture
+def worker(sharding_config):
+    db = MagicMock()
+    leases = MagicMock(worker_id="w1", lost=set(), is_leader=False)
+    leases.acquire.return_value = [1]
+    shard_worker = ShardWorker(db, lease_manager=leases)
+    shard_worker.data_fetcher = MagicMock()
+    shard_worker.data_fetcher.get_last_prediction.return_value = {
+        "sensor_id": 1, "param1": 0.1, "param2": 0.2, "prediction_time": datetime(2023, 10, 1)
+    }
+    shard_worker.measurement_processor = MagicMock()
+    shard_worker.measurement_processor.process_batch.side_effect = lambda batch, params: len(batch)
+    return shard_worker
+
+
+def test_cycle_fetches_only_claimed_shards(worker):
+    worker.data_fetcher.get_new_measurements.return_value = [_measurement(1, 0)]
+
+    assert worker.run_cycle() == 1
+
+    assert worker.data_fetcher.shard_filter == {"shard_count": 4, "shard_ids": [1]}
+    worker.measurement_processor.process_batch.assert_called_once()
+    worker.leases.start_heartbeat.assert_called_once()
+    worker.leases.stop_heartbeat.assert_called_once()
+
+
+def test_non_leader_defers_uncalibrated_sensor(worker):
+    """Без опубликованной калибровки измерения нового сенсора откладываются."""
+    worker.data_fetcher.get_new_measurements.return_value = [
+        _measurement(1, 0), _measurement(2, 5), _measurement(2, 10)
+    ]
+    worker.db.fetch_sensor_calibration.return_value = None
+    worker.db.fetch_sensor_params.return_value = None
+
+    assert worker.run_cycle() == 1
+
+    worker.measurement_processor.process_batch.assert_called_once()
+    assert worker.measurement_processor.process_batch.call_args[0][1] == (0.1, 0.2)
+
+
+def test_published_calibration_is_used(worker):
+    measurements = [_measurement(2, 5)]
+    worker.data_fetcher.get_new_measurements.return_value = measurements
+    worker.db.fetch_sensor_calibration.return_value = (0.3, 0.4)
+
+    assert worker.run_cycle() == 1
+
+    worker.measurement_processor.process_batch.assert_called_once_with(measurements, (0.3, 0.4))
+
+
+@patch("services.shard_worker.DataFetcher")
+def test_leader_calibrates_and_publishes(mock_fetcher_cls, worker):
+    worker.leases.is_leader = True
+    new_measurements = [_measurement(2, 5)]
+    worker.data_fetcher.get_new_measurements.return_value = new_measurements
+    mock_fetcher_cls.return_value.get_new_measurements.return_value = new_measurements + [_measurement(1, 0)]
+    worker.db.fetch_sensor_calibration.side_effect = [None, (0.5, 0.6)]
+    worker.db.fetch_sensor_params.return_value = None
+    worker.calibration_service = MagicMock()
+    worker.calibration_service.recalibrate_for_sensor_change.return_value = (0.5, 0.6)
+
+    assert worker.run_cycle() == 1
+
+    kwargs = worker.calibration_service.recalibrate_for_sensor_change.call_args[1]
+    assert kwargs["old_sensor"] == 1 and kwargs["new_sensor"] == 2
+    assert kwargs["measurements"] == new_measurements
+    worker.db.save_sensor_calibration.assert_called_once_with(2, 0.5, 0.6, calibrated_by="w1")
@@ -0,0 +1,116 @@
+# tests/test_snapshot.py
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from services.snapshot import SnapshotDB, record_snapshot
+from utils.series_codec import encode_series
+
+T0 = datetime(2023, 10, 1, 12, 0, 0)
+CONTEXT = {"prediction_time": T0, "sensor_id": 1, "device_id": 1, "param1": 1.0, "param2": 2.0, "result": 0.5}
+
+
+def _series(level, length=3000):
+    return {"ts": list(range(length)), "feat1": [0.0] * length, "feat2": [level] * length}
+
+
+def _rows():
+    rows = []
+    for minute in range(2):
+        for k, level in enumerate((1.0, 2.0, 3.0)):
+            data = encode_series(_series(level)) if k == 2 else json.dumps(_series(level))
+            rows.append({"sensor_id": 1, "device_id": 1, "measurement_time": T0 + timedelta(minutes=minute), "data": data})
+    return rows
+
+
+def _recorded(tmp_path, sink_path=None):
+    db = MagicMock()
+    db.fetch_last_prediction.return_value = CONTEXT
+    db.fetch_unprocessed_measurements_last24h.return_value = _rows()
+    db.fetch_sensor_usage.return_value = {1: 7}
+    path = str(tmp_path / "window.snap")
+
+    summary = record_snapshot(db, path)
+
+    assert summary == {"rows": 6, "measurements": 2, "sensors": 1}
+    return SnapshotDB.load(path, sink_path)
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = _recorded(tmp_path)
+
+    assert snapshot.fetch_last_prediction() == CONTEXT
+    assert snapshot.fetch_unprocessed_measurements_last24h() == _rows()
+    assert snapshot.fetch_sensor_usage([1, 2]) == {1: 7}
+    groups = snapshot.fetch_unprocessed_measurement_groups_last24h(3, 10)
+    assert [g["series_count"] for g in groups] == [3, 3]
+    assert len(json.loads(groups[0]["payload"])) == 3
+
+
+def test_written_measurements_leave_the_window(tmp_path):
+    sink = tmp_path / "sink.jsonl"
+    snapshot = _recorded(tmp_path, str(sink))
+    prediction = {"sensor_id": 1, "device_id": 1, "measurement_time": T0, "param1": 1.0, "param2": 2.0,
+                  "result": 0.4, "quality_code": None}
+    checkpoint = {"pipeline_id": "default", "last_measurement_time": T0, "last_sensor_id": 1,
+                  "last_device_id": 1, "processed": 1}
+
+    assert snapshot.insert_predictions_batch([prediction], checkpoint) == {1: 1}
+    assert snapshot.insert_predictions_batch([prediction], checkpoint) == {}
+    snapshot.close_pool()
+
+    assert {row["measurement_time"] for row in snapshot.fetch_unprocessed_measurements_last24h()} == {T0 + timedelta(minutes=1)}
+    assert snapshot.fetch_sensor_usage([1]) == {1: 8}
+    assert snapshot.fetch_checkpoint("default")["processed_total"] == 2
+    assert len(sink.read_text().splitlines()) == 1
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+def test_replay_runs_pipeline_offline(mock_predict, tmp_path):
+    from replay import replay
+    db = MagicMock()
+    db.fetch_last_prediction.return_value = CONTEXT
+    db.fetch_unprocessed_measurements_last24h.return_value = _rows()
+    db.fetch_sensor_usage.return_value = {1: 7}
+    record_snapshot(db, str(tmp_path / "window.snap"))
+    sink = tmp_path / "sink.jsonl"
+
+    report = replay(["run", str(tmp_path / "window.snap"), "--sink", str(sink)])
+
+    assert report["predictions"] == 2
+    assert [json.loads(line)["result"] for line in sink.read_text().splitlines()] == [0.5, 0.5]
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+def test_replay_leaves_production_journal_untouched(mock_predict, tmp_path):
+    """Незаписанные предсказания рабочего конвейера не дописываются в приёмник снимка и не стираются."""
+    from replay import replay
+    from services.prediction_journal import PredictionJournal
+    journal_path = tmp_path / "journal.jsonl"
+    production = {"sensor_id": 9, "device_id": 9, "measurement_time": T0 - timedelta(hours=1),
+                  "param1": 1.0, "param2": 2.0, "result": 0.7, "quality_code": None}
+    PredictionJournal(str(journal_path)).append([production])
+    before = journal_path.read_text()
+    db = MagicMock()
+    db.fetch_last_prediction.return_value = CONTEXT
+    db.fetch_unprocessed_measurements_last24h.return_value = _rows()
+    db.fetch_sensor_usage.return_value = {1: 7}
+    record_snapshot(db, str(tmp_path / "window.snap"))
+    sink = tmp_path / "sink.jsonl"
+
+    with patch("services.application_service.PROCESSING_CONFIG") as mock_config, \
+            patch("services.application_service.CACHE_CONFIG") as mock_cache_config:
+        mock_config.journal_path = str(journal_path)
+        mock_config.pipeline_id = "default"
+        mock_config.sensor_lanes = False
+        mock_config.speculative_calibration = False
+        mock_config.memory_budget_bytes = 0
+        mock_config.server_side_grouping = False
+        mock_config.scheduling = "fifo"
+        mock_cache_config.measurement_cache_dir = str(tmp_path / "cache")
+        mock_cache_config.dedup_index_path = str(tmp_path / "dedup.npz")
+        report = replay(["run", str(tmp_path / "window.snap"), "--sink", str(sink)])
+
+    assert report["predictions"] == 2
+    assert journal_path.read_text() == before
+    assert {json.loads(line)["sensor_id"] for line in sink.read_text().splitlines()} == {1}
+    assert not (tmp_path / "cache").exists() and not (tmp_path / "dedup.npz").exists()
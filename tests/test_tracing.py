@@ -0,0 +1,98 @@
+# tests/test_tracing.py
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import pytest
+from models.measurement_data import MeasurementData
+from services.measurement_processor import MeasurementProcessor
+from utils.tracing import (
+    MEASUREMENT, NOOP_SPAN, QUERY, RUN, STAGE, JsonLinesSpanExporter, Tracer, create_tracer, set_tracer, span
+)
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """Трассировщик процесса со всеми уровнями; возвращает функцию чтения записанных спанов."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(MEASUREMENT, JsonLinesSpanExporter(str(path), flush_every=1000))
+    set_tracer(tracer)
+
+    def read():
+        tracer.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+    yield read
+    set_tracer(None)
+
+
+def test_nested_spans_share_trace_and_link_parent(trace_file):
+    with span("run", RUN, pipeline_id="test"):
+        with span("fetch", STAGE) as stage:
+            stage.set(measurements=3)
+
+    fetch, run = trace_file()
+    assert fetch["name"] == "fetch"
+    assert fetch["attributes"] == {"measurements": 3}
+    assert fetch["traceId"] == run["traceId"]
+    assert fetch["parentSpanId"] == run["spanId"]
+    assert run["parentSpanId"] is None
+    assert run["endTimeUnixNano"] >= fetch["endTimeUnixNano"] >= fetch["startTimeUnixNano"]
+
+
+def test_failed_span_is_marked_as_error(trace_file):
+    with pytest.raises(ValueError):
+        with span("calibrate"):
+            raise ValueError("no devices")
+
+    (calibrate,) = trace_file()
+    assert calibrate["status"] == "ERROR"
+    assert "no devices" in calibrate["attributes"]["error"]
+
+
+def test_levels_above_configured_are_noop(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(STAGE, JsonLinesSpanExporter(str(path)))
+
+    assert tracer.span("measurement", MEASUREMENT) is NOOP_SPAN
+    assert tracer.span("db.execute", QUERY) is NOOP_SPAN
+    with tracer.span("fetch", STAGE):
+        pass
+    tracer.flush()
+
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == ["fetch"]
+
+
+def test_tracing_is_off_by_default():
+    config = MagicMock(level="off")
+
+    tracer = create_tracer(config)
+
+    assert tracer.span("run", RUN) is NOOP_SPAN
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        create_tracer(MagicMock(level="verbose"))
+
+
+@patch("services.measurement_processor.predict", return_value=0.5)
+@patch("services.measurement_processor.preprocess")
+def test_measurement_spans_from_worker_threads_belong_to_batch(mock_preprocess, mock_predict, trace_file):
+    processor = MeasurementProcessor(MagicMock(), workers=2)
+    measurements = [
+        MeasurementData(1, device_id, datetime(2023, 10, 1, 12, device_id), 1,
+                        [{"ts": [0.0, 1.0, 2.0], "values": [1.0, 2.0, 3.0]}])
+        for device_id in range(3)
+    ]
+
+    processor.process_batch(measurements, (1.0, 2.0))
+
+    spans = trace_file()
+    (batch,) = [s for s in spans if s["name"] == "process_batch"]
+    measurement_spans = [s for s in spans if s["name"] == "measurement"]
+    assert len(measurement_spans) == 3
+    assert all(s["parentSpanId"] == batch["spanId"] for s in measurement_spans)
+    assert sorted(s["attributes"]["device_id"] for s in measurement_spans) == [0, 1, 2]
+    assert all(s["attributes"]["points"] == 3 and s["attributes"]["series"] == 1 for s in measurement_spans)
+    assert measurement_spans[0]["attributes"]["measurement_time"].startswith("2023-10-01T12:")
+    assert [s["name"] for s in spans].count("write") == 1
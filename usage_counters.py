@@ -0,0 +1,46 @@
+# usage_counters.py
+import sys
+import argparse
+import logging
+from db.db import DB
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Сверка и пересборка счётчиков использований сенсоров "
+                    "(строки повторно присланных измерений, duplicate_measurement, не считаются)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("check", help="Сравнить sensor_usage с table1")
+    rebuild = commands.add_parser("rebuild", help="Пересчитать sensor_usage по table1")
+    rebuild.add_argument("--sensor", type=int, help="Только указанный сенсор")
+    return parser.parse_args(argv)
+
+
+def usage_counters(argv=None) -> int:
+    """Точка входа; код возврата 1, если check нашёл расхождения."""
+    args = parse_args(argv)
+    db = None
+    try:
+        db = DB()
+        if args.command == "rebuild":
+            written = db.rebuild_sensor_usage(args.sensor)
+            logger.info(f"Rebuilt {written} sensor usage counters")
+            return 0
+        mismatches = db.check_sensor_usage()
+        for mismatch in mismatches:
+            logger.warning(
+                f"Sensor {mismatch['sensor_id']}: counter {mismatch['stored']}, table1 {mismatch['actual']}"
+            )
+        logger.info(f"Sensor usage check: {len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+    finally:
+        if db:
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(usage_counters())
@@ -1,33 +1,247 @@
 # utils/retry.py
 import time
+import random
 import logging
+import threading
+from contextvars import ContextVar
 from functools import wraps
-from config import RETRY_CONFIG
+from typing import Optional
+from config import RETRY_CONFIG, RETRY_BUDGET_CONFIG, CIRCUIT_BREAKER_CONFIG
 
 logger = logging.getLogger(__name__)
 
+
+class CircuitOpenError(RuntimeError):
+    """Предохранитель открыт: БД считается недоступной, вызов отклонён без попытки."""
+
+
+class RetryBudget:
+    """
+    Бюджет повторов одного эпизода отказа, общий для дерева вложенных вызовов.
+
+    Создаётся самым внешним декорированным вызовом и виден вложенным через
+    ContextVar, поэтому main -> _init_pool -> get_connection расходуют один
+    дедлайн и один лимит повторов, а не перемножают свои attempts. Дедлайн
+    отсчитывается от первого отказа, а успешная операция (внешний вызов
+    своего предохранителя, не вложенный get_connection) завершает эпизод и
+    восстанавливает бюджет: долгий запуск и редкие разовые сбои в разных
+    операциях не лишают следующие операции их повторов.
+    """
+
+    def __init__(self, max_retries: int, deadline: float):
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.reset()
+
+    def reset(self) -> None:
+        self.retries_left = self.max_retries
+        self.deadline_at: Optional[float] = None  # None — отказов в текущем эпизоде ещё не было
+        self._last_error: Optional[BaseException] = None
+
+    def remaining_time(self) -> float:
+        if self.deadline_at is None:
+            return self.deadline
+        return max(0.0, self.deadline_at - time.monotonic())
+
+    def consume(self) -> bool:
+        """Списывает один повтор; False, если бюджет или дедлайн исчерпаны."""
+        if self.deadline_at is None:
+            self.deadline_at = time.monotonic() + self.deadline
+        if self.retries_left <= 0 or self.remaining_time() <= 0:
+            return False
+        self.retries_left -= 1
+        return True
+
+    def is_new_failure(self, error: BaseException) -> bool:
+        """Одна и та же ошибка, всплывающая через несколько уровней, учитывается один раз."""
+        if error is self._last_error:
+            return False
+        self._last_error = error
+        return True
+
+
+class CircuitBreaker:
+    """
+    Предохранитель closed -> open -> half_open. Общий CIRCUIT_BREAKER
+    действует для операций без своего предохранителя; у каждого DB свой
+    (атрибут circuit_breaker), чтобы отказ одной БД не блокировал остальные.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = "database"):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = 0.0
+
+    def before_call(self) -> bool:
+        """Пропускает вызов или отклоняет его CircuitOpenError; True — вызов пробный."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= CIRCUIT_BREAKER_CONFIG.reset_timeout:
+                # Пропускаем один пробный вызов; до его исхода (HALF_OPEN) остальные отклоняются
+                self.state = self.HALF_OPEN
+                return True
+        RETRY_METRICS.increment("breaker_rejections")
+        raise CircuitOpenError(f"Circuit breaker is open: {self.name} considered unavailable")
+
+    def abort_probe(self) -> None:
+        """Пробный вызов упал не на БД: исход неизвестен, следующий вызов снова пробный."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self.consecutive_failures >= CIRCUIT_BREAKER_CONFIG.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                RETRY_METRICS.increment("breaker_opened")
+                logger.error(f"Circuit breaker for {self.name} opened after {self.consecutive_failures} consecutive failures")
+
+
+class RetryMetrics:
+    """Счётчики повторов и предохранителя."""
+
+    FIELDS = ("calls", "failures", "retries", "budget_exhausted", "breaker_opened", "breaker_rejections")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self.FIELDS, 0)
+            self.total_sleep = 0.0
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def add_sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.total_sleep += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            data["total_sleep"] = round(self.total_sleep, 3)
+        data["breaker_state"] = CIRCUIT_BREAKER.state
+        return data
+
+
+RETRY_METRICS = RetryMetrics()
+CIRCUIT_BREAKER = CircuitBreaker()
+_current_budget: ContextVar[Optional[RetryBudget]] = ContextVar("retry_budget", default=None)
+# Предохранители, уже пропустившие внешний вызов: вложенные вызовы (get_connection внутри
+# fetch_*) идут в его рамках и не проверяются повторно, иначе пробный вызов отклонял бы сам себя
+_admitted_breakers: ContextVar[tuple] = ContextVar("admitted_breakers", default=())
+
+
+def get_retry_metrics() -> dict:
+    """Текущие метрики повторов и состояние предохранителя."""
+    return RETRY_METRICS.snapshot()
+
+
+def _breaker_for(args) -> CircuitBreaker:
+    """Предохранитель операции: свой у объекта-владельца (DB), иначе общий."""
+    breaker = getattr(args[0], "circuit_breaker", None) if args else None
+    return breaker if isinstance(breaker, CircuitBreaker) else CIRCUIT_BREAKER
+
+
+def _jittered(delay: float) -> float:
+    """Задержка со случайным разбросом в диапазоне [delay * (1 - jitter), delay]."""
+    jitter = RETRY_BUDGET_CONFIG.jitter
+    return delay * (1 - jitter * random.random())
+
+
 def retry_db_operation(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        last_exception = None
-        delay = RETRY_CONFIG.delay
-        
-        for attempt in range(1, RETRY_CONFIG.attempts + 1):
-            try:
-                return func(*args, **kwargs)
-            except RETRY_CONFIG.exceptions as e:
-                last_exception = e
-                logger.warning(
-                    f"DB operation failed (attempt {attempt}/{RETRY_CONFIG.attempts}): {str(e)}"
-                )
-                if attempt < RETRY_CONFIG.attempts:
-                    time.sleep(delay)
-                    delay *= RETRY_CONFIG.backoff  # Экспоненциальная задержка
-            except Exception as e:
-                logger.error(f"Non-retryable error in DB operation: {str(e)}")
-                raise
-
-        logger.error(f"All retry attempts failed for DB operation")
-        raise last_exception if last_exception else Exception("Unknown DB error")
-
-    return wrapper
\ No newline at end of file
+        budget = _current_budget.get()
+        if budget is not None:
+            return _call_with_retry(func, budget, args, kwargs)
+
+        budget = RetryBudget(RETRY_BUDGET_CONFIG.max_retries, RETRY_BUDGET_CONFIG.deadline)
+        token = _current_budget.set(budget)
+        try:
+            return _call_with_retry(func, budget, args, kwargs)
+        finally:
+            _current_budget.reset(token)
+
+    return wrapper
+
+
+def _call_with_retry(func, budget: RetryBudget, args, kwargs):
+    """
+    Выполняет вызов с повторами. Предохранитель проверяет, а успех закрывает
+    эпизод отказа только во внешнем вызове своего предохранителя — операции БД
+    целиком: успех вложенного get_connection посреди каскада ещё ничего не
+    говорит об исходе операции и не должен пополнять бюджет.
+    """
+    last_exception = None
+    delay = RETRY_CONFIG.delay
+    breaker = _breaker_for(args)
+    admitted = _admitted_breakers.get()
+    outermost = not any(active is breaker for active in admitted)
+
+    for attempt in range(1, RETRY_CONFIG.attempts + 1):
+        probe = breaker.before_call() if outermost else False
+        RETRY_METRICS.increment("calls")
+        token = _admitted_breakers.set(admitted + (breaker,)) if outermost else None
+        try:
+            result = func(*args, **kwargs)
+        except RETRY_CONFIG.exceptions as e:
+            last_exception = e
+            if budget.is_new_failure(e):
+                RETRY_METRICS.increment("failures")
+                breaker.record_failure()
+            logger.warning(
+                f"DB operation failed (attempt {attempt}/{RETRY_CONFIG.attempts}): {str(e)}"
+            )
+            if attempt < RETRY_CONFIG.attempts:
+                if not budget.consume():
+                    RETRY_METRICS.increment("budget_exhausted")
+                    logger.error("Retry budget exhausted, giving up on DB operation")
+                    break
+                sleep_for = min(_jittered(delay), budget.remaining_time())
+                RETRY_METRICS.increment("retries")
+                RETRY_METRICS.add_sleep(sleep_for)
+                time.sleep(sleep_for)
+                delay *= RETRY_CONFIG.backoff  # Экспоненциальная задержка
+        except Exception as e:
+            logger.error(f"Non-retryable error in DB operation: {str(e)}")
+            # Не ошибка БД (в том числе CircuitOpenError другого предохранителя) — это не успешная
+            # проба; пробный вызов лишь возвращает предохранитель в OPEN, чтобы он не завис в HALF_OPEN
+            if probe:
+                breaker.abort_probe()
+            raise
+        else:
+            if outermost:
+                breaker.record_success()
+                budget.reset()
+            return result
+        finally:
+            if token is not None:
+                _admitted_breakers.reset(token)
+
+    logger.error(f"All retry attempts failed for DB operation")
+    raise last_exception if last_exception else Exception("Unknown DB error")
@@ -0,0 +1,97 @@
+# utils/series_codec.py
+import json
+import zlib
+import base64
+import struct
+from typing import Dict, Union
+
+SERIES_FIELDS = ("ts", "feat1", "feat2")
+
+# Бинарный ряд хранится в том же CLOB table2.data текстом: префикс + base64
+BINARY_PREFIX = "TSB1:"
+FORMAT_VERSION = 1
+
+TS_FLOAT64 = 0  # ts как есть
+TS_INT_DELTA = 1  # целочисленные ts: первое значение и разности int64 (без потерь)
+
+# Имена, а не типы numpy: numpy загружается только для бинарных рядов, JSON его не требует
+FEATURE_DTYPES = {0: "float64", 1: "float32"}
+FEATURE_CODES = {name: code for code, name in FEATURE_DTYPES.items()}
+
+_HEADER = struct.Struct("<BBBI")  # версия, режим ts, тип признаков, число точек
+
+
+def is_binary(payload: Union[str, bytes]) -> bool:
+    prefix = BINARY_PREFIX if isinstance(payload, str) else BINARY_PREFIX.encode()
+    return payload[:len(BINARY_PREFIX)] == prefix
+
+
+def encode_series(series: Dict, feature_dtype="float32", level: int = 6) -> str:
+    """
+    Кодирует ряд ts/feat1/feat2 в компактный текст для CLOB.
+
+    ts разностно кодируются без потерь, если все значения целые; признаки
+    хранятся в feature_dtype (float32 по умолчанию — потеря точности после
+    7-го знака). Тело сжимается zlib.
+    """
+    import numpy as np
+    extra = set(series) - set(SERIES_FIELDS)
+    if extra:
+        raise ValueError(f"Binary format supports only {SERIES_FIELDS}, got extra keys {sorted(extra)}")
+    ts = np.asarray(series["ts"], dtype=np.float64)
+    features = [np.asarray(series.get(field, ()), dtype=np.float64) for field in SERIES_FIELDS[1:]]
+    if any(len(feature) != len(ts) for feature in features):
+        raise ValueError("Binary format requires ts, feat1 and feat2 of the same length")
+
+    if len(ts) and np.all(np.isfinite(ts)) and np.array_equal(ts, np.round(ts)) and np.abs(ts).max() < 2 ** 53:
+        ts_mode = TS_INT_DELTA
+        ts_bytes = np.diff(ts.astype(np.int64), prepend=np.int64(0)).tobytes()
+    else:
+        ts_mode = TS_FLOAT64
+        ts_bytes = ts.tobytes()
+
+    feature_code = FEATURE_CODES[np.dtype(feature_dtype).name]
+    body = ts_bytes + b"".join(feature.astype(feature_dtype).tobytes() for feature in features)
+    blob = _HEADER.pack(FORMAT_VERSION, ts_mode, feature_code, len(ts)) + zlib.compress(body, level)
+    return BINARY_PREFIX + base64.b64encode(blob).decode("ascii")
+
+
+def decode_binary(payload: Union[str, bytes]) -> Dict:
+    import numpy as np
+    if isinstance(payload, str):
+        payload = payload.encode("ascii")
+    blob = base64.b64decode(payload[len(BINARY_PREFIX):])
+    version, ts_mode, feature_code, n = _HEADER.unpack_from(blob)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary series version {version}")
+    try:
+        feature_dtype = FEATURE_DTYPES[feature_code]
+    except KeyError:
+        raise ValueError(f"Unknown feature dtype code {feature_code}")
+    body = zlib.decompress(blob[_HEADER.size:])
+
+    if ts_mode == TS_INT_DELTA:
+        ts = np.cumsum(np.frombuffer(body, dtype=np.int64, count=n)).astype(np.float64)
+    elif ts_mode == TS_FLOAT64:
+        ts = np.frombuffer(body, dtype=np.float64, count=n)
+    else:
+        raise ValueError(f"Unknown ts mode {ts_mode}")
+    offset = 8 * n
+    series = {"ts": ts}
+    for field in SERIES_FIELDS[1:]:
+        series[field] = np.frombuffer(body, dtype=feature_dtype, count=n, offset=offset)
+        offset += series[field].nbytes
+    return series
+
+
+def decode_series(payload: Union[str, bytes]) -> Dict:
+    """Декодирует ряд из CLOB в любом из форматов: JSON или бинарном."""
+    if is_binary(payload):
+        try:
+            return decode_binary(payload)
+        except (ValueError, struct.error, zlib.error) as e:
+            raise ValueError(f"Invalid binary series data: {str(e)}")
+    try:
+        return json.loads(payload)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in CLOB data: {str(e)}")
@@ -0,0 +1,186 @@
+# utils/tracing.py
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+from config import TRACING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Уровни детализации: спан пишется, если его уровень не выше заданного TRACE_LEVEL
+OFF, RUN, STAGE, QUERY, MEASUREMENT = 0, 1, 2, 3, 4
+LEVELS = {"off": OFF, "run": RUN, "stage": STAGE, "query": QUERY, "measurement": MEASUREMENT}
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Спан выключенного уровня: ничего не измеряет и не пишет."""
+
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    Интервал работы с атрибутами. Вложенные спаны получают родителя из
+    ContextVar; в потоки пула родитель передаётся явно (parent=).
+    """
+
+    recording = True
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "status", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.status = "OK"
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = "ERROR"
+            self.attributes["error"] = repr(exc)
+        _current_span.reset(self._token)
+        self.tracer.exporter.export(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "attributes": {
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in self.attributes.items()
+            },
+        }
+
+
+class JsonLinesSpanExporter:
+    """
+    Пишет завершённые спаны в файл JSON Lines, по строке на спан, с именами
+    полей OTLP (traceId, spanId, parentSpanId, startTimeUnixNano...).
+    Спаны копятся в буфере и дописываются в файл пачками.
+    """
+
+    def __init__(self, path: str, flush_every: int = 1000):
+        self.path = path
+        self.flush_every = max(flush_every, 1)
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) < self.flush_every:
+                return
+            lines, self._buffer = self._buffer, []
+            self._write(lines)
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            if lines:
+                self._write(lines)
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class Tracer:
+    def __init__(self, level: int = OFF, exporter=None):
+        self.level = level if exporter is not None else OFF
+        self.exporter = exporter
+
+    def enabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def span(self, name: str, level: int = STAGE, parent: Optional[Span] = None, **attributes):
+        if level > self.level:
+            return NOOP_SPAN
+        return Span(self, name, parent if parent is not None else _current_span.get(), attributes)
+
+    def flush(self) -> None:
+        if self.exporter is not None:
+            self.exporter.flush()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def create_tracer(config=TRACING_CONFIG) -> Tracer:
+    try:
+        level = LEVELS[config.level]
+    except KeyError:
+        raise ValueError(f"Unknown trace level {config.level!r}, available: {list(LEVELS)}")
+    if level == OFF:
+        return Tracer()
+    exporter = JsonLinesSpanExporter(config.export_path, config.flush_every)
+    atexit.register(exporter.flush)
+    logger.info(f"Tracing spans up to level {config.level!r} to {config.export_path}")
+    return Tracer(level, exporter)
+
+
+def get_tracer() -> Tracer:
+    """Трассировщик процесса, создаётся по TRACING_CONFIG при первом обращении."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = create_tracer()
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Подменяет трассировщик процесса (None — заново по конфигурации)."""
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, level: int = STAGE, parent: Optional[Span] = None, **attributes):
+    """Спан уровня level; для выключенного уровня — общий NOOP_SPAN без затрат на измерение."""
+    tracer = _tracer if _tracer is not None else get_tracer()
+    return tracer.span(name, level, parent, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
@@ -1,7 +1,11 @@
 # utils/validators.py
+MIN_SERIES_COUNT = 3
+MAX_SERIES_COUNT = 10
+
+
 def is_valid_measurement(measurement_data) -> bool:
     data = measurement_data.raw_data
-    if not (3 <= len(data) <= 10):
+    if not (MIN_SERIES_COUNT <= len(data) <= MAX_SERIES_COUNT):
         return False
     for ts in data:
         if not (3000 <= len(ts.get("ts", [])) <= 8000):
@@ -0,0 +1,48 @@
+# worker.py
+import time
+import argparse
+import logging
+from config import SHARDING_CONFIG
+from db.db import DB
+from services.shard_worker import ShardWorker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def worker(argv=None):
+    """
+    Точка входа воркера режима шардирования.
+    Несколько экземпляров на разных хостах делят устройства через аренду шардов в БД.
+    """
+    parser = argparse.ArgumentParser(description="Воркер обработки измерений арендованных шардов")
+    parser.add_argument("--once", action="store_true", help="Выполнить один цикл и выйти")
+    args = parser.parse_args(argv)
+
+    db = None
+    shard_worker = None
+    try:
+        db = DB()
+        shard_worker = ShardWorker(db)
+        while True:
+            try:
+                processed = shard_worker.run_cycle()
+                logger.info(f"Cycle finished: {processed} measurements processed")
+            except Exception as e:
+                logger.error(f"Worker cycle failed: {str(e)}")
+                if args.once:
+                    raise
+            if args.once:
+                break
+            time.sleep(SHARDING_CONFIG.poll_interval)
+    except KeyboardInterrupt:
+        logger.info("Worker interrupted")
+    finally:
+        if shard_worker:
+            shard_worker.leases.release()
+        if db:
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    worker()